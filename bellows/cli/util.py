@@ -7,6 +7,7 @@ import click
 
 import bellows.ezsp
 import bellows.types as t
+from bellows.zigbee import appdb
 
 
 LOGGER = logging.getLogger(__name__)
@@ -36,25 +37,28 @@ def async(f):
 
 def app(f):
     database_file = None
-    loaded = False
+    application = None
+    listener = None
 
     @asyncio.coroutine
     def async_inner(ctx, *args, **kwargs):
-        global database_file, loaded
+        nonlocal database_file, application, listener
         database_file = ctx.obj['database_file']
-        app = yield from setup_application(ctx.obj['device'])
-        app.load(database_file)
-        loaded = True
-        ctx.obj['app'] = app
+        application = yield from setup_application(ctx.obj['device'])
+        application.load(database_file)
+        # Only persist once the DB is fully loaded
+        listener = appdb.PersistingListener(database_file, application)
+        application.add_listener(listener)
+        ctx.obj['app'] = application
         yield from f(ctx, *args, **kwargs)
         yield from asyncio.sleep(0.5)
 
     def shutdown():
-        if loaded:
-            # Don't save the DB if we didn't fully load it
-            app.save(database_file)
+        if listener is not None:
+            # Only writes what changed; sync() rewrites every device
+            listener.close()
         try:
-            app._ezsp.close()
+            application._ezsp.close()
         except:
             pass
 
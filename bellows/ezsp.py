@@ -36,12 +36,12 @@ class EZSP:
 
     def _ezsp_frame(self, name, *args):
         c = self.COMMANDS[name]
-        data = t.serialize(args, c[1])
-        return bytes([
+        frame = bytearray([
             self._seq & 0xff,
             0,  # Frame control. TODO.
             c[0],  # Frame ID
-        ]) + data
+        ])
+        return t.serialize_into(frame, args, c[1])
 
     def _command(self, name, *args):
         LOGGER.debug("Send command %s", name)
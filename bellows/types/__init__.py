@@ -12,4 +12,17 @@ def deserialize(data, schema):
 
 
 def serialize(data, schema):
-    return b''.join(t(v).serialize() for t, v in zip(schema, data))
+    return bytes(serialize_into(bytearray(), data, schema))
+
+
+def serialize_into(buf, data, schema):
+    """Append the serialized form of data to the bytearray buf
+
+    Values which are already of their schema type are written as-is, rather
+    than being copied into a new instance first. Returns buf.
+    """
+    for type_, value in zip(schema, data):
+        if type(value) is not type_:
+            value = type_(value)
+        value.serialize_into(buf)
+    return buf
@@ -1,3 +1,4 @@
+import enum
 import struct
 
 
@@ -7,6 +8,9 @@ class int_t(int):
     def serialize(self):
         return self.to_bytes(self._size, 'little', signed=self._signed)
 
+    def serialize_into(self, buf):
+        buf += self.to_bytes(self._size, 'little', signed=self._signed)
+
     @classmethod
     def deserialize(cls, data):
         r = cls.from_bytes(data[:cls._size], 'little', signed=cls._signed)
@@ -82,10 +86,40 @@ class uint64_t(uint_t):
     _size = 8
 
 
+class _enum8_meta(enum.EnumMeta):
+    def __new__(metacls, *args, **kwargs):
+        cls = super().__new__(metacls, *args, **kwargs)
+        table = [None] * 256
+        for member in cls.__members__.values():
+            table[member.value] = member
+        cls._member_table = tuple(table)
+        return cls
+
+
+class enum8(uint8_t, enum.Enum, metaclass=_enum8_meta):
+    """An 8 bit enum, decoded through a table indexed by the raw value
+
+    Values without a corresponding member decode to a plain uint8_t, rather
+    than raising an exception.
+    """
+    @classmethod
+    def deserialize(cls, data):
+        try:
+            member = cls._member_table[data[0]]
+        except IndexError:
+            return super().deserialize(data)
+        if member is None:
+            member = uint8_t(data[0])
+        return member, data[1:]
+
+
 class Single(float):
     def serialize(self):
         return struct.pack('<f', self)
 
+    def serialize_into(self, buf):
+        buf += struct.pack('<f', self)
+
     @classmethod
     def deserialize(cls, data):
         return struct.unpack('<f', data)[0], data[4:]
@@ -95,6 +129,9 @@ class Double(float):
     def serialize(self):
         return struct.pack('<d', self)
 
+    def serialize_into(self, buf):
+        buf += struct.pack('<d', self)
+
     @classmethod
     def deserialize(cls, data):
         return struct.unpack('<d', data)[0], data[8:]
@@ -106,6 +143,10 @@ class LVBytes(bytes):
             len(self),
         ]) + self
 
+    def serialize_into(self, buf):
+        buf.append(len(self))
+        buf += self
+
     @classmethod
     def deserialize(cls, data):
         l = int.from_bytes(data[:1], 'little')
@@ -120,6 +161,11 @@ class _List(list):
         assert self._length is None or len(self) == self._length
         return b''.join([i.serialize() for i in self])
 
+    def serialize_into(self, buf):
+        assert self._length is None or len(self) == self._length
+        for i in self:
+            i.serialize_into(buf)
+
     @classmethod
     def deserialize(cls, data):
         r = cls()
@@ -135,6 +181,10 @@ class _LVList(_List):
         data = super().serialize()
         return head + data
 
+    def serialize_into(self, buf):
+        buf.append(len(self))
+        super().serialize_into(buf)
+
     @classmethod
     def deserialize(cls, data):
         r = cls()
@@ -44,6 +44,11 @@ class EmberEUI64(basic.fixed_list(8, basic.uint8_t)):
         assert self._length == len(self)
         return b''.join([i.serialize() for i in self[::-1]])
 
+    def serialize_into(self, buf):
+        assert self._length == len(self)
+        for i in self[::-1]:
+            i.serialize_into(buf)
+
     def __repr__(self):
         return ':'.join('%02x' % i for i in self)
 
@@ -66,14 +71,14 @@ class EmberGpKeyType(basic.uint8_t):
     pass
 
 
-class Bool(basic.uint8_t, enum.Enum):
+class Bool(basic.enum8):
     # Boolean type with values true and false.
 
     false = 0x00  # An alias for zero, used for clarity.
     true = 0x01  # An alias for one, used for clarity.
 
 
-class EzspConfigId(basic.uint8_t, enum.Enum):
+class EzspConfigId(basic.enum8):
     # Identifies a configuration value.
 
     # The number of packet buffers available to the stack.  When set to the
@@ -221,7 +226,7 @@ class EzspConfigId(basic.uint8_t, enum.Enum):
     CONFIG_TRANSIENT_KEY_TIMEOUT_S = 0x36
 
 
-class EzspValueId(basic.uint8_t, enum.Enum):
+class EzspValueId(basic.enum8):
     # Identifies a value.
 
     # The contents of the node data stack token.
@@ -326,7 +331,7 @@ class EzspValueId(basic.uint8_t, enum.Enum):
     VALUE_RF4CE_SUPPORTED_PROFILES_LIST2 = 0x28
 
 
-class EzspExtendedValueId(basic.uint8_t, enum.Enum):
+class EzspExtendedValueId(basic.enum8):
     # Identifies a value based on specified characteristics. Each set of
     # characteristics is unique to that value and is specified during the call
     # to get the extended value.
@@ -369,7 +374,7 @@ class EmberConfigTxPowerMode(basic.uint16_t, enum.Enum):
     TX_POWER_MODE_ALTERNATE = 0x02
 
 
-class EzspPolicyId(basic.uint8_t, enum.Enum):
+class EzspPolicyId(basic.enum8):
     # Identifies a policy.
 
     # Controls trust center behavior.
@@ -396,7 +401,7 @@ class EzspPolicyId(basic.uint8_t, enum.Enum):
     ZLL_POLICY = 0x08
 
 
-class EzspDecisionId(basic.uint8_t, enum.Enum):
+class EzspDecisionId(basic.enum8):
     # Identifies a policy decision.
 
     # Send the network key in the clear to all joining and rejoining devices.
@@ -473,7 +478,7 @@ class EzspDecisionId(basic.uint8_t, enum.Enum):
     PACKET_VALIDATE_LIBRARY_CHECKS_DISABLED = 0x63
 
 
-class EzspMfgTokenId(basic.uint8_t, enum.Enum):
+class EzspMfgTokenId(basic.enum8):
     # Manufacturing token IDs used by ezspGetMfgToken().
 
     # Custom version (2 bytes).
@@ -510,7 +515,7 @@ class EzspMfgTokenId(basic.uint8_t, enum.Enum):
     MFG_CTUNE = 0x0D
 
 
-class EzspStatus(basic.uint8_t, enum.Enum):
+class EzspStatus(basic.enum8):
     # Status values used by EZSP.
 
     # Success.
@@ -654,7 +659,7 @@ class EzspStatus(basic.uint8_t, enum.Enum):
     NO_ERROR = 0xFF
 
 
-class EmberStatus(basic.uint8_t, enum.Enum):
+class EmberStatus(basic.enum8):
     # Return type for stack functions.
 
     # The generic 'no error' message.
@@ -996,7 +1001,7 @@ class EmberStatus(basic.uint8_t, enum.Enum):
     APPLICATION_ERROR_15 = 0xFF
 
 
-class EmberEventUnits(basic.uint8_t, enum.Enum):
+class EmberEventUnits(basic.enum8):
     # Either marks an event as inactive or specifies the units for the event
     # execution time.
 
@@ -1012,7 +1017,7 @@ class EmberEventUnits(basic.uint8_t, enum.Enum):
     EVENT_MINUTE_TIME = 0x03
 
 
-class EmberNodeType(basic.uint8_t, enum.Enum):
+class EmberNodeType(basic.enum8):
     # The type of the node.
 
     # Device is not joined.
@@ -1030,7 +1035,7 @@ class EmberNodeType(basic.uint8_t, enum.Enum):
     MOBILE_END_DEVICE = 0x05
 
 
-class EmberNetworkStatus(basic.uint8_t, enum.Enum):
+class EmberNetworkStatus(basic.enum8):
     # The possible join states for a node.
 
     # The node is not associated with a network in any way.
@@ -1046,7 +1051,7 @@ class EmberNetworkStatus(basic.uint8_t, enum.Enum):
     LEAVING_NETWORK = 0x04
 
 
-class EmberIncomingMessageType(basic.uint8_t, enum.Enum):
+class EmberIncomingMessageType(basic.enum8):
     # Incoming message types.
 
     # Unicast.
@@ -1065,7 +1070,7 @@ class EmberIncomingMessageType(basic.uint8_t, enum.Enum):
     INCOMING_MANY_TO_ONE_ROUTE_REQUEST = 0x06
 
 
-class EmberOutgoingMessageType(basic.uint8_t, enum.Enum):
+class EmberOutgoingMessageType(basic.enum8):
     # Outgoing message types.
 
     # Unicast sent directly to an EmberNodeId.
@@ -1082,7 +1087,7 @@ class EmberOutgoingMessageType(basic.uint8_t, enum.Enum):
     OUTGOING_BROADCAST = 0x04
 
 
-class EmberMacPassthroughType(basic.uint8_t, enum.Enum):
+class EmberMacPassthroughType(basic.enum8):
     # MAC passthrough message type flags.
 
     # No MAC passthrough messages.
@@ -1095,7 +1100,7 @@ class EmberMacPassthroughType(basic.uint8_t, enum.Enum):
     MAC_PASSTHROUGH_EMBERNET_SOURCE = 0x04
 
 
-class EmberBindingType(basic.uint8_t, enum.Enum):
+class EmberBindingType(basic.enum8):
     # Binding types.
 
     # A binding that is currently not in use.
@@ -1149,7 +1154,7 @@ class EmberApsOption(basic.uint16_t):
     APS_OPTION_FRAGMENT = 0x8000
 
 
-class EzspNetworkScanType(basic.uint8_t, enum.Enum):
+class EzspNetworkScanType(basic.enum8):
     # Network scan types.
 
     # An energy scan scans each channel for its RSSI value.
@@ -1158,7 +1163,7 @@ class EzspNetworkScanType(basic.uint8_t, enum.Enum):
     ACTIVE_SCAN = 0x01
 
 
-class EmberJoinDecision(basic.uint8_t, enum.Enum):
+class EmberJoinDecision(basic.enum8):
     # Decision made by the trust center when a node attempts to join.
 
     # Allow the node to join. The joining node should have a pre-configured
@@ -1258,7 +1263,7 @@ class EmberCurrentSecurityBitmask(basic.uint16_t):
     TRUST_CENTER_USES_HASHED_LINK_KEY = 0x0084
 
 
-class EmberKeyType(basic.uint8_t, enum.Enum):
+class EmberKeyType(basic.enum8):
     # Describes the type of ZigBee security key.
 
     # A shared key between the Trust Center and a device.
@@ -1291,7 +1296,7 @@ class EmberKeyStructBitmask(basic.uint16_t):
     KEY_HAS_PARTNER_EUI64 = 0x0008
 
 
-class EmberDeviceUpdate(basic.uint8_t, enum.Enum):
+class EmberDeviceUpdate(basic.enum8):
     # The status of the device update.
 
     STANDARD_SECURITY_SECURED_REJOIN = 0x0
@@ -1303,7 +1308,7 @@ class EmberDeviceUpdate(basic.uint8_t, enum.Enum):
     HIGH_SECURITY_UNSECURED_REJOIN = 0x7
 
 
-class EmberKeyStatus(basic.uint8_t, enum.Enum):
+class EmberKeyStatus(basic.enum8):
     # The status of the attempt to establish a key.
 
     APP_LINK_KEY_ESTABLISHED = 0x01
@@ -1325,7 +1330,7 @@ class EmberKeyStatus(basic.uint8_t, enum.Enum):
     TC_REJECTED_APP_KEY_REQUEST = 0x11
 
 
-class EmberCounterType(basic.uint8_t, enum.Enum):
+class EmberCounterType(basic.enum8):
     # Defines the events reported to the application by the
     # readAndClearCounters command.
 
@@ -1400,7 +1405,7 @@ class EmberCounterType(basic.uint8_t, enum.Enum):
     COUNTER_TYPE_COUNT = 29
 
 
-class EmberJoinMethod(basic.uint8_t, enum.Enum):
+class EmberJoinMethod(basic.enum8):
     # The type of method used for joining.
 
     # Normally devices use MAC Association to join a network, which respects
@@ -1430,7 +1435,7 @@ class EmberJoinMethod(basic.uint8_t, enum.Enum):
     USE_NWK_COMMISSIONING = 0x3
 
 
-class EmberZdoConfigurationFlags(basic.uint8_t, enum.Enum):
+class EmberZdoConfigurationFlags(basic.enum8):
     # Flags for controlling which incoming ZDO requests are passed to the
     # application. To see if the application is required to send a ZDO response
     # to an incoming message, the application must check the APS options
@@ -1495,7 +1500,7 @@ class EmberZllState(basic.uint16_t, enum.Enum):
     ZLL_STATE_NON_ZLL_NETWORK = 0x0100
 
 
-class EmberZllKeyIndex(basic.uint8_t, enum.Enum):
+class EmberZllKeyIndex(basic.enum8):
     # ZLL key encryption algorithm enumeration.
 
     # Key encryption algorithm for use during development.
@@ -1506,14 +1511,14 @@ class EmberZllKeyIndex(basic.uint8_t, enum.Enum):
     ZLL_KEY_INDEX_CERTIFICATION = 0x0F
 
 
-class EzspZllNetworkOperation(basic.uint8_t, enum.Enum):
+class EzspZllNetworkOperation(basic.enum8):
     # Differentiates among ZLL network operations.
 
     ZLL_FORM_NETWORK = 0x00  # ZLL form network command.
     ZLL_JOIN_TARGET = 0x01  # ZLL join target command.
 
 
-class EzspSourceRouteOverheadInformation(basic.uint8_t, enum.Enum):
+class EzspSourceRouteOverheadInformation(basic.enum8):
     # Validates Source Route Overhead Information cached.
 
     # Ezsp source route overhead unknown
@@ -10,10 +10,13 @@ class EzspStruct:
                 setattr(self, field[0], getattr(args[0], field[0]))
 
     def serialize(self):
-        r = b''
+        r = bytearray()
+        self.serialize_into(r)
+        return bytes(r)
+
+    def serialize_into(self, buf):
         for field in self._fields:
-            r += getattr(self, field[0]).serialize()
-        return r
+            getattr(self, field[0]).serialize_into(buf)
 
     @classmethod
     def deserialize(cls, data):
@@ -131,9 +131,12 @@ class Gateway(asyncio.Protocol):
 
     def _frame(self, control, data):
         """Construct a frame"""
-        crc = binascii.crc_hqx(control + data, 0xffff)
-        crc = bytes([crc >> 8, crc % 256])
-        return self._stuff(control + data + crc) + self.FLAG
+        frame = bytearray(control)
+        frame += data
+        crc = binascii.crc_hqx(frame, 0xffff)
+        frame.append(crc >> 8)
+        frame.append(crc % 256)
+        return self._stuff(frame) + self.FLAG
 
     def _randomize(self, s):
         """XOR s with a pseudo-random sequence for transmission
@@ -141,38 +144,39 @@ class Gateway(asyncio.Protocol):
         Used only in data frames
         """
         rand = 0x42
-        out = b''
-        for c in s:
-            out += bytes([c ^ rand])
+        out = bytearray(len(s))
+        for i, c in enumerate(s):
+            out[i] = c ^ rand
             if rand % 2:
                 rand = (rand >> 1) ^ 0xB8
             else:
                 rand = rand >> 1
-        return out
+        return bytes(out)
 
     def _stuff(self, s):
         """Byte stuff (escape) a string for transmission"""
-        out = b''
+        out = bytearray()
         for c in s:
             if c in self.RESERVED:
-                out += self.ESCAPE + bytes([c ^ 0x20])
+                out += self.ESCAPE
+                out.append(c ^ 0x20)
             else:
-                out += bytes([c])
-        return out
+                out.append(c)
+        return bytes(out)
 
     def _unstuff(self, s):
         """Unstuff (unescape) a string after receipt"""
-        out = b''
+        out = bytearray()
         escaped = False
         for c in s:
             if escaped:
-                out += bytes([c ^ 0x20])
+                out.append(c ^ 0x20)
                 escaped = False
             elif c == 0x7D:
                 escaped = True
             else:
-                out += bytes([c])
-        return out
+                out.append(c)
+        return bytes(out)
 
 
 @asyncio.coroutine
@@ -0,0 +1,336 @@
+"""Persistence of the device registry in SQLite
+
+Writes happen on a thread of their own, so that disk I/O never holds up the
+event loop.
+"""
+
+import asyncio
+import logging
+import queue
+import sqlite3
+import threading
+
+import bellows.types as t
+from bellows.zigbee import device, endpoint
+
+
+LOGGER = logging.getLogger(__name__)
+
+SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS devices (ieee ieee, nwk, status)",
+    "CREATE TABLE IF NOT EXISTS endpoints (ieee ieee, endpoint_id, profile_id, device_type, status)",
+    "CREATE TABLE IF NOT EXISTS clusters (ieee ieee, endpoint_id, cluster)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS devices_idx ON devices (ieee)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS endpoints_idx ON endpoints (ieee, endpoint_id)",
+    "CREATE TABLE IF NOT EXISTS output_clusters (ieee ieee, endpoint_id, cluster)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS clusters_idx ON clusters (ieee, endpoint_id, cluster)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS output_clusters_idx ON output_clusters (ieee, endpoint_id, cluster)",
+]
+
+# Columns added since the tables were first created, by table
+ADDED_COLUMNS = {
+    'devices': ['manufacturer_code', 'rx_on_when_idle', 'manufacturer', 'model'],
+}
+
+
+def _register_sqlite_adapters():
+    def adapt_ieee(eui64):
+        return repr(eui64)
+
+    def convert_ieee(s):
+        l = [t.uint8_t(p, base=16) for p in s.split(b':')]
+        return t.EmberEUI64(l)
+    sqlite3.register_adapter(t.EmberEUI64, adapt_ieee)
+    sqlite3.register_converter("ieee", convert_ieee)
+
+
+def _connect(database_file):
+    _register_sqlite_adapters()
+    db = sqlite3.connect(
+        database_file,
+        detect_types=sqlite3.PARSE_DECLTYPES,
+    )
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    return db
+
+
+def _create_schema(db):
+    for statement in SCHEMA:
+        db.execute(statement)
+    for table, columns in ADDED_COLUMNS.items():
+        existing = [row[1] for row in db.execute("PRAGMA table_info(%s)" % (table, ))]
+        for column in columns:
+            if column not in existing:
+                db.execute("ALTER TABLE %s ADD COLUMN %s" % (table, column))
+
+
+def _device_rows(dev):
+    """A snapshot of a device's rows, for the writer thread"""
+    ieee = dev._ieee
+    endpoints = []
+    clusters = []
+    output_clusters = []
+    for epid, ep in dev.endpoints.items():
+        if epid == 0:
+            continue  # Skip zdo
+        device_type = getattr(ep, 'device_type', None)
+        device_type = getattr(device_type, 'value', device_type)
+        endpoints.append((
+            ieee,
+            epid,
+            getattr(ep, 'profile_id', None),
+            device_type,
+            int(ep.status),
+        ))
+        clusters.extend((ieee, epid, cluster_id) for cluster_id in ep.clusters)
+        output_clusters.extend(
+            (ieee, epid, cluster_id) for cluster_id in ep.out_clusters)
+    device_row = (
+        ieee,
+        dev._nwk,
+        int(dev.status),
+        dev.manufacturer_code,
+        dev.rx_on_when_idle,
+        dev.manufacturer,
+        dev.model,
+    )
+    return device_row, endpoints, clusters, output_clusters
+
+
+class DatabaseWriter(threading.Thread):
+    """Applies changes to the database from a queue
+
+    Whatever has queued up while a transaction was being written goes into
+    the next one, so a burst of changes costs one commit.
+
+    A ('done', callback) record has callback called once the changes queued
+    before it are committed, with None, or the exception which stopped any
+    of them being written since the last callback.
+    """
+    def __init__(self, database_file, max_queued=1000):
+        super().__init__(name='bellows-appdb', daemon=True)
+        self._database_file = database_file
+        self.queue = queue.Queue(max_queued)
+        # A failure no done callback has been told about yet
+        self.error = None
+
+    def run(self):
+        db = _connect(self._database_file)
+        running = True
+        while running:
+            batch = [self.queue.get()]
+            while True:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            changes = [r for r in batch if r[0] not in ('done', 'stop')]
+            if changes:
+                try:
+                    with db:
+                        c = db.cursor()
+                        for record in changes:
+                            op = record[0]
+                            if op == 'write':
+                                self._write(c, *record[1:])
+                            elif op == 'delete':
+                                self._delete(c, record[1])
+                            elif op == 'prune':
+                                self._prune(c, record[1])
+                except Exception as e:
+                    LOGGER.error("Failed to write %s database changes: %s", len(changes), e)
+                    self.error = e
+
+            for record in batch:
+                if record[0] == 'done':
+                    error, self.error = self.error, None
+                    record[1](error)
+                elif record[0] == 'stop':
+                    running = False
+        db.close()
+
+    def _delete(self, c, ieee):
+        c.execute("DELETE FROM devices WHERE ieee = ?", (ieee, ))
+        c.execute("DELETE FROM endpoints WHERE ieee = ?", (ieee, ))
+        c.execute("DELETE FROM clusters WHERE ieee = ?", (ieee, ))
+        c.execute("DELETE FROM output_clusters WHERE ieee = ?", (ieee, ))
+
+    def _prune(self, c, keep):
+        stored = [row[0] for row in c.execute("SELECT ieee FROM devices")]
+        for ieee in stored:
+            if ieee not in keep:
+                self._delete(c, ieee)
+
+    def _write(self, c, device_row, endpoints, clusters, output_clusters):
+        ieee = device_row[0]
+        c.execute(
+            "INSERT OR REPLACE INTO devices "
+            "(ieee, nwk, status, manufacturer_code, rx_on_when_idle, "
+            "manufacturer, model) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            device_row,
+        )
+        # Endpoints may have gone as well as come, so replace them all
+        c.execute("DELETE FROM endpoints WHERE ieee = ?", (ieee, ))
+        c.execute("DELETE FROM clusters WHERE ieee = ?", (ieee, ))
+        c.execute("DELETE FROM output_clusters WHERE ieee = ?", (ieee, ))
+        c.executemany("INSERT INTO endpoints VALUES (?, ?, ?, ?, ?)", endpoints)
+        c.executemany("INSERT INTO clusters VALUES (?, ?, ?)", clusters)
+        c.executemany("INSERT INTO output_clusters VALUES (?, ?, ?)", output_clusters)
+
+
+class PersistingListener:
+    """Writes devices to the database as they change
+
+    Changes are collected for flush_interval seconds, then snapshotted and
+    handed to a DatabaseWriter. Each changed device has its rows replaced;
+    the rest of the database is left alone. If the writer's queue is full,
+    the changes wait for the next flush.
+    """
+    def __init__(self, database_file, application, flush_interval=1.0,
+                 max_queued=1000):
+        self._database_file = database_file
+        self._application = application
+        self.flush_interval = flush_interval
+        db = _connect(database_file)
+        with db:
+            _create_schema(db)
+        db.close()
+        # ieee -> Device to write, or None to delete
+        self._changes = {}
+        self._flush_handle = None
+        self._writer = DatabaseWriter(database_file, max_queued)
+        self._writer.start()
+
+    def device_updated(self, device):
+        self._changed(device._ieee, device)
+
+    def device_removed(self, device):
+        self._changed(device._ieee, None)
+
+    def _changed(self, ieee, device):
+        self._changes[ieee] = device
+        self._schedule_flush()
+
+    def _schedule_flush(self):
+        if self._flush_handle is None:
+            loop = asyncio.get_event_loop()
+            self._flush_handle = loop.call_later(self.flush_interval, self.flush)
+
+    def sync(self):
+        """Write every device, and drop any the application no longer has"""
+        devices = self._application.devices
+        self._changes.update(devices)
+        self.flush(block=True)
+        self._writer.queue.put(('prune', set(devices)))
+
+    def flush(self, block=False):
+        """Queue the changes collected so far for writing
+
+        Unless block is set, this never waits for room in the queue.
+        """
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        while self._changes:
+            ieee, dev = next(iter(self._changes.items()))
+            if dev is None:
+                record = ('delete', ieee)
+            else:
+                record = ('write', ) + _device_rows(dev)
+            try:
+                self._writer.queue.put(record, block)
+            except queue.Full:
+                LOGGER.debug("Database queue full, %s changes waiting", len(self._changes))
+                self._schedule_flush()
+                return
+            del self._changes[ieee]
+
+    @asyncio.coroutine
+    def commit(self):
+        """Wait until every change so far has been committed
+
+        Raises the error if any of them failed to be written.
+        """
+        self.flush()
+        while self._changes:
+            yield from asyncio.sleep(self.flush_interval)
+            self.flush()
+
+        loop = asyncio.get_event_loop()
+        fut = asyncio.Future()
+
+        def resolve(error):
+            if fut.done():
+                return
+            if error is None:
+                fut.set_result(None)
+            else:
+                fut.set_exception(error)
+
+        def done(error):
+            loop.call_soon_threadsafe(resolve, error)
+        yield from loop.run_in_executor(
+            None,
+            self._writer.queue.put,
+            ('done', done),
+        )
+        yield from fut
+
+    def load(self):
+        """Add the devices in the database to the application
+
+        The templates of their models are rebuilt from them as well.
+        """
+        app = self._application
+        db = _connect(self._database_file)
+        c = db.cursor()
+        c.execute(
+            "SELECT ieee, nwk, status, manufacturer_code, rx_on_when_idle, "
+            "manufacturer, model FROM devices"
+        )
+        for (ieee, nwk, status, manufacturer_code, rx_on_when_idle,
+                manufacturer, model) in c:
+            dev = app.add_device(ieee, nwk)
+            dev.status = device.Status(status)
+            # Saves asking for the node descriptor again
+            dev.manufacturer_code = manufacturer_code
+            if rx_on_when_idle is not None:
+                dev.rx_on_when_idle = bool(rx_on_when_idle)
+            dev.manufacturer = manufacturer
+            dev.model = model
+
+        for (ieee, endpoint_id, profile_id, device_type, status) in c.execute("SELECT * FROM endpoints"):
+            ep = app.devices[ieee].add_endpoint(endpoint_id)
+            ep.profile_id = profile_id
+            ep.device_type = device_type
+            ep.status = endpoint.Status(status)
+
+        for (ieee, endpoint_id, cluster) in c.execute("SELECT * FROM clusters"):
+            app.devices[ieee].endpoints[endpoint_id].add_cluster(cluster)
+
+        for (ieee, endpoint_id, cluster) in c.execute("SELECT * FROM output_clusters"):
+            app.devices[ieee].endpoints[endpoint_id].add_output_cluster(cluster)
+        db.close()
+
+        # Known models need no full interview when more of them join
+        for dev in app.devices.values():
+            if dev.initialized and dev.manufacturer_code is not None and \
+                    dev.model is not None:
+                key = (dev.manufacturer_code, dev.manufacturer, dev.model)
+                app.device_templates.setdefault(key, dev.layout())
+
+    def close(self):
+        """Write everything outstanding and stop the writer
+
+        Blocks until the changes are on disk, so call it when shutting down.
+        Raises the error if any changes since the last commit() failed to be
+        written.
+        """
+        self.flush(block=True)
+        self._writer.queue.put(('stop', ))
+        self._writer.join()
+        if self._writer.error is not None:
+            raise self._writer.error
@@ -1,22 +1,47 @@
 import asyncio
+import collections
 import logging
-import os
-import sqlite3
 
 import bellows.types as t
-from bellows.zigbee import device, endpoint, zcl, zdo
+from bellows.zigbee import appdb, device, group, interview, poll_control, reports, scene, scheduler, zcl, zdo
 
 LOGGER = logging.getLogger(__name__)
 
 
 class ControllerApplication:
     direct = t.EmberOutgoingMessageType.OUTGOING_DIRECT
+    # Seconds to wait for a reply or delivery before giving up
+    request_timeout = 10
 
     def __init__(self, ezsp):
         self._send_sequence = 0
         self._ezsp = ezsp
         self.devices = {}
+        self._listeners = []
+        # NWK address -> Device
+        self._nwk_index = {}
+        # (nwk, endpoint, cluster, tsn) -> future for the reply
         self._pending = {}
+        # (nwk, tsn) -> number of pending requests using it
+        self._tsns = collections.Counter()
+        # Message tag -> (future, expect_reply) for frames the NCP has not
+        # reported sent yet. The future is None for replies.
+        self._message_tags = {}
+        self._message_tag = 0
+        self.reports = reports.Reports()
+        self.groups = group.Groups(self)
+        self.scenes = scene.Scenes(self)
+        # (manufacturer, model, cluster_id) -> {attrid: datatype}
+        self.discovery_cache = {}
+        # (manufacturer_code, manufacturer, model) -> Device.layout()
+        self.device_templates = {}
+        # Set to an ota.OtaServer to serve upgrades
+        self.ota = None
+        self.poll_control = poll_control.PollControl()
+        self.scheduler = scheduler.Scheduler()
+        self.interviews = interview.Interviews()
+        # Largest APS payload the NCP will send, updated on startup
+        self.max_payload = 82
 
     @asyncio.coroutine
     def startup(self):
@@ -47,6 +72,8 @@ class ControllerApplication:
             raise Exception("Network not configured as coordinator")
 
         yield from self._policy()
+        v = yield from e.maximumPayloadLength()
+        self.max_payload = v[0]
         nwk = yield from e.getNodeId()
         self._nwk = nwk[0]
         ieee = yield from e.getEui64()
@@ -82,23 +109,40 @@ class ControllerApplication:
     def add_device(self, ieee, nwk):
         assert isinstance(ieee, t.EmberEUI64)
         if ieee in self.devices:
-            # TODO: Check NWK?
-            return self.devices[ieee]
+            dev = self.devices[ieee]
+            if dev._nwk != nwk:
+                self._update_nwk(dev, nwk)
+            else:
+                # The entry may have been dropped for an address conflict
+                self._nwk_index[nwk] = dev
+            return dev
         dev = device.Device(self, ieee, nwk)
         self.devices[ieee] = dev
+        self._nwk_index[nwk] = dev
+        self.listener_event('device_updated', dev)
         return dev
 
+    def _update_nwk(self, dev, nwk):
+        LOGGER.info("Device %s changed NWK address 0x%04x -> 0x%04x",
+                    dev._ieee, dev._nwk, nwk)
+        if self._nwk_index.get(dev._nwk) is dev:
+            del self._nwk_index[dev._nwk]
+        dev._nwk = nwk
+        self._nwk_index[nwk] = dev
+        self.listener_event('device_updated', dev)
+
     def ezsp_callback_handler(self, frame_name, args):
         if frame_name == 'incomingMessageHandler':
             self._handle_frame(*args)
         elif frame_name == 'messageSentHandler':
-            if args[4] != 0:
-                self._handle_frame_failure(*args)
+            self._handle_frame_sent(*args)
         elif frame_name == 'trustCenterJoinHandler':
             if args[2] == t.EmberDeviceUpdate.DEVICE_LEFT:
                 self._handle_leave(*args)
             else:
                 self._handle_join(*args)
+        elif frame_name == 'idConflictHandler':
+            self._handle_id_conflict(*args)
 
     def _handle_frame(self, message_type, aps_frame, lqi, rssi, sender, binding_index, address_index, message):
         try:
@@ -119,11 +163,18 @@ class ControllerApplication:
             self._handle_request(sender, aps_frame, tsn, command_id, args)
 
     def _handle_reply(self, sender, aps_frame, tsn, command_id, args):
+        cluster = aps_frame.clusterId
+        if aps_frame.destinationEndpoint == 0:
+            # ZDO responses are on the request's cluster with bit 15 set
+            cluster &= 0x7fff
+        key = (sender, aps_frame.sourceEndpoint, cluster, tsn)
         try:
-            fut = self._pending.pop(tsn)
-            fut.set_result(args)
+            fut = self._pending.pop(key)
         except KeyError:
-            LOGGER.warning("Unexpected response TSN=%s command=%s args=%s", tsn, command_id, args)
+            LOGGER.warning("Unexpected response from 0x%04x TSN=%s command=%s args=%s", sender, tsn, command_id, args)
+            return
+        if not fut.done():
+            fut.set_result(args)
 
     def _handle_request(self, sender, aps_frame, tsn, command_id, args):
         try:
@@ -138,141 +189,197 @@ class ControllerApplication:
         LOGGER.info("Device 0x%04x (%s) joined the network", nwk, ieee)
         dev = self.add_device(ieee, nwk)
         loop = asyncio.get_event_loop()
-        loop.call_soon(asyncio.async, dev.initialize())
+        loop.call_soon(self.interviews.interview, dev)
 
     def _handle_leave(self, nwk, ieee, *args):
         LOGGER.info("Device 0x%04x (%s) left the network", nwk, ieee)
-        self.devices.pop(ieee, None)
-
-    def _handle_frame_failure(self, message_type, destination, aps_frame, message_tag, status, message):
+        dev = self.devices.pop(ieee, None)
+        if dev is not None:
+            if self._nwk_index.get(dev._nwk) is dev:
+                del self._nwk_index[dev._nwk]
+            self.listener_event('device_removed', dev)
+        self.scheduler.forget(ieee)
+        self.poll_control.forget(ieee)
+
+    def _handle_id_conflict(self, nwk):
+        LOGGER.warning("NWK address conflict for 0x%04x", nwk)
+        # The devices involved pick new addresses and announce them
+        self._nwk_index.pop(nwk, None)
+
+    def _handle_frame_sent(self, message_type, destination, aps_frame, message_tag, status, message):
         try:
-            fut = self._pending.pop(message_tag)
-            fut.set_exception(Exception("Message send failure"))
+            fut, expect_reply = self._message_tags.pop(message_tag)
         except KeyError:
-            LOGGER.warning("Unexpected message send failure")
+            if status != 0:
+                LOGGER.warning("Unexpected message send failure %s", status)
+            return
+
+        if fut is None:
+            if status != 0:
+                LOGGER.warning("Reply to 0x%04x failed: %s", destination, status)
+            return
+        if fut.done():
+            return
+        if status != 0:
+            fut.set_exception(Exception("Message delivery failure %s" % (status, )))
+        elif not expect_reply:
+            fut.set_result(status)
+
+    def _get_message_tag(self, fut=None, expect_reply=False):
+        """Allocate a message tag not in use by a frame still being sent"""
+        for _ in range(256):
+            self._message_tag = (self._message_tag + 1) % 256
+            if self._message_tag not in self._message_tags:
+                self._message_tags[self._message_tag] = (fut, expect_reply)
+                return self._message_tag
+        raise Exception("No free message tags")
+
+    def _release_message_tag(self, tag, fut):
+        entry = self._message_tags.get(tag)
+        if entry is not None and entry[0] is fut:
+            del self._message_tags[tag]
+
+    @asyncio.coroutine
+    def request(self, nwk, aps_frame, data, expect_reply=True, timeout=None):
+        """Send a unicast request
+
+        Returns the reply, or with expect_reply unset, waits only for the NCP
+        to report the message delivered. Raises asyncio.TimeoutError after
+        timeout seconds, request_timeout by default, not counting any time
+        spent waiting for the scheduler.
+
+        data is a ZDO or ZCL frame, as a bytearray. It is given its
+        transaction sequence number once the scheduler lets it go, so that
+        requests queued up cannot wrap the numbers onto ones still pending.
+        """
+        dev = self._nwk_index.get(nwk)
+        key = nwk if dev is None else dev._ieee
+        yield from self.scheduler.acquire(key, self.scheduler.limit(dev))
+        try:
+            self._number_request(nwk, aps_frame, data)
+            v = yield from self._request(nwk, aps_frame, data, expect_reply, timeout)
+            return v
+        finally:
+            self.scheduler.release(key)
+
+    def _number_request(self, nwk, aps_frame, data):
+        seq = self.get_sequence(nwk)
+        aps_frame.sequence = t.uint8_t(seq)
+        if aps_frame.profileId == 0:
+            # ZDO frames start with the sequence number
+            data[0] = seq
+        elif data[0] & 0b0100:
+            # After the ZCL frame control and manufacturer code
+            data[3] = seq
+        else:
+            data[1] = seq
 
     @asyncio.coroutine
-    def request(self, nwk, aps_frame, data):
+    def _request(self, nwk, aps_frame, data, expect_reply, timeout):
+        if timeout is None:
+            timeout = self.request_timeout
         seq = aps_frame.sequence
-        assert seq not in self._pending
+        key = (nwk, aps_frame.destinationEndpoint, aps_frame.clusterId, seq)
+        if expect_reply and key in self._pending:
+            raise Exception("TSN %s already in use for 0x%04x" % (seq, nwk))
+
         fut = asyncio.Future()
-        self._pending[seq] = fut
+        tag = self._get_message_tag(fut, expect_reply)
+        if expect_reply:
+            self._pending[key] = fut
+            self._tsns[(nwk, seq)] += 1
+        try:
+            v = yield from self._ezsp.sendUnicast(self.direct, nwk, aps_frame, tag, data)
+            if v[0] != 0:
+                raise Exception("Message send failure %s" % (v[0], ))
+
+            v = yield from asyncio.wait_for(fut, timeout)
+            return v
+        finally:
+            self._release_message_tag(tag, fut)
+            if expect_reply:
+                if self._pending.get(key) is fut:
+                    del self._pending[key]
+                self._tsns[(nwk, seq)] -= 1
+                if not self._tsns[(nwk, seq)]:
+                    del self._tsns[(nwk, seq)]
+
+    @asyncio.coroutine
+    def multicast(self, aps_frame, data, hops=0, non_member_radius=3):
+        """Send a frame to the group in aps_frame.groupId
 
-        v = yield from self._ezsp.sendUnicast(self.direct, nwk, aps_frame, seq, data)
-        if v[0] != 0:
-            self._pending.pop(seq)
-            raise Exception("Message send failure %s" % (v[0], ))
+        Waits for the NCP to report the frame sent.
+        """
+        fut = asyncio.Future()
+        tag = self._get_message_tag(fut)
+        try:
+            v = yield from self._ezsp.sendMulticast(aps_frame, hops, non_member_radius, tag, data)
+            if v[0] != 0:
+                raise Exception("Message send failure %s" % (v[0], ))
 
-        v = yield from fut
-        return v
+            v = yield from asyncio.wait_for(fut, self.request_timeout)
+            return v
+        finally:
+            self._release_message_tag(tag, fut)
 
     def reply(self, nwk, aps_frame, data):
-        return self._ezsp.sendUnicast(self.direct, nwk, aps_frame, aps_frame.sequence, data)
+        tag = self._get_message_tag()
+        fut = self._ezsp.sendUnicast(self.direct, nwk, aps_frame, tag, data)
+        fut.add_done_callback(lambda f: self._reply_queued(tag, f))
+        return fut
+
+    def _reply_queued(self, tag, fut):
+        if fut.cancelled() or fut.exception() is not None or fut.result()[0] != 0:
+            # Not sent, so the NCP will never report on the tag
+            self._message_tags.pop(tag, None)
 
     def permit(self, time_s=60):
         assert 0 <= time_s <= 254
         return self._ezsp.permitJoining(time_s)
 
-    def get_sequence(self):
-        self._send_sequence = (self._send_sequence + 1) % 256
+    def get_sequence(self, nwk=None):
+        """Next transaction sequence number, skipping any nwk is still
+        expected to answer"""
+        for _ in range(256):
+            self._send_sequence = (self._send_sequence + 1) % 256
+            if (nwk, self._send_sequence) not in self._tsns:
+                break
         return self._send_sequence
 
     def get_device(self, ieee=None, nwk=None):
         if ieee is not None:
             return self.devices[ieee]
 
-        for dev in self.devices.values():
-            # TODO: Make this not terrible
-            if dev._nwk == nwk:
-                return dev
-
-        raise KeyError
+        return self._nwk_index[nwk]
 
     # Database operations
-    # These are not good, and need to be reworked. Maybe the best way would be
-    # to have a listener which updates the database as things change?
-    def _sqlite_adapters(self):
-        def adapt_ieee(eui64):
-            return repr(eui64)
-
-        def convert_ieee(s):
-            l = [t.uint8_t(p, base=16) for p in s.split(b':')]
-            return t.EmberEUI64(l)
-        sqlite3.register_adapter(t.EmberEUI64, adapt_ieee)
-        sqlite3.register_converter("ieee", convert_ieee)
-
     def save(self, filename):
-        try:
-            os.unlink(filename)
-        except FileNotFoundError:
-            pass
-
-        self._sqlite_adapters()
-
-        db = sqlite3.connect(filename, detect_types=sqlite3.PARSE_DECLTYPES)
-        c = db.cursor()
-
-        c.execute("CREATE TABLE devices (ieee ieee, nwk, status)")
-        c.execute("CREATE TABLE endpoints (ieee ieee, endpoint_id, profile_id, device_type, status)")
-        c.execute("CREATE TABLE clusters (ieee ieee, endpoint_id, cluster)")
-
-        q = "INSERT INTO devices (ieee, nwk, status) VALUES (?, ?, ?)"
-        devices = [(ieee, dev._nwk, dev.status) for ieee, dev in self.devices.items()]
-        c.executemany(q, devices)
-
-        q = "INSERT INTO endpoints VALUES (?, ?, ?, ?, ?)"
-        for ieee, dev in self.devices.items():
-            endpoints = []
-            for epid, ep in dev.endpoints.items():
-                if epid == 0:
-                    continue  # Skip zdo
-                device_type = None
-                try:
-                    device_type = ep.device_type
-                    device_type = device_type.value
-                except:
-                    pass
-                eprow = (
-                    ieee,
-                    ep._endpoint_id,
-                    getattr(ep, 'profile_id', None),
-                    device_type,
-                    ep.status,
-                )
-                endpoints.append(eprow)
-            c.executemany(q, endpoints)
-
-        q = "INSERT INTO clusters VALUES (?, ?, ?)"
-        for ieee, dev in self.devices.items():
-            for epid, ep in dev.endpoints.items():
-                if epid == 0:
-                    continue
-                clusters = [(ieee, epid, cluster.cluster_id) for cluster in ep.clusters.values()]
-                c.executemany(q, clusters)
-        db.commit()
+        """Write every device to the database, updating it in place"""
+        db = appdb.PersistingListener(filename, self)
+        db.sync()
+        db.close()
 
     def load(self, filename):
-        self._sqlite_adapters()
-        db = sqlite3.connect(filename, detect_types=sqlite3.PARSE_DECLTYPES)
-        c = db.cursor()
-
+        db = appdb.PersistingListener(filename, self)
         try:
-            c.execute("SELECT COUNT(*) FROM devices")
-            c.execute("SELECT COUNT(*) FROM endpoints")
-            c.execute("SELECT COUNT(*) FROM clusters")
-        except Exception as e:
-            LOGGER.warn("Database error, aborting loading: %s", e)
-            return
-
-        for (ieee, nwk, status) in c.execute("SELECT * FROM devices"):
-            dev = self.add_device(ieee, nwk)
-            dev.status = device.Status(status)
-
-        for (ieee, endpoint_id, profile_id, device_type, status) in c.execute("SELECT * FROM endpoints"):
-            ep = self.devices[ieee].add_endpoint(endpoint_id)
-            ep.profile_id = profile_id
-            ep.device_type = device_type
-            ep.status = endpoint.Status(status)
-
-        for (ieee, endpoint_id, cluster) in c.execute("SELECT * FROM clusters"):
-            self.devices[ieee].endpoints[endpoint_id].add_cluster(cluster)
+            db.load()
+        finally:
+            db.close()
+
+    def add_listener(self, listener):
+        """Have listener told about changes to devices
+
+        Listeners may have device_updated(device) and device_removed(device)
+        methods.
+        """
+        self._listeners.append(listener)
+
+    def listener_event(self, method_name, *args):
+        for listener in self._listeners:
+            method = getattr(listener, method_name, None)
+            if method is None:
+                continue
+            try:
+                method(*args)
+            except Exception as e:
+                LOGGER.warning("Error calling listener %s.%s: %s", listener, method_name, e)
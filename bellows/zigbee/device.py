@@ -29,25 +29,167 @@ class Device:
         self.lqi = None
         self.rssi = None
         self.status = Status.NEW
+        self.manufacturer = None
+        self.model = None
+        # From the node descriptor
+        self.manufacturer_code = None
+        # False for sleepy devices, None if not known
+        self.rx_on_when_idle = None
+        # Overrides the scheduler's limit on requests in flight
+        self.max_in_flight = None
 
     @asyncio.coroutine
     def initialize(self):
-        self.info("Discovering endpoints")
-        epr = yield from self.zdo.request(0x0005, self._nwk)
-        if epr[0] != 0:
-            # TODO: Handle
-            self.warn("Failed ZDO request during device initialization")
-            return
+        """Discover the device's endpoints and their clusters
+
+        Steps already done are skipped, so a failed initialization can be
+        resumed by calling this again. Endpoints are discovered in parallel.
+
+        If a device of the same model has been seen before, its endpoints
+        are copied once the Basic cluster confirms the model.
+        """
+        if self.status == Status.NEW and self.manufacturer_code is None:
+            ndr = yield from self.zdo.request(0x0002, self._nwk)
+            if ndr[0] == 0:
+                self.manufacturer_code = ndr[2].manufacturer_code
+                self.rx_on_when_idle = bool(
+                    ndr[2].mac_capability_flags & 0x08)
+
+        if self.status == Status.NEW and self.manufacturer_code is not None:
+            matched = yield from self._apply_template()
+            if matched:
+                self._application.listener_event('device_updated', self)
+                return
 
-        self.info("Discovered endpoints: %s", epr[2])
+        if self.status == Status.NEW:
+            self.info("Discovering endpoints")
+            epr = yield from self.zdo.request(0x0005, self._nwk)
+            if epr[0] != 0:
+                self.warn("Failed ZDO request during device initialization")
+                return
 
-        for endpoint_id in epr[2]:
-            self.add_endpoint(endpoint_id)
+            self.info("Discovered endpoints: %s", epr[2])
+
+            for endpoint_id in epr[2]:
+                self.add_endpoint(endpoint_id)
+
+            self.status = Status.ZDO_INIT
+
+        endpoints = [
+            ep for endpoint_id, ep in sorted(self.endpoints.items())
+            if endpoint_id != 0 and ep.status == endpoint.Status.NEW
+        ]
+        results = yield from asyncio.gather(
+            *[ep.initialize() for ep in endpoints],
+            return_exceptions=True
+        )
+        for ep, result in zip(endpoints, results):
+            if isinstance(result, Exception):
+                ep.warn("Failed endpoint initialization: %s", result)
 
+        if self.initialized and self.manufacturer_code is not None:
+            yield from self._save_template()
+        # After the template, so the model read for it is stored too
+        self._application.listener_event('device_updated', self)
+
+    def layout(self):
+        """The device's endpoints and their clusters, as stored in a
+        template"""
+        return tuple(
+            (
+                endpoint_id,
+                ep.profile_id,
+                getattr(ep.device_type, 'value', ep.device_type),
+                tuple(sorted(ep.clusters)),
+                tuple(sorted(ep.out_clusters)),
+            )
+            for endpoint_id, ep in sorted(self.endpoints.items())
+            if endpoint_id != 0
+        )
+
+    def _load_layout(self, layout):
+        self.endpoints = {0: self.zdo}
+        for endpoint_id, profile_id, device_type, input_clusters, \
+                output_clusters in layout:
+            ep = self.add_endpoint(endpoint_id)
+            ep.load(profile_id, device_type, input_clusters, output_clusters)
         self.status = Status.ZDO_INIT
 
-        for endpoint_id in epr[2]:
-            yield from self.endpoints[endpoint_id].initialize()
+    @asyncio.coroutine
+    def _apply_template(self):
+        """Set up the endpoints from the template of the device's model
+
+        Returns whether one matched. A candidate layout from the same
+        manufacturer is loaded so that the Basic cluster can be read, and
+        dropped again if the model it reports has no template.
+        """
+        templates = self._application.device_templates
+        tried = set()
+        for key, layout in list(templates.items()):
+            if key[0] != self.manufacturer_code:
+                continue
+            basic = [e[0] for e in layout if 0x0000 in e[3]]
+            if not basic or basic[0] in tried:
+                continue
+            tried.add(basic[0])
+
+            self._load_layout(layout)
+            try:
+                info = yield from self.model_info()
+            except Exception as e:
+                self.debug("Failed to confirm model: %s", e)
+                info = None
+            if info is not None:
+                template = templates.get((self.manufacturer_code, ) + info)
+                if template is not None:
+                    self.info("Using the template for %s %s", *info)
+                    self._load_layout(template)
+                    return True
+
+            self.endpoints = {0: self.zdo}
+            self.status = Status.NEW
+            self.manufacturer = self.model = None
+        return False
+
+    @asyncio.coroutine
+    def _save_template(self):
+        try:
+            info = yield from self.model_info()
+        except Exception as e:
+            self.debug("Failed to read model for template: %s", e)
+            return
+        if info is None:
+            return
+        key = (self.manufacturer_code, ) + info
+        self._application.device_templates.setdefault(key, self.layout())
+
+    @property
+    def initialized(self):
+        """Whether the device and all its endpoints have been discovered"""
+        return self.status == Status.ZDO_INIT and all(
+            ep.status != endpoint.Status.NEW
+            for endpoint_id, ep in self.endpoints.items()
+            if endpoint_id != 0
+        )
+
+    @asyncio.coroutine
+    def model_info(self):
+        """(manufacturer, model) from the Basic cluster, or None if unknown"""
+        if self.model is not None:
+            return (self.manufacturer, self.model)
+
+        for endpoint_id, ep in self.endpoints.items():
+            if endpoint_id == 0 or 0x0000 not in ep.clusters:
+                continue
+            v = yield from ep.clusters[0x0000].read_attributes(
+                ['manufacturer_name', 'model_id'],
+            )
+            values = {r.attrid: r.value.value for r in v[0] if r.status == 0}
+            if 0x0005 in values:
+                self.manufacturer = values.get(0x0004)
+                self.model = values[0x0005]
+                return (self.manufacturer, self.model)
+        return None
 
     def add_endpoint(self, endpoint_id):
         ep = endpoint.Endpoint(self, endpoint_id)
@@ -65,24 +207,35 @@ class Device:
             t.EmberApsOption.APS_OPTION_ENABLE_ROUTE_DISCOVERY
         )
         f.groupId = t.uint16_t(0)
-        f.sequence = t.uint8_t(self._application.get_sequence())
+        f.sequence = t.uint8_t(self._application.get_sequence(self._nwk))
         return f
 
-    def request(self, aps, data):
-        return self._application.request(self._nwk, aps, data)
+    def request(self, aps, data, expect_reply=True, timeout=None):
+        return self._application.request(
+            self._nwk,
+            aps,
+            data,
+            expect_reply=expect_reply,
+            timeout=timeout,
+        )
 
     def handle_request(self, aps_frame, tsn, command_id, args):
         try:
-            endpoint = self.endpoints[aps_frame.destinationEndpoint]
+            endpoint = self.endpoints[aps_frame.sourceEndpoint]
         except KeyError:
             self.warn(
                 "Request for unknown endpoint %s",
-                aps_frame.destinationEndpoint,
+                aps_frame.sourceEndpoint,
             )
             return
 
         return endpoint.handle_request(aps_frame, tsn, command_id, args)
 
+    @property
+    def queue_stats(self):
+        """Requests to the device in flight and waiting, and wait times"""
+        return self._application.scheduler.stats(self._ieee)
+
     def reply(self, aps, data):
         return self._application.reply(self._nwk, aps, data)
 
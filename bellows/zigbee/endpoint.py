@@ -22,6 +22,7 @@ class Endpoint:
         self._device = device
         self._endpoint_id = endpoint_id
         self.clusters = {}
+        self.out_clusters = {}
         self.status = Status.NEW
 
     @asyncio.coroutine
@@ -40,18 +41,29 @@ class Endpoint:
         self.info("Discovered endpoint information: %s", sdr[2])
 
         sd = sdr[2]
-        self.profile_id = sd.profile
-        self.device_type = sd.device_type
+        self.load(
+            sd.profile,
+            sd.device_type,
+            sd.input_clusters,
+            sd.output_clusters,
+        )
+
+    def load(self, profile_id, device_type, input_clusters, output_clusters):
+        """Set up the endpoint from its simple descriptor"""
+        self.profile_id = profile_id
+        self.device_type = device_type
         if self.profile_id == 260:
             try:
                 self.device_type = zha.DeviceType(self.device_type)
             except:
                 pass
 
-        for cluster in sd.input_clusters:
+        for cluster in input_clusters:
             self.add_cluster(cluster)
 
-        self.output_clusters = sd.output_clusters
+        self.output_clusters = output_clusters
+        for cluster in output_clusters:
+            self.add_output_cluster(cluster)
 
         self.status = Status.ZDO_INIT
 
@@ -64,6 +76,15 @@ class Endpoint:
         self.clusters[cluster_id] = cluster
         return cluster
 
+    def add_output_cluster(self, cluster_id):
+        """Adds a device's output cluster
+
+        (a client cluster, sending requests to a server such as us)
+        """
+        cluster = zcl.Cluster.from_id(self, cluster_id)
+        self.out_clusters[cluster_id] = cluster
+        return cluster
+
     def get_aps(self, cluster):
         assert self.status != Status.NEW
         return self._device.get_aps(
@@ -73,10 +94,18 @@ class Endpoint:
         )
 
     def handle_request(self, aps_frame, tsn, command_id, args):
+        cluster_id = aps_frame.clusterId
         try:
-            self.clusters[aps_frame.clusterId].handle_request(aps_frame, tsn, command_id, args)
+            cluster = self.clusters[cluster_id]
         except KeyError:
-            self.warn("Request on unknown cluster 0x%04x", aps_frame.clusterId)
+            try:
+                cluster = self.out_clusters[cluster_id]
+            except KeyError:
+                # Requests on a cluster the device does not serve come from
+                # its client side
+                self.debug("Request on output cluster 0x%04x", cluster_id)
+                cluster = self.add_output_cluster(cluster_id)
+        cluster.handle_request(aps_frame, tsn, command_id, args)
 
     def log(self, lvl, msg, *args):
         msg = '[0x%04x:%s] ' + msg
@@ -0,0 +1,236 @@
+import asyncio
+import logging
+
+import bellows.types as t
+from bellows.zigbee import zcl
+from bellows.zigbee.zcl import foundation
+
+
+LOGGER = logging.getLogger(__name__)
+
+GROUPS_CLUSTER = 0x0004
+
+
+class GroupEndpoint:
+    """Stands in for an endpoint, so cluster commands go to a whole group
+
+    Frames are sent with one sendMulticast. Group members do not reply, so
+    requests complete once the NCP reports the frame sent.
+    """
+    def __init__(self, group, profile_id=260, endpoint_id=1):
+        self._group = group
+        self._device = self
+        self._application = group._application
+        self._ieee = None
+        self._nwk = group.group_id
+        self._endpoint_id = endpoint_id
+        self.profile_id = profile_id
+        self.clusters = {}
+
+    def __getitem__(self, cluster_id):
+        try:
+            return self.clusters[cluster_id]
+        except KeyError:
+            cluster = zcl.Cluster.from_id(self, cluster_id)
+            self.clusters[cluster_id] = cluster
+            return cluster
+
+    def get_aps(self, cluster):
+        f = t.EmberApsFrame()
+        f.profileId = t.uint16_t(self.profile_id)
+        f.clusterId = t.uint16_t(cluster)
+        f.sourceEndpoint = t.uint8_t(self._endpoint_id)
+        f.destinationEndpoint = t.uint8_t(0xff)
+        f.options = t.EmberApsOption(
+            t.EmberApsOption.APS_OPTION_ENABLE_ROUTE_DISCOVERY
+        )
+        f.groupId = t.uint16_t(self._group.group_id)
+        f.sequence = t.uint8_t(self._application.get_sequence())
+        return f
+
+    def request(self, aps, data, expect_reply=True):
+        return self._application.multicast(aps, data)
+
+
+class Group:
+    """A group of device endpoints, addressed together"""
+    def __init__(self, application, group_id, name=''):
+        self._application = application
+        self.group_id = group_id
+        self.name = name
+        # (ieee, endpoint_id) of the member endpoints
+        self.members = set()
+        self.endpoint = GroupEndpoint(self)
+
+    def __getitem__(self, cluster_id):
+        """The cluster to send group commands through"""
+        return self.endpoint[cluster_id]
+
+    @asyncio.coroutine
+    def add_member(self, endpoint):
+        """Add a device endpoint to the group through its Groups cluster"""
+        groups = self._application.groups
+        if self.group_id in groups.cached_membership(endpoint):
+            return True
+
+        v = yield from _groups_cluster(endpoint).command(
+            0x0000,
+            self.group_id,
+            t.LVBytes(self.name.encode()),
+        )
+        if _response_status(v, self.group_id) not in (
+                foundation.Status.SUCCESS,
+                foundation.Status.DUPLICATE_EXISTS):
+            LOGGER.warning(
+                "Failed to add endpoint %s to group 0x%04x: %s",
+                endpoint._endpoint_id,
+                self.group_id,
+                v,
+            )
+            return False
+        groups._member_added(self, endpoint)
+        return True
+
+    @asyncio.coroutine
+    def remove_member(self, endpoint):
+        """Remove a device endpoint from the group"""
+        v = yield from _groups_cluster(endpoint).command(0x0003, self.group_id)
+        if _response_status(v, self.group_id) not in (
+                foundation.Status.SUCCESS,
+                foundation.Status.NOT_FOUND):
+            LOGGER.warning(
+                "Failed to remove endpoint %s from group 0x%04x: %s",
+                endpoint._endpoint_id,
+                self.group_id,
+                v,
+            )
+            return False
+        self._application.groups._member_removed(self, endpoint)
+        return True
+
+
+class Groups(dict):
+    """Group ID to Group mapping for an application
+
+    Keeps the NCP's multicast table in step with the groups, so that frames
+    sent to them are also received, and caches which groups each endpoint is
+    in.
+    """
+    multicast_table_size = 8
+
+    def __init__(self, application):
+        super().__init__()
+        self._application = application
+        self._table = [None] * self.multicast_table_size
+        # (ieee, endpoint_id) -> set of group IDs
+        self._membership = {}
+
+    @asyncio.coroutine
+    def add_group(self, group_id, name=''):
+        if group_id in self:
+            return self[group_id]
+
+        group = self[group_id] = Group(self._application, group_id, name)
+        try:
+            index = self._table.index(None)
+        except ValueError:
+            LOGGER.warning(
+                "Multicast table full, not receiving frames for group 0x%04x",
+                group_id,
+            )
+            return group
+        self._table[index] = group_id
+        yield from self._write_entry(index, group_id, group.endpoint._endpoint_id)
+        return group
+
+    @asyncio.coroutine
+    def remove_group(self, group_id):
+        self.pop(group_id)
+        for memberships in self._membership.values():
+            memberships.discard(group_id)
+        if group_id in self._table:
+            index = self._table.index(group_id)
+            self._table[index] = None
+            yield from self._write_entry(index, 0, 0)
+
+    @asyncio.coroutine
+    def sync(self):
+        """Rewrite the whole multicast table on the NCP"""
+        for index, group_id in enumerate(self._table):
+            if group_id is None:
+                yield from self._write_entry(index, 0, 0)
+            else:
+                yield from self._write_entry(
+                    index,
+                    group_id,
+                    self[group_id].endpoint._endpoint_id,
+                )
+
+    @asyncio.coroutine
+    def _write_entry(self, index, group_id, endpoint_id):
+        entry = t.EmberMulticastTableEntry()
+        entry.multicastId = t.EmberMulticastId(group_id)
+        # Endpoint 0 marks the entry unused
+        entry.endpoint = t.uint8_t(endpoint_id)
+        entry.networkIndex = t.uint8_t(0)
+        v = yield from self._application._ezsp.setMulticastTableEntry(
+            index,
+            entry,
+        )
+        if v[0] != 0:
+            raise Exception("Failed to set multicast table entry %s: %s" % (
+                index, v[0]))
+
+    def cached_membership(self, endpoint):
+        """Group IDs endpoint is known to be in, without asking it"""
+        return self._membership.get(_member_key(endpoint), set())
+
+    @asyncio.coroutine
+    def membership(self, endpoint, refresh=False):
+        """Group IDs endpoint is in, only asking it if not known yet"""
+        key = _member_key(endpoint)
+        if key in self._membership and not refresh:
+            return self._membership[key]
+
+        v = yield from _groups_cluster(endpoint).command(0x0002, [])
+        # The response is the remaining capacity and the group list, so
+        # anything else is a Default Response
+        if not isinstance(v[1], list):
+            raise Exception("Failed to get group membership: %s" % (v[1], ))
+        groups = self._membership[key] = set(v[1])
+        for group_id, group in self.items():
+            if group_id in groups:
+                group.members.add(key)
+            else:
+                group.members.discard(key)
+        return groups
+
+    def _member_added(self, group, endpoint):
+        key = _member_key(endpoint)
+        group.members.add(key)
+        self._membership.setdefault(key, set()).add(group.group_id)
+
+    def _member_removed(self, group, endpoint):
+        key = _member_key(endpoint)
+        group.members.discard(key)
+        self._membership.get(key, set()).discard(group.group_id)
+
+
+def _member_key(endpoint):
+    return (endpoint._device._ieee, endpoint._endpoint_id)
+
+
+def _response_status(v, group_id):
+    """The status of an add or remove response, None for a Default Response"""
+    # The responses echo the group ID, where a Default Response has the
+    # status, after the command ID which would otherwise read as SUCCESS
+    if v[1] != group_id:
+        return None
+    return v[0]
+
+
+def _groups_cluster(endpoint):
+    try:
+        return endpoint.clusters[GROUPS_CLUSTER]
+    except KeyError:
+        return zcl.Cluster.from_id(endpoint, GROUPS_CLUSTER)
@@ -0,0 +1,145 @@
+"""In-memory history of numeric attribute values
+
+Samples are kept in typed arrays, a double timestamp and a value per sample,
+rather than as Python objects.
+"""
+
+import array
+import bisect
+import collections
+import logging
+import time
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+def _mean(values):
+    return sum(values) / len(values)
+
+
+AGGREGATES = {
+    'mean': _mean,
+    'min': min,
+    'max': max,
+    'sum': sum,
+    'count': len,
+    'first': lambda values: values[0],
+    'last': lambda values: values[-1],
+}
+
+
+class Series:
+    """Ring buffer of (timestamp, value) samples for one attribute
+
+    The arrays grow until they hold capacity samples, after which the oldest
+    sample is overwritten.
+    """
+    def __init__(self, capacity, typecode='d'):
+        self.capacity = capacity
+        self._timestamps = array.array('d')
+        self._values = array.array(typecode)
+        # Index of the oldest sample once the buffer has wrapped
+        self._start = 0
+
+    def __len__(self):
+        return len(self._timestamps)
+
+    def append(self, timestamp, value):
+        if len(self._timestamps) < self.capacity:
+            self._timestamps.append(timestamp)
+            self._values.append(value)
+            return
+        self._timestamps[self._start] = timestamp
+        self._values[self._start] = value
+        self._start = (self._start + 1) % self.capacity
+
+    def samples(self, start=None, end=None):
+        """Return (timestamps, values) arrays in time order
+
+        start and end, when given, bound the timestamps returned to
+        start <= timestamp < end.
+        """
+        timestamps, values = self._timestamps, self._values
+        if self._start:
+            timestamps = timestamps[self._start:] + timestamps[:self._start]
+            values = values[self._start:] + values[:self._start]
+
+        lo = 0 if start is None else bisect.bisect_left(timestamps, start)
+        hi = len(timestamps) if end is None else bisect.bisect_left(
+            timestamps, end)
+        return timestamps[lo:hi], values[lo:hi]
+
+    def downsample(self, interval, aggregate='mean', start=None, end=None):
+        """Aggregate samples into buckets of interval seconds
+
+        Returns a list of (bucket start, value), skipping empty buckets.
+        aggregate is one of the AGGREGATES names, or a function taking an
+        array of values.
+        """
+        if not callable(aggregate):
+            aggregate = AGGREGATES[aggregate]
+        timestamps, values = self.samples(start, end)
+
+        result = []
+        lo = 0
+        while lo < len(timestamps):
+            bucket = timestamps[lo] - timestamps[lo] % interval
+            hi = bisect.bisect_left(timestamps, bucket + interval, lo)
+            result.append((bucket, aggregate(values[lo:hi])))
+            lo = hi
+        return result
+
+
+class TimeSeriesStore:
+    """History of numeric attribute values, by device, endpoint, cluster and
+    attribute
+
+    Each series keeps at most capacity samples, and at most max_series series
+    are kept. Beyond that the series updated least recently is dropped.
+    """
+    def __init__(self, capacity=1024, max_series=10000, typecode='d'):
+        self.capacity = capacity
+        self.max_series = max_series
+        self.typecode = typecode
+        # (ieee, endpoint_id, cluster_id, attrid) -> Series, oldest first
+        self._series = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._series)
+
+    def __contains__(self, key):
+        return key in self._series
+
+    def add(self, key, timestamp, value):
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            return False
+
+        try:
+            series = self._series[key]
+            self._series.move_to_end(key)
+        except KeyError:
+            series = self._series[key] = Series(self.capacity, self.typecode)
+            if len(self._series) > self.max_series:
+                evicted, _ = self._series.popitem(last=False)
+                LOGGER.debug("Dropping attribute history for %s", evicted)
+        series.append(timestamp, value)
+        return True
+
+    def series(self, ieee, endpoint_id, cluster_id, attrid):
+        return self._series[(ieee, endpoint_id, cluster_id, attrid)]
+
+    def attach(self, application, **kwargs):
+        """Record attribute updates received by application
+
+        kwargs are passed on to Reports.subscribe, to limit what is recorded.
+        Returns the subscription.
+        """
+        return application.reports.subscribe(self._updates, **kwargs)
+
+    def _updates(self, updates):
+        now = time.time()
+        for update in updates:
+            self.add(update[:4], now, update.value)
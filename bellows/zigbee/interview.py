@@ -0,0 +1,82 @@
+"""Scheduling of device interviews"""
+
+import asyncio
+import collections
+import logging
+import time
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+InterviewResult = collections.namedtuple(
+    'InterviewResult',
+    'success attempts duration',
+)
+
+
+class Interviews:
+    """Runs Device.initialize for joining devices
+
+    At most max_concurrent devices are interviewed at once, so a burst of
+    joins does not swamp the NCP. An interview which fails is retried up to
+    retries times, waiting backoff seconds, doubling each time, and carries
+    on from where the last attempt stopped.
+    """
+    def __init__(self, max_concurrent=4, retries=3, backoff=2.0):
+        self.max_concurrent = max_concurrent
+        self.retries = retries
+        self.backoff = backoff
+        self._semaphore = None
+        # ieee -> task
+        self._tasks = {}
+        # ieee -> InterviewResult of the last interview
+        self.results = {}
+
+    @property
+    def running(self):
+        return len(self._tasks)
+
+    def interview(self, device):
+        """Interview device, unless it already is being"""
+        try:
+            return self._tasks[device._ieee]
+        except KeyError:
+            pass
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        task = asyncio.async(self._interview(device))
+        self._tasks[device._ieee] = task
+        task.add_done_callback(lambda t: self._tasks.pop(device._ieee, None))
+        return task
+
+    @asyncio.coroutine
+    def _interview(self, device):
+        start = time.monotonic()
+        attempts = 0
+        while True:
+            attempts += 1
+            with (yield from self._semaphore):
+                try:
+                    yield from device.initialize()
+                except Exception as e:
+                    device.warn("Interview attempt %s failed: %s", attempts, e)
+            if device.initialized or attempts > self.retries:
+                break
+            yield from asyncio.sleep(self.backoff * 2 ** (attempts - 1))
+
+        result = InterviewResult(
+            device.initialized,
+            attempts,
+            time.monotonic() - start,
+        )
+        self.results[device._ieee] = result
+        if result.success:
+            device.info(
+                "Interviewed in %.1fs, %s attempts",
+                result.duration,
+                attempts,
+            )
+        else:
+            device.warn("Interview failed after %s attempts", attempts)
+        return result
@@ -0,0 +1,347 @@
+"""OTA Upgrade cluster server
+
+Serves upgrade images from a directory of OTA files. Files are indexed once,
+by their headers, and their contents are mapped into memory rather than read.
+"""
+
+import asyncio
+import logging
+import mmap
+import os
+import time
+
+import bellows.types as t
+from bellows.zigbee.zcl import foundation
+
+
+LOGGER = logging.getLogger(__name__)
+
+MAGIC = 0x0beef11e
+# ZCL header, then the image block response fields before the data
+BLOCK_OVERHEAD = 3 + 1 + 2 + 2 + 4 + 4 + 1
+# Seconds a device without a download slot is told to wait before asking
+# for a block again
+WAIT_DELAY = 60
+
+
+class OtaHeader(t.EzspStruct):
+    _fields = [
+        ('magic', t.uint32_t),
+        ('header_version', t.uint16_t),
+        ('header_length', t.uint16_t),
+        ('field_control', t.uint16_t),
+        ('manufacturer_code', t.uint16_t),
+        ('image_type', t.uint16_t),
+        ('file_version', t.uint32_t),
+        ('stack_version', t.uint16_t),
+        ('header_string', t.fixed_list(32, t.uint8_t)),
+        ('image_size', t.uint32_t),
+    ]
+
+
+class Block:
+    """A slice of an image, serialized like LVBytes without a copy"""
+    def __init__(self, data):
+        self._data = data
+
+    def __len__(self):
+        return len(self._data)
+
+    def serialize(self):
+        return bytes([len(self._data)]) + bytes(self._data)
+
+    def serialize_into(self, buf):
+        buf.append(len(self._data))
+        buf += self._data
+
+
+class OtaImage:
+    """An OTA upgrade file, mapped into memory"""
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._map)
+
+        self.header, data = OtaHeader.deserialize(bytes(self._view[:56]))
+        if self.header.magic != MAGIC:
+            self.close()
+            raise ValueError("%s is not an OTA file" % (path, ))
+        if self.header.image_size > len(self._map):
+            self.close()
+            raise ValueError("%s is truncated" % (path, ))
+
+        field_control = self.header.field_control
+        offset = 56
+        if field_control & 0x0001:
+            # Security credential version
+            offset += 1
+        if field_control & 0x0002:
+            # Upgrade file destination
+            offset += 8
+        self.min_hardware_version = self.max_hardware_version = None
+        if field_control & 0x0004:
+            self.min_hardware_version, data = t.uint16_t.deserialize(
+                bytes(self._view[offset:offset + 2]))
+            self.max_hardware_version, data = t.uint16_t.deserialize(
+                bytes(self._view[offset + 2:offset + 4]))
+
+    @property
+    def key(self):
+        return (self.header.manufacturer_code, self.header.image_type)
+
+    @property
+    def version(self):
+        return self.header.file_version
+
+    @property
+    def size(self):
+        return self.header.image_size
+
+    def suits(self, hardware_version):
+        if hardware_version is None or self.min_hardware_version is None:
+            return True
+        return (self.min_hardware_version <= hardware_version <=
+                self.max_hardware_version)
+
+    def block(self, offset, size):
+        return Block(self._view[offset:min(offset + size, self.size)])
+
+    def close(self):
+        self._view.release()
+        self._map.close()
+
+
+class OtaStore:
+    """The newest image of each manufacturer code and image type in a
+    directory"""
+    def __init__(self, directory):
+        self.directory = directory
+        # (manufacturer_code, image_type) -> OtaImage
+        self.images = {}
+
+    def scan(self):
+        for name in sorted(os.listdir(self.directory)):
+            path = os.path.join(self.directory, name)
+            if not os.path.isfile(path):
+                continue
+            try:
+                image = OtaImage(path)
+            except (OSError, ValueError) as e:
+                LOGGER.debug("Skipping %s: %s", path, e)
+                continue
+            current = self.images.get(image.key)
+            if current is not None and current.version >= image.version:
+                image.close()
+                continue
+            if current is not None:
+                current.close()
+            self.images[image.key] = image
+        LOGGER.info("Indexed %s OTA images in %s", len(self.images), self.directory)
+
+    def get(self, manufacturer_code, image_type, version=None):
+        image = self.images.get((manufacturer_code, image_type))
+        if image is None or (version is not None and image.version != version):
+            return None
+        return image
+
+    def close(self):
+        for image in self.images.values():
+            image.close()
+        self.images = {}
+
+
+class OtaServer:
+    """Answers OTA Upgrade cluster requests from devices
+
+    At most max_upgrades devices download at a time. Others are told no image
+    is available and ask again later. A download with no requests for
+    session_timeout seconds gives up its place.
+    """
+    def __init__(self, application, store, max_upgrades=4,
+                 session_timeout=300):
+        self._application = application
+        self.store = store
+        self.max_upgrades = max_upgrades
+        self.session_timeout = session_timeout
+        # ieee -> time of the last request
+        self._sessions = {}
+
+    def block_size(self, max_data_size):
+        """Bytes to send per block, given the device's max_data_size"""
+        return max(1, min(
+            max_data_size,
+            self._application.max_payload - BLOCK_OVERHEAD,
+        ))
+
+    def handle_request(self, cluster, tsn, command_id, args):
+        ieee = cluster._endpoint._device._ieee
+        if command_id == 0x0001:
+            self._query_next_image(cluster, ieee, tsn, *args)
+        elif command_id == 0x0003:
+            self._image_block(cluster, ieee, tsn, *args[1:6])
+        elif command_id == 0x0004:
+            asyncio.async(self._image_page(cluster, ieee, tsn, *args[1:8]))
+        elif command_id == 0x0006:
+            self._upgrade_end(cluster, ieee, tsn, *args)
+        elif command_id == 0x0008:
+            self._query_specific_file(cluster, ieee, tsn, *args[1:4])
+        else:
+            cluster.warn("Unhandled OTA command %s", command_id)
+
+    def _start_session(self, ieee):
+        now = time.monotonic()
+        for key in [k for k, last in self._sessions.items()
+                    if now - last > self.session_timeout]:
+            del self._sessions[key]
+        if ieee not in self._sessions and \
+                len(self._sessions) >= self.max_upgrades:
+            return False
+        self._sessions[ieee] = now
+        return True
+
+    def _query_next_image(self, cluster, ieee, tsn, field_control,
+                          manufacturer_code, image_type, version, hardware):
+        image = self.store.get(manufacturer_code, image_type)
+        hardware_version = hardware[0] if hardware else None
+        if image is None or image.version <= version or \
+                not image.suits(hardware_version) or \
+                not self._start_session(ieee):
+            return cluster.reply(
+                tsn,
+                0x0002,
+                (t.uint8_t, ),
+                foundation.Status.NO_IMAGE_AVAILABLE,
+            )
+        cluster.info("Offering OTA image version 0x%08x", image.version)
+        return self._reply_image(cluster, tsn, 0x0002, image)
+
+    def _query_specific_file(self, cluster, ieee, tsn, manufacturer_code,
+                             image_type, version):
+        image = self.store.get(manufacturer_code, image_type, version)
+        if image is None or not self._start_session(ieee):
+            return cluster.reply(
+                tsn,
+                0x0009,
+                (t.uint8_t, ),
+                foundation.Status.NO_IMAGE_AVAILABLE,
+            )
+        return self._reply_image(cluster, tsn, 0x0009, image)
+
+    def _reply_image(self, cluster, tsn, command_id, image):
+        schema = cluster.client_commands[command_id][1]
+        return cluster.reply(
+            tsn,
+            command_id,
+            schema,
+            foundation.Status.SUCCESS,
+            image.header.manufacturer_code,
+            image.header.image_type,
+            image.version,
+            image.size,
+        )
+
+    def _image_block(self, cluster, ieee, tsn, manufacturer_code, image_type,
+                     version, offset, max_data_size):
+        image = self.store.get(manufacturer_code, image_type, version)
+        if image is None or offset >= image.size:
+            return cluster.reply(
+                tsn,
+                0x0005,
+                (t.uint8_t, ),
+                foundation.Status.ABORT,
+            )
+        if not self._start_session(ieee):
+            return self._wait_for_data(cluster, tsn)
+        return self._send_block(
+            cluster,
+            tsn,
+            image,
+            offset,
+            self.block_size(max_data_size),
+        )
+
+    def _wait_for_data(self, cluster, tsn):
+        # Current time 0 makes the request time relative
+        return cluster.reply(
+            tsn,
+            0x0005,
+            (t.uint8_t, t.uint32_t, t.uint32_t, t.uint16_t),
+            foundation.Status.WAIT_FOR_DATA,
+            0,
+            WAIT_DELAY,
+            0,
+        )
+
+    def _send_block(self, cluster, tsn, image, offset, size):
+        schema = (
+            t.uint8_t,
+            t.uint16_t,
+            t.uint16_t,
+            t.uint32_t,
+            t.uint32_t,
+            Block,
+        )
+        return cluster.reply(
+            tsn,
+            0x0005,
+            schema,
+            foundation.Status.SUCCESS,
+            image.header.manufacturer_code,
+            image.header.image_type,
+            image.version,
+            offset,
+            image.block(offset, size),
+        )
+
+    @asyncio.coroutine
+    def _image_page(self, cluster, ieee, tsn, manufacturer_code, image_type,
+                    version, offset, max_data_size, page_size,
+                    response_spacing):
+        image = self.store.get(manufacturer_code, image_type, version)
+        if image is None or offset >= image.size:
+            yield from cluster.reply(
+                tsn,
+                0x0005,
+                (t.uint8_t, ),
+                foundation.Status.ABORT,
+            )
+            return
+        if not self._start_session(ieee):
+            yield from self._wait_for_data(cluster, tsn)
+            return
+
+        size = self.block_size(max_data_size)
+        end = min(offset + page_size, image.size)
+        while offset < end:
+            self._sessions[ieee] = time.monotonic()
+            yield from self._send_block(
+                cluster,
+                tsn,
+                image,
+                offset,
+                min(size, end - offset),
+            )
+            offset += size
+            if offset < end:
+                yield from asyncio.sleep(response_spacing / 1000)
+
+    def _upgrade_end(self, cluster, ieee, tsn, status, manufacturer_code,
+                     image_type, version):
+        self._sessions.pop(ieee, None)
+        if status != foundation.Status.SUCCESS:
+            cluster.warn("OTA upgrade failed: %s", status)
+            return
+        cluster.info("OTA download of version 0x%08x complete", version)
+        schema = cluster.client_commands[0x0007][1]
+        # Current time 0 and upgrade time 0 means upgrade now
+        return cluster.reply(
+            tsn,
+            0x0007,
+            schema,
+            manufacturer_code,
+            image_type,
+            version,
+            0,
+            0,
+        )
@@ -0,0 +1,100 @@
+"""Work queued for sleepy end devices until they check in"""
+
+import asyncio
+import logging
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+class PollControl:
+    """Holds requests for sleepy devices until their next Poll Control
+    check-in
+
+    A device with work pending is told to fast poll on check-in, its queue is
+    run, and it is then sent Fast Poll Stop. Devices with nothing pending are
+    left to sleep. A device checking in again while its queue is still being
+    run is kept fast polling until it is done.
+    """
+    def __init__(self, fast_poll_timeout=0):
+        # Quarter seconds, 0 for the device's own fast_poll_timeout
+        self.fast_poll_timeout = fast_poll_timeout
+        # ieee -> [(send, future)]
+        self._queues = {}
+        # Devices whose queue is being run
+        self._running = set()
+
+    def pending(self, ieee):
+        return len(self._queues.get(ieee, ()))
+
+    def queue(self, ieee, send):
+        """Run send at the device's next check-in
+
+        send is called with no arguments and returns a coroutine or future,
+        eg lambda: cluster.write_attributes({...}). Returns a future with its
+        outcome.
+        """
+        fut = asyncio.Future()
+        self._queues.setdefault(ieee, []).append((send, fut))
+        return fut
+
+    def forget(self, ieee):
+        """Fail the work queued for a device which has left"""
+        for send, fut in self._queues.pop(ieee, ()):
+            if not fut.done():
+                fut.set_exception(Exception("Device left the network"))
+
+    def checkin(self, cluster, tsn):
+        ieee = cluster._endpoint._device._ieee
+        schema = cluster.server_commands[0x0000][1]
+        if ieee in self._running:
+            # The queue being run picks up anything queued since
+            cluster.debug("Check-in while running its queue")
+            return cluster.reply(
+                tsn,
+                0x0000,
+                schema,
+                True,
+                self.fast_poll_timeout,
+                to_server=True,
+            )
+
+        queue = self._queues.pop(ieee, None)
+        if not queue:
+            cluster.debug("Check-in, nothing pending")
+            return cluster.reply(tsn, 0x0000, schema, False, 0, to_server=True)
+
+        cluster.debug("Check-in, %s requests pending", len(queue))
+        cluster.reply(
+            tsn,
+            0x0000,
+            schema,
+            True,
+            self.fast_poll_timeout,
+            to_server=True,
+        )
+        self._running.add(ieee)
+        return asyncio.async(self._run(cluster, ieee, queue))
+
+    @asyncio.coroutine
+    def _run(self, cluster, ieee, queue):
+        try:
+            while queue:
+                for send, fut in queue:
+                    if fut.done():
+                        continue
+                    try:
+                        result = yield from send()
+                    except Exception as e:
+                        fut.set_exception(e)
+                    else:
+                        fut.set_result(result)
+                # Anything queued meanwhile goes out before fast polling stops
+                queue = self._queues.pop(ieee, None)
+
+            try:
+                yield from cluster.command(0x0001, expect_reply=False)
+            except Exception as e:
+                cluster.warn("Failed to stop fast polling: %s", e)
+        finally:
+            self._running.discard(ieee)
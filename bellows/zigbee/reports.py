@@ -0,0 +1,124 @@
+"""Delivery of attribute updates to application subscribers"""
+
+import asyncio
+import collections
+import logging
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+AttributeUpdate = collections.namedtuple(
+    'AttributeUpdate',
+    'ieee endpoint_id cluster_id attrid value',
+)
+
+
+class Subscription:
+    """A callback for updates matching a device, cluster and attribute
+
+    None for ieee, cluster_id or attrid matches any. The callback is called
+    with a list of AttributeUpdate, holding every matching update which
+    arrived in one pass of the event loop.
+
+    With suppress_unchanged, an update is only delivered if its value differs
+    from the last one delivered for that attribute. With threshold, numeric
+    values must have moved at least that much since the last delivery.
+    """
+    def __init__(self, callback, ieee=None, cluster_id=None, attrid=None,
+                 suppress_unchanged=False, threshold=None):
+        self.callback = callback
+        self.ieee = ieee
+        self.cluster_id = cluster_id
+        self.attrid = attrid
+        self.suppress_unchanged = suppress_unchanged
+        self.threshold = threshold
+        # (ieee, endpoint_id, cluster_id, attrid) -> last value delivered
+        self._last = {}
+        self._pending = None
+
+    @property
+    def key(self):
+        return (self.ieee, self.cluster_id, self.attrid)
+
+    def _accept(self, update):
+        if not self.suppress_unchanged and self.threshold is None:
+            return True
+
+        key = update[:4]
+        try:
+            last = self._last[key]
+        except KeyError:
+            self._last[key] = update.value
+            return True
+
+        if self.threshold is None:
+            changed = update.value != last
+        else:
+            try:
+                changed = abs(update.value - last) >= self.threshold
+            except TypeError:
+                changed = update.value != last
+        if changed:
+            self._last[key] = update.value
+        return changed
+
+    def _queue(self, update):
+        if not self._accept(update):
+            return
+        if self._pending is None:
+            self._pending = []
+            asyncio.get_event_loop().call_soon(self._flush)
+        self._pending.append(update)
+
+    def _flush(self):
+        updates, self._pending = self._pending, None
+        try:
+            self.callback(updates)
+        except Exception:
+            LOGGER.exception("Error delivering attribute updates")
+
+
+class Reports:
+    """Attribute update subscriptions for an application"""
+    def __init__(self):
+        # (ieee, cluster_id, attrid) -> [Subscription]
+        self._subscriptions = {}
+
+    def subscribe(self, callback, ieee=None, cluster_id=None, attrid=None,
+                  suppress_unchanged=False, threshold=None):
+        sub = Subscription(
+            callback,
+            ieee,
+            cluster_id,
+            attrid,
+            suppress_unchanged,
+            threshold,
+        )
+        self._subscriptions.setdefault(sub.key, []).append(sub)
+        return sub
+
+    def unsubscribe(self, subscription):
+        subs = self._subscriptions.get(subscription.key, [])
+        if subscription in subs:
+            subs.remove(subscription)
+        if not subs:
+            self._subscriptions.pop(subscription.key, None)
+
+    def attribute_updated(self, ieee, endpoint_id, cluster_id, attrid, value):
+        if not self._subscriptions:
+            return
+
+        update = AttributeUpdate(ieee, endpoint_id, cluster_id, attrid, value)
+        for key in (
+            (ieee, cluster_id, attrid),
+            (ieee, cluster_id, None),
+            (ieee, None, attrid),
+            (ieee, None, None),
+            (None, cluster_id, attrid),
+            (None, cluster_id, None),
+            (None, None, attrid),
+            (None, None, None),
+        ):
+            for sub in self._subscriptions.get(key, ()):
+                sub._queue(update)
@@ -0,0 +1,154 @@
+import asyncio
+import logging
+
+import bellows.types as t
+from bellows.zigbee import zcl
+from bellows.zigbee.zcl import foundation
+
+
+LOGGER = logging.getLogger(__name__)
+
+SCENES_CLUSTER = 0x0005
+
+
+def _add_schema():
+    # Looked up through the registry, so the general clusters are only
+    # imported once scenes are actually used
+    return zcl.Cluster._registry[SCENES_CLUSTER].server_commands[0][1]
+
+
+class Scene:
+    """A scene for the members of a group
+
+    extensions maps cluster IDs to the list of typed attribute values the
+    scene sets on that cluster, in the order the cluster's specification
+    gives, eg {0x0006: [t.Bool(1)], 0x0008: [t.uint8_t(254)]}.
+    """
+    def __init__(self, group_id, scene_id, extensions, name='',
+                 transition_time=0):
+        self.group_id = group_id
+        self.scene_id = scene_id
+        self.name = name
+        self.transition_time = transition_time
+        self.extensions = extensions
+
+    def add_args(self):
+        """Arguments for the Scenes cluster add command"""
+        # Imported here so the general clusters still load on demand
+        from bellows.zigbee.zcl.clusters.general import ExtensionFieldSet
+
+        field_sets = []
+        for cluster_id, values in sorted(self.extensions.items()):
+            field_set = ExtensionFieldSet()
+            field_set.cluster_id = t.uint16_t(cluster_id)
+            field_set.extension_field_set = t.LVBytes(
+                b''.join(v.serialize() for v in values))
+            field_sets.append(field_set)
+        return (
+            t.uint16_t(self.group_id),
+            t.uint8_t(self.scene_id),
+            t.uint16_t(self.transition_time),
+            t.LVBytes(self.name.encode()),
+            field_sets,
+        )
+
+    @property
+    def fingerprint(self):
+        """The scene's content, to compare with what a device was given"""
+        return t.serialize(self.add_args(), _add_schema())
+
+
+class Scenes(dict):
+    """(group ID, scene ID) to Scene mapping for an application
+
+    Remembers what each member endpoint was last given, so that a scene is
+    only sent to the endpoints whose copy differs from its definition.
+    """
+    def __init__(self, application):
+        super().__init__()
+        self._application = application
+        # (group_id, scene_id) -> {(ieee, endpoint_id): fingerprint}
+        self._provisioned = {}
+
+    def define(self, group_id, scene_id, extensions, name='',
+               transition_time=0):
+        scene = Scene(group_id, scene_id, extensions, name, transition_time)
+        self[(group_id, scene_id)] = scene
+        return scene
+
+    def forget(self, ieee):
+        """Drop what is known to be stored on a device, eg after a reset"""
+        for provisioned in self._provisioned.values():
+            for key in [k for k in provisioned if k[0] == ieee]:
+                del provisioned[key]
+
+    def diverged(self, scene):
+        """Member endpoints which do not hold the current scene"""
+        group = self._application.groups[scene.group_id]
+        provisioned = self._provisioned.get((scene.group_id, scene.scene_id), {})
+        fingerprint = scene.fingerprint
+        return [
+            key for key in sorted(group.members)
+            if provisioned.get(key) != fingerprint
+        ]
+
+    @asyncio.coroutine
+    def provision(self, group_id, scene_id):
+        """Add the scene to every member endpoint not holding it already
+
+        Returns the add status for each endpoint it was sent to.
+        """
+        scene = self[(group_id, scene_id)]
+        provisioned = self._provisioned.setdefault((group_id, scene_id), {})
+        fingerprint = scene.fingerprint
+        keys = self.diverged(scene)
+        results = yield from asyncio.gather(
+            *[self._add(key, scene) for key in keys],
+            return_exceptions=True
+        )
+
+        statuses = {}
+        for key, result in zip(keys, results):
+            if isinstance(result, Exception):
+                LOGGER.warning("Failed to add scene to %s: %s", key, result)
+                statuses[key] = result
+                continue
+            # The add response echoes the group and scene, where a Default
+            # Response has the command ID, which reads as SUCCESS, then the
+            # status
+            if len(result) == 3 and result[1] == group_id:
+                statuses[key] = result[0]
+                added = result[0] == foundation.Status.SUCCESS
+            else:
+                LOGGER.warning("Failed to add scene to %s: %s", key, result)
+                statuses[key] = result[1]
+                added = False
+            if added:
+                provisioned[key] = fingerprint
+            else:
+                provisioned.pop(key, None)
+        return statuses
+
+    @asyncio.coroutine
+    def _add(self, key, scene):
+        ieee, endpoint_id = key
+        endpoint = self._application.devices[ieee].endpoints[endpoint_id]
+        try:
+            cluster = endpoint.clusters[SCENES_CLUSTER]
+        except KeyError:
+            cluster = zcl.Cluster.from_id(endpoint, SCENES_CLUSTER)
+        v = yield from cluster.command(0x0000, *scene.add_args())
+        return v
+
+    @asyncio.coroutine
+    def recall(self, group_id, scene_id, provision=True):
+        """Recall a scene on the whole group with one multicast
+
+        Unless provision is unset, endpoints not holding the current scene
+        are given it first.
+        """
+        if provision:
+            yield from self.provision(group_id, scene_id)
+        group = self._application.groups[group_id]
+        v = yield from group[SCENES_CLUSTER].command(0x0005, group_id, scene_id)
+        return v
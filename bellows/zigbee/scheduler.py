@@ -0,0 +1,149 @@
+"""Fair sharing of the NCP between requests to different devices"""
+
+import asyncio
+import collections
+import logging
+import time
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+QueueStats = collections.namedtuple(
+    'QueueStats',
+    'in_flight depth requests mean_wait max_wait',
+)
+
+
+class DeviceQueue:
+    """Requests to one device, in flight or waiting for a slot"""
+    def __init__(self):
+        self.limit = 1
+        self.in_flight = 0
+        # (future, time queued)
+        self.waiting = collections.deque()
+        self.requests = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def stats(self):
+        mean_wait = self.total_wait / self.requests if self.requests else 0.0
+        return QueueStats(
+            self.in_flight,
+            len(self.waiting),
+            self.requests,
+            mean_wait,
+            self.max_wait,
+        )
+
+    def _started(self, queued):
+        wait = time.monotonic() - queued
+        self.in_flight += 1
+        self.requests += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+
+
+class Scheduler:
+    """Limits the requests in flight, per device and in total
+
+    A device gets at most device_in_flight requests in flight, or
+    sleepy_in_flight if it sleeps, and the network max_in_flight. When a
+    slot frees up, devices with requests waiting take turns, so one slow
+    device cannot hold up the rest.
+    """
+    def __init__(self, max_in_flight=10, device_in_flight=4,
+                 sleepy_in_flight=1):
+        # The NCP's default APS unicast message count is 10
+        self.max_in_flight = max_in_flight
+        self.device_in_flight = device_in_flight
+        self.sleepy_in_flight = sleepy_in_flight
+        self.in_flight = 0
+        # key -> DeviceQueue
+        self._queues = {}
+        # Keys with requests waiting, in the order they get a turn
+        self._ready = collections.OrderedDict()
+
+    def limit(self, device):
+        """Requests device may have in flight at once"""
+        if device is None:
+            return self.device_in_flight
+        if device.max_in_flight is not None:
+            return device.max_in_flight
+        if device.rx_on_when_idle is False:
+            return self.sleepy_in_flight
+        return self.device_in_flight
+
+    def stats(self, key):
+        try:
+            return self._queues[key].stats()
+        except KeyError:
+            return QueueStats(0, 0, 0, 0.0, 0.0)
+
+    @asyncio.coroutine
+    def acquire(self, key, limit):
+        """Wait for a slot to send a request to the device key"""
+        queue = self._queues.setdefault(key, DeviceQueue())
+        queue.limit = limit
+        queued = time.monotonic()
+        if not queue.waiting and self._free(queue):
+            self._start(queue, queued)
+            return
+
+        fut = asyncio.Future()
+        queue.waiting.append((fut, queued))
+        self._ready[key] = True
+        try:
+            yield from fut
+        except asyncio.CancelledError:
+            if fut.cancelled():
+                try:
+                    queue.waiting.remove((fut, queued))
+                except ValueError:
+                    pass  # Already dropped by _dispatch
+                if not queue.waiting:
+                    self._ready.pop(key, None)
+            else:
+                # Cancelled after being given a slot
+                self.release(key)
+            raise
+
+    def release(self, key):
+        queue = self._queues[key]
+        queue.in_flight -= 1
+        self.in_flight -= 1
+        self._dispatch()
+
+    def forget(self, key):
+        """Drop the statistics of a device which has left"""
+        queue = self._queues.get(key)
+        if queue is not None and not queue.in_flight and not queue.waiting:
+            del self._queues[key]
+
+    def _free(self, queue):
+        return (self.in_flight < self.max_in_flight and
+                queue.in_flight < queue.limit)
+
+    def _start(self, queue, queued):
+        queue._started(queued)
+        self.in_flight += 1
+
+    def _dispatch(self):
+        while self.in_flight < self.max_in_flight:
+            for key in self._ready:
+                queue = self._queues[key]
+                if queue.in_flight < queue.limit:
+                    break
+            else:
+                return
+
+            fut, queued = queue.waiting.popleft()
+            if queue.waiting:
+                self._ready.move_to_end(key)
+            else:
+                del self._ready[key]
+            if fut.done():
+                # Cancelled, but acquire() has not run yet to withdraw it
+                continue
+            self._start(queue, queued)
+            fut.set_result(None)
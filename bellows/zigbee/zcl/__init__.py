@@ -1,5 +1,6 @@
 import asyncio
 import logging
+import time
 
 import bellows.types as t
 from . import foundation
@@ -7,26 +8,69 @@ from . import foundation
 
 LOGGER = logging.getLogger(__name__)
 
+# Bytes assumed for attribute values without a fixed size
+VALUE_SIZE_ESTIMATE = 16
 
-def deserialize(aps_frame, data):
-    frame_control, data = data[0], data[1:]
-    frame_type = frame_control & 0b0011
-    direction = (frame_control & 0b1000) >> 3
-    if frame_control & 0b0100:
-        # Manufacturer specific value present
-        data = data[2:]
-    tsn, command_id, data = data[0], data[1], data[2:]
 
+class Command(int):
+    """A ZCL command ID, as decoded from a frame
+
+    manufacturer is the manufacturer code from the frame header, or None when
+    the frame is not manufacturer specific.
+    """
+    def __new__(cls, command_id, manufacturer=None):
+        self = super().__new__(cls, command_id)
+        self.manufacturer = manufacturer
+        return self
+
+    def __repr__(self):
+        if self.manufacturer is None:
+            return '<%s 0x%02x>' % (self.__class__.__name__, self)
+        return '<%s 0x%02x manufacturer=0x%04x>' % (
+            self.__class__.__name__, self, self.manufacturer)
+
+
+class GeneralCommand(Command):
+    """A profile-wide command, defined in foundation.COMMANDS"""
+
+
+class ClusterCommand(Command):
+    """A cluster-specific command"""
+
+
+# (cluster_id, frame_type, direction, manufacturer, command_id) ->
+#     (decoder, command, is_reply)
+_dispatch = {}
+# Keys come from the frames received, so a device sending garbage, or many
+# manufacturer codes, could otherwise grow the table without bound
+DISPATCH_MAX = 1024
+
+
+def _decoder(schema):
+    if len(schema) == 1:
+        deserialize = schema[0].deserialize
+
+        def decode(data):
+            value, data = deserialize(data)
+            return [value], data
+        return decode
+
+    def decode(data):
+        return t.deserialize(data, schema)
+    return decode
+
+
+def _compile(cluster_id, frame_type, direction, manufacturer, command_id):
     is_reply = bool(direction)
 
     if frame_type == 1:
         # Cluster command
-        if aps_frame.clusterId not in Cluster._registry:
-            LOGGER.warning("Ignoring unknown cluster ID 0x%04x",
-                           aps_frame.clusterId)
-            return tsn, command_id + 256, is_reply, data
-        cluster = Cluster._registry[aps_frame.clusterId]
-        # Cluster-specific command
+        command = ClusterCommand(command_id, manufacturer)
+        try:
+            cluster = Cluster._registry[cluster_id]
+        except KeyError:
+            LOGGER.warning("Ignoring unknown cluster ID 0x%04x", cluster_id)
+            return None, command, is_reply
 
         if direction:
             commands = cluster.client_commands
@@ -38,41 +82,106 @@ def deserialize(aps_frame, data):
             is_reply = commands[command_id][2]
         except KeyError:
             LOGGER.warning("Unknown cluster-specific command %s", command_id)
-            return tsn, command_id + 256, is_reply, data
-
-        # Bad hack to differentiate foundation vs cluster
-        command_id = command_id + 256
+            return None, command, is_reply
     else:
         # General command
+        command = GeneralCommand(command_id, manufacturer)
         try:
             schema = foundation.COMMANDS[command_id][1]
             is_reply = foundation.COMMANDS[command_id][2]
         except KeyError:
             LOGGER.warning("Unknown foundation command %s", command_id)
-            return tsn, command_id, is_reply, data
+            return None, command, is_reply
 
-    value, data = t.deserialize(data, schema)
+    return _decoder(schema), command, is_reply
+
+
+def deserialize(aps_frame, data):
+    frame_control = data[0]
+    if frame_control & 0b0100:
+        # Manufacturer specific value present
+        manufacturer = data[1] | (data[2] << 8)
+        tsn, command_id, data = data[3], data[4], data[5:]
+    else:
+        manufacturer = None
+        tsn, command_id, data = data[1], data[2], data[3:]
+
+    key = (
+        aps_frame.clusterId,
+        frame_control & 0b0011,
+        (frame_control & 0b1000) >> 3,
+        manufacturer,
+        command_id,
+    )
+    try:
+        decoder, command, is_reply = _dispatch[key]
+    except KeyError:
+        # Unknown commands are only warned about the first time they are seen
+        if len(_dispatch) >= DISPATCH_MAX:
+            _dispatch.clear()
+        decoder, command, is_reply = _dispatch[key] = _compile(*key)
+
+    if decoder is None:
+        return tsn, command, is_reply, data
+
+    value, data = decoder(data)
     if data != b'':
         # TODO: Seems sane to check, but what should we do?
         LOGGER.warning("Data remains after deserializing ZCL frame")
 
-    return tsn, command_id, is_reply, value
+    return tsn, command, is_reply, value
+
+
+class LazyRegistry(dict):
+    """Cluster ID to Cluster class mapping
+
+    Looking up an ID which is not registered yet imports the cluster module
+    covering it, so that only the clusters actually seen are loaded.
+    """
+    def __init__(self):
+        super().__init__()
+        self._looked_up = set()
+
+    def __missing__(self, cluster_id):
+        if cluster_id in self._looked_up:
+            raise KeyError(cluster_id)
+        self._looked_up.add(cluster_id)
+        clusters.load(cluster_id)
+        return self[cluster_id]
 
 
 class Registry(type):
     def __init__(cls, name, bases, nmspc):
         super(Registry, cls).__init__(name, bases, nmspc)
+        cls._attridx = {a[0]: attrid for attrid, a in cls.attributes.items()}
         if hasattr(cls, 'cluster_id'):
             cls._registry[cls.cluster_id] = cls
+            # Drop anything compiled before this cluster was known
+            for key in [k for k in _dispatch if k[0] == cls.cluster_id]:
+                del _dispatch[key]
 
 
 class Cluster(metaclass=Registry):
-    """A cluster on an endpoint"""
-    _registry = {}
+    """A cluster on an endpoint
+
+    Wherever an attribute is taken, it may be given by ID or by name.
+    """
+    _registry = LazyRegistry()
+    attributes = {}
+    # Seconds to wait for more reads to batch with the first one
+    read_window = 0.01
+    # Seconds a cached attribute value stays fresh, None to always read it
+    # from the device
+    cache_max_age = None
 
     def __init__(self, endpoint):
         self._endpoint = endpoint
         self._attr_cache = {}
+        self._attr_time = {}
+        self._attr_max_age = {}
+        self._read_batch = None
+        # key -> [latest queued send, futures waiting on it]
+        self._coalescing = {}
 
     @classmethod
     def from_id(cls, endpoint, cluster_id):
@@ -84,48 +193,279 @@ class Cluster(metaclass=Registry):
             c.cluster_id = cluster_id
             return c
 
-    def request(self, general, command_id, schema, *args):
+    def _frame(self, general, command_id, schema, *args,
+               disable_default_response=False):
         aps = self._endpoint.get_aps(self.cluster_id)
         if general:
             frame_control = 0x00
         else:
             frame_control = 0x01
-        data = bytes([frame_control, aps.sequence, command_id])
-        data += t.serialize(args, schema)
-
-        return self._endpoint._device.request(aps, data)
+        if disable_default_response:
+            frame_control |= 0x10
+        data = bytearray([frame_control, aps.sequence, command_id])
+        t.serialize_into(data, args, schema)
+        return aps, data
+
+    def request(self, general, command_id, schema, *args, expect_reply=True):
+        """Send a command to the cluster
+
+        Without expect_reply, the default response is disabled and the
+        request completes once the NCP reports the frame delivered.
+        """
+        aps, data = self._frame(
+            general,
+            command_id,
+            schema,
+            *args,
+            disable_default_response=not expect_reply
+        )
+        return self._endpoint._device.request(
+            aps,
+            data,
+            expect_reply=expect_reply,
+        )
+
+    def reply(self, tsn, command_id, schema, *args, to_server=False):
+        """Send a cluster-specific command answering the request tsn
+
+        The answer goes from the server side of the cluster to the client,
+        unless to_server is set.
+        """
+        aps = self._endpoint.get_aps(self.cluster_id)
+        # Cluster specific, default response disabled
+        frame_control = 0x11 if to_server else 0x19
+        data = bytearray([frame_control, tsn, command_id])
+        t.serialize_into(data, args, schema)
+        return self._endpoint._device.reply(aps, data)
 
     def handle_request(self, aps_frame, tsn, command_id, args):
-        if command_id == 0x0a:  # Report attributes
-            valuestr = ", ".join([
-                "%s=%s" % (a.attrid, a.value.value) for a in args[0]
-            ])
-            self.debug("Attribute report received: %s", valuestr)
-            for attr in args[0]:
-                self._attr_cache[attr.attrid] = attr.value.value
-        elif command_id > 0xff:
-            # Unencapsulate bad hack
-            command_id -= 256
+        if isinstance(command_id, ClusterCommand):
             self.handle_cluster_request(aps_frame, tsn, command_id, args)
+        elif command_id == 0x0a:  # Report attributes
+            if LOGGER.isEnabledFor(logging.DEBUG):
+                valuestr = ", ".join([
+                    "%s=%s" % (a.attrid, a.value.value) for a in args[0]
+                ])
+                self.debug("Attribute report received: %s", valuestr)
+            for attr in args[0]:
+                self._update_attribute(attr.attrid, attr.value.value)
         else:
             self.warn("No handler for general command %s", command_id)
 
     def handle_cluster_request(self, aps_frame, tsn, command_id, args):
         self.warn("No handler for cluster command %s", command_id)
 
+    def _resolve_attribute(self, attribute):
+        if isinstance(attribute, str):
+            try:
+                return self._attridx[attribute]
+            except KeyError:
+                raise ValueError("Unknown attribute %r for cluster %s" % (
+                    attribute, self.name))
+        return attribute
+
+    def _update_attribute(self, attrid, value):
+        self._attr_cache[attrid] = value
+        self._attr_time[attrid] = time.monotonic()
+        device = self._endpoint._device
+        device._application.reports.attribute_updated(
+            device._ieee,
+            self._endpoint._endpoint_id,
+            self.cluster_id,
+            attrid,
+            value,
+        )
+
+    def set_max_age(self, max_age, attribute=None):
+        """Set how long cached values stay fresh, in seconds
+
+        Applies to the whole cluster unless attribute is given. None means
+        values are always read from the device.
+        """
+        if attribute is None:
+            self.cache_max_age = max_age
+        else:
+            self._attr_max_age[self._resolve_attribute(attribute)] = max_age
+
+    def cache_age(self, attribute):
+        """Seconds since the cached value of attribute was updated, or None"""
+        try:
+            return time.monotonic() - self._attr_time[
+                self._resolve_attribute(attribute)]
+        except KeyError:
+            return None
+
+    def get_cached(self, attribute, default=None):
+        """The last known value of attribute, however old"""
+        return self._attr_cache.get(self._resolve_attribute(attribute), default)
+
+    def _cached_record(self, attrid, max_age, now):
+        if max_age is None:
+            max_age = self._attr_max_age.get(attrid, self.cache_max_age)
+        if max_age is None or attrid not in self._attr_time:
+            return None
+        if now - self._attr_time[attrid] > max_age:
+            return None
+
+        record = foundation.ReadAttributeRecord()
+        record.attrid = attrid
+        record.status = foundation.Status.SUCCESS
+        record.value = foundation.TypeValue()
+        python_type = self.attributes.get(attrid, (None, None))[1]
+        record.value.type = foundation.DATA_TYPE_IDX.get(python_type)
+        record.value.value = self._attr_cache[attrid]
+        return record
+
+    @asyncio.coroutine
+    def read_attributes(self, attributes, max_age=None):
+        """Read attributes, sharing a frame with other reads on this cluster
+
+        Attributes with a cached value younger than max_age seconds, or the
+        cluster's freshness policy when max_age is None, are answered from
+        the cache. The rest are read from the device: reads issued within
+        read_window seconds of each other are merged into as few Read
+        Attributes frames as fit the NCP's maximum payload. Each caller only
+        gets the records for the attributes it asked for.
+        """
+        attributes = [
+            t.uint16_t(self._resolve_attribute(a)) for a in attributes
+        ]
+        now = time.monotonic()
+        cached = {}
+        for attrid in attributes:
+            record = self._cached_record(attrid, max_age, now)
+            if record is not None:
+                cached[attrid] = record
+        missing = [a for a in attributes if a not in cached]
+        if not missing:
+            return [[cached[a] for a in attributes]]
+
+        fut = asyncio.Future()
+        if self._read_batch is None:
+            self._read_batch = []
+            loop = asyncio.get_event_loop()
+            loop.call_later(self.read_window, self._flush_reads)
+        self._read_batch.append((missing, fut))
+        v = yield from fut
+        if not cached:
+            return v
+
+        records = {r.attrid: r for r in v[0]}
+        records.update(cached)
+        return [[records[a] for a in attributes if a in records]]
+
+    def _flush_reads(self):
+        batch, self._read_batch = self._read_batch, None
+        attributes = []
+        for attrs, fut in batch:
+            for attrid in attrs:
+                if attrid not in attributes:
+                    attributes.append(attrid)
+        asyncio.async(self._read_batched(batch, attributes))
+
+    def _split_reads(self, attributes):
+        """Split attribute IDs so both request and response fit a frame"""
+        max_payload = self._endpoint._device._application.max_payload
+        chunks = []
+        chunk, request_size, response_size = [], 3, 3
+        for attrid in attributes:
+            # attrid, status, type and the value
+            record_size = 4 + getattr(
+                self.attributes.get(attrid, (None, None))[1],
+                '_size',
+                VALUE_SIZE_ESTIMATE,
+            )
+            if chunk and (request_size + 2 > max_payload or
+                          response_size + record_size > max_payload):
+                chunks.append(chunk)
+                chunk, request_size, response_size = [], 3, 3
+            chunk.append(attrid)
+            request_size += 2
+            response_size += record_size
+        if chunk:
+            chunks.append(chunk)
+        return chunks
+
+    @asyncio.coroutine
+    def _read_batched(self, batch, attributes):
+        try:
+            records = yield from self._read_chunks(attributes)
+        except Exception as e:
+            for attrs, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+
+        for attrs, fut in batch:
+            if fut.done():
+                continue
+            mine = [records[a] for a in attrs if a in records]
+            for record in mine:
+                if isinstance(record, Exception):
+                    fut.set_exception(record)
+                    break
+            else:
+                fut.set_result([mine])
+
     @asyncio.coroutine
-    def read_attributes(self, attributes):
+    def _read_chunks(self, attributes):
+        """Read attributes, as few at a time as fit a frame
+
+        Returns the record, or the exception, for each attribute.
+        """
+        chunks = self._split_reads(attributes)
         schema = foundation.COMMANDS[0x00][1]
-        attributes = [t.uint16_t(a) for a in attributes]
-        v = yield from self.request(True, 0x00, schema, attributes)
-        for record in v[0]:
-            if record.status == 0:
-                self._attr_cache[record.attrid] = record.value.value
-        return v
-
-    def write_attributes(self, attributes):
+        results = yield from asyncio.gather(
+            *[self.request(True, 0x00, schema, chunk) for chunk in chunks],
+            return_exceptions=True
+        )
+
+        records = {}
+        for chunk, result in zip(chunks, results):
+            if not isinstance(result, Exception) and \
+                    not isinstance(result[0], list):
+                # A Default Response, [command, status]
+                result = Exception(
+                    "Read attributes failed: %s" % (result[1], ))
+            if isinstance(result, Exception):
+                for attrid in chunk:
+                    records[attrid] = result
+                continue
+            for record in result[0]:
+                if record.status == 0:
+                    self._update_attribute(record.attrid, record.value.value)
+                records[record.attrid] = record
+        return records
+
+    def write_attributes(self, attributes, undivided=False, no_response=False,
+                         coalesce=False):
+        """Write attributes, given as a mapping of attribute to value
+
+        The records are split over as many frames as needed to fit the NCP's
+        maximum payload, unless undivided is set, in which case they must fit
+        one frame. Returns a coroutine giving the status for each attribute
+        ID, or None for each with no_response.
+
+        With coalesce, a write to the same attributes as one in flight is
+        held back, and replaces any write already held back.
+
+        Undivided writes always have a response, so undivided and
+        no_response cannot both be set.
+        """
+        if undivided and no_response:
+            raise ValueError("Undivided writes cannot have no_response")
+        if coalesce:
+            key = ('write', frozenset(
+                self._resolve_attribute(a) for a in attributes))
+            return self._coalesced(key, lambda: self.write_attributes(
+                attributes,
+                undivided=undivided,
+                no_response=no_response,
+            ))
+
         args = []
         for attrid, value in attributes.items():
+            attrid = self._resolve_attribute(attrid)
             a = foundation.Attribute()
             a.attrid = t.uint16_t(attrid)
             a.value = foundation.TypeValue()
@@ -133,8 +473,175 @@ class Cluster(metaclass=Registry):
             a.value.type = t.uint8_t(foundation.DATA_TYPE_IDX[python_type])
             a.value.value = python_type(value)
             args.append(a)
-        schema = foundation.COMMANDS[0x02][1]
-        return self.request(True, 0x02, schema, args)
+
+        chunks = self._split_records(args)
+        if undivided:
+            if len(chunks) > 1:
+                raise ValueError("Attributes do not fit a single frame")
+            command_id = 0x03
+        elif no_response:
+            command_id = 0x05
+        else:
+            command_id = 0x02
+        schema = foundation.COMMANDS[command_id][1]
+
+        # Cached values are stale until the device says what it took
+        for record in args:
+            self._attr_time.pop(record.attrid, None)
+
+        if no_response:
+            sent = []
+            for chunk in chunks:
+                aps, data = self._frame(True, command_id, schema, chunk)
+                sent.append(self._endpoint._device.reply(aps, data))
+            return self._sent(sent, args)
+
+        requests = [
+            self.request(True, command_id, schema, chunk) for chunk in chunks
+        ]
+        return self._write_statuses(requests, chunks)
+
+    @asyncio.coroutine
+    def _write_statuses(self, requests, chunks):
+        statuses = yield from self._record_statuses(requests, chunks)
+        for chunk in chunks:
+            for record in chunk:
+                if statuses[record.attrid] == foundation.Status.SUCCESS:
+                    self._update_attribute(record.attrid, record.value.value)
+        return statuses
+
+    def _split_records(self, records):
+        """Split records into lists which each fit in one frame"""
+        # Less the frame control, sequence and command ID
+        max_size = self._endpoint._device._application.max_payload - 3
+        chunks = []
+        chunk, size = [], 0
+        for record in records:
+            record_size = len(record.serialize())
+            if chunk and size + record_size > max_size:
+                chunks.append(chunk)
+                chunk, size = [], 0
+            chunk.append(record)
+            size += record_size
+        if chunk:
+            chunks.append(chunk)
+        return chunks
+
+    @asyncio.coroutine
+    def _record_statuses(self, requests, chunks):
+        results = yield from asyncio.gather(*requests)
+        statuses = {}
+        for chunk, result in zip(chunks, results):
+            if not isinstance(result[0], list):
+                # A Default Response, [command, status], answers the whole
+                # frame, eg when the command is not supported
+                for record in chunk:
+                    statuses[record.attrid] = result[1]
+                continue
+            # Only failures are listed, or a single success record if none
+            failed = {r.attrid: r.status for r in result[0] if r.status != 0}
+            for record in chunk:
+                statuses[record.attrid] = failed.get(
+                    record.attrid,
+                    foundation.Status.SUCCESS,
+                )
+        return statuses
+
+    @asyncio.coroutine
+    def _sent(self, sent, records):
+        for v in (yield from asyncio.gather(*sent)):
+            if v[0] != 0:
+                raise Exception("Message send failure %s" % (v[0], ))
+        return {record.attrid: None for record in records}
+
+    @asyncio.coroutine
+    def _coalesced(self, key, send):
+        """Run send, or queue it to run after the request for key in flight
+
+        Only the latest queued send is run; everyone whose send was replaced
+        gets its outcome.
+        """
+        fut = asyncio.Future()
+        try:
+            state = self._coalescing[key]
+        except KeyError:
+            self._coalescing[key] = [None, []]
+            asyncio.async(self._run_coalesced(key, send, [fut]))
+        else:
+            state[0] = send
+            state[1].append(fut)
+        return (yield from fut)
+
+    @asyncio.coroutine
+    def _run_coalesced(self, key, send, waiters):
+        while True:
+            try:
+                result = yield from send()
+            except Exception as e:
+                for fut in waiters:
+                    if not fut.done():
+                        fut.set_exception(e)
+            else:
+                for fut in waiters:
+                    if not fut.done():
+                        fut.set_result(result)
+
+            state = self._coalescing[key]
+            if state[0] is None:
+                del self._coalescing[key]
+                return
+            send, waiters = state
+            state[:] = [None, []]
+
+    @asyncio.coroutine
+    def discover_attributes(self, use_cache=True):
+        """Discover every attribute the cluster has, as {attrid: datatype}
+
+        Pages through Discover Attributes until the device reports discovery
+        complete. Results are shared with other devices of the same
+        manufacturer and model, which then need no discovery at all.
+        """
+        device = self._endpoint._device
+        cache = device._application.discovery_cache
+        key = None
+        if use_cache:
+            info = yield from device.model_info()
+            if info is not None:
+                key = info + (self.cluster_id, )
+                if key in cache:
+                    return dict(cache[key])
+
+        schema = foundation.COMMANDS[0x0c][1]
+        # Ask for as many 3 byte records as fit after the complete flag
+        max_count = (device._application.max_payload - 4) // 3
+        max_count = min(max(max_count, 1), 0xff)
+        attributes = {}
+        start = 0
+        while start <= 0xffff:
+            v = yield from self.request(
+                True,
+                0x0c,
+                schema,
+                start,
+                max_count,
+            )
+            if not isinstance(v[1], list):
+                # A Default Response, [command, status]
+                raise Exception("Failed to discover attributes: %s" % (v[1], ))
+            complete, records = v
+            for record in records:
+                attributes[record.attrid] = record.datatype
+            if complete or not records:
+                break
+            next_start = max(record.attrid for record in records) + 1
+            if next_start <= start:
+                # The device is not paging forwards
+                break
+            start = next_start
+
+        if key is not None:
+            cache[key] = dict(attributes)
+        return attributes
 
     def bind(self):
         return self._endpoint._device.zdo.bind(self._endpoint._endpoint_id, self.cluster_id)
@@ -142,8 +649,9 @@ class Cluster(metaclass=Registry):
     def unbind(self):
         return self._endpoint._device.zdo.unbind(self._endpoint._endpoint_id, self.cluster_id)
 
-    def configure_reporting(self, attribute, min_interval, max_interval, reportable_change):
-        schema = foundation.COMMANDS[0x06][1]
+    def _reporting_config(self, attribute, min_interval, max_interval,
+                          reportable_change):
+        attribute = self._resolve_attribute(attribute)
         cfg = foundation.AttributeReportingConfig()
         cfg.direction = 0
         cfg.attrid = attribute
@@ -153,11 +661,57 @@ class Cluster(metaclass=Registry):
         cfg.min_interval = min_interval
         cfg.max_interval = max_interval
         cfg.reportable_change = reportable_change
+        return cfg
+
+    def configure_reporting(self, attribute, min_interval, max_interval, reportable_change):
+        schema = foundation.COMMANDS[0x06][1]
+        cfg = self._reporting_config(
+            attribute,
+            min_interval,
+            max_interval,
+            reportable_change,
+        )
         return self.request(True, 0x06, schema, [cfg])
 
-    def command(self, command, *args):
+    def configure_reporting_multiple(self, attributes):
+        """Configure reporting for several attributes at once
+
+        attributes maps each attribute to a (min_interval, max_interval,
+        reportable_change) tuple. As many configurations as fit are sent per
+        frame. Returns a coroutine giving the status for each attribute ID.
+        """
+        schema = foundation.COMMANDS[0x06][1]
+        configs = [
+            self._reporting_config(attribute, *config)
+            for attribute, config in attributes.items()
+        ]
+        chunks = self._split_records(configs)
+        requests = [
+            self.request(True, 0x06, schema, chunk) for chunk in chunks
+        ]
+        return self._record_statuses(requests, chunks)
+
+    def command(self, command, *args, expect_reply=True, coalesce=False):
+        """Send a cluster command
+
+        With coalesce, a command sent while the same command is in flight is
+        held back, and replaces any held back before it.
+        """
+        if coalesce:
+            return self._coalesced(('command', command), lambda: self.command(
+                command,
+                *args,
+                expect_reply=expect_reply
+            ))
+
         schema = self.server_commands[command][1]
-        return self.request(False, command, schema, *args)
+        return self.request(
+            False,
+            command,
+            schema,
+            *args,
+            expect_reply=expect_reply
+        )
 
     @property
     def name(self):
@@ -184,5 +738,5 @@ class Cluster(metaclass=Registry):
     def error(self, msg, *args):
         return self.log(logging.ERROR, msg, *args)
 
-# Import to populate the registry
-from . import clusters
+# Cluster modules are imported on demand by LazyRegistry
+from . import clusters  # noqa: E402
@@ -1,11 +1,37 @@
-from . import closures
-from . import general
-from . import homeautomation
-from . import hvac
-from . import lighting
-from . import lightlink
-from . import manufacturer_specific
-from . import measurement
-from . import protocol
-from . import security
-from . import smartenergy
+"""Cluster definitions, one module per ZCL functional domain
+
+Modules are imported on demand, the first time a cluster ID from their range
+is looked up in the registry, rather than all at once on import.
+"""
+
+import importlib
+
+# (first cluster ID, last cluster ID, module)
+DOMAINS = [
+    (0x0000, 0x00ff, 'general'),
+    (0x0100, 0x01ff, 'closures'),
+    (0x0200, 0x02ff, 'hvac'),
+    (0x0300, 0x03ff, 'lighting'),
+    (0x0400, 0x04ff, 'measurement'),
+    (0x0500, 0x05ff, 'security'),
+    (0x0600, 0x06ff, 'protocol'),
+    (0x0700, 0x08ff, 'smartenergy'),
+    (0x0b00, 0x0bff, 'homeautomation'),
+    (0x1000, 0x10ff, 'lightlink'),
+    (0xfc00, 0xffff, 'manufacturer_specific'),
+]
+
+
+def load(cluster_id):
+    """Import the module defining cluster_id, returning True if there is one"""
+    for first, last, module in DOMAINS:
+        if first <= cluster_id <= last:
+            importlib.import_module('.' + module, __name__)
+            return True
+    return False
+
+
+def load_all():
+    """Import every cluster module"""
+    for first, last, module in DOMAINS:
+        importlib.import_module('.' + module, __name__)
@@ -139,6 +139,15 @@ class Groups(Cluster):
     }
 
 
+class ExtensionFieldSet(t.EzspStruct):
+    """Attribute values a scene sets on one cluster, serialized in the order
+    the cluster's specification gives"""
+    _fields = [
+        ('cluster_id', t.uint16_t),
+        ('extension_field_set', t.LVBytes),
+    ]
+
+
 class Scenes(Cluster):
     """Attributes and commands for scene configuration and
     manipulation."""
@@ -153,7 +162,7 @@ class Scenes(Cluster):
         0x0005: ('last_configured_by', t.EmberEUI64),
     }
     server_commands = {
-        0x0000: ('add', (t.uint16_t, t.uint8_t, t.uint16_t, t.LVBytes, ), False),  # + extension field sets
+        0x0000: ('add', (t.uint16_t, t.uint8_t, t.uint16_t, t.LVBytes, t.List(ExtensionFieldSet)), False),
         0x0001: ('view', (t.uint16_t, t.uint8_t), False),
         0x0002: ('remove', (t.uint16_t, t.uint8_t), False),
         0x0003: ('remove_all', (t.uint16_t, ), False),
@@ -555,20 +564,34 @@ class Ota(Cluster):
         0x000a: ('image_stamp', t.uint32_t),
     }
     server_commands = {
-        0x0001: ('query_next_image', (), False),
-        0x0003: ('image_block', (), False),
-        0x0004: ('image_page', (), False),
-        0x0006: ('upgrade_end', (), False),
-        0x0008: ('query_specific_file', (), False),
+        # + hardware version, if bit 0 of the field control is set
+        0x0001: ('query_next_image', (t.uint8_t, t.uint16_t, t.uint16_t, t.uint32_t, t.List(t.uint16_t)), False),
+        # + optional request node address and minimum block period
+        0x0003: ('image_block', (t.uint8_t, t.uint16_t, t.uint16_t, t.uint32_t, t.uint32_t, t.uint8_t, t.List(t.uint8_t)), False),
+        # + optional request node address
+        0x0004: ('image_page', (t.uint8_t, t.uint16_t, t.uint16_t, t.uint32_t, t.uint32_t, t.uint8_t, t.uint16_t, t.uint16_t, t.List(t.uint8_t)), False),
+        0x0006: ('upgrade_end', (t.uint8_t, t.uint16_t, t.uint16_t, t.uint32_t), False),
+        0x0008: ('query_specific_file', (t.EmberEUI64, t.uint16_t, t.uint16_t, t.uint32_t, t.uint16_t), False),
     }
     client_commands = {
-        0x0000: ('image_notify', (), False),
-        0x0002: ('query_next_image_response', (), True),
-        0x0005: ('image_block', (), False),
-        0x0007: ('upgrade_end_response', (), True),
-        0x0009: ('query_specific_file_response', (), True),
+        # + manufacturer code, image type and file version, by payload type
+        0x0000: ('image_notify', (t.uint8_t, t.uint8_t), False),
+        # Only the status, unless it is SUCCESS
+        0x0002: ('query_next_image_response', (t.uint8_t, t.uint16_t, t.uint16_t, t.uint32_t, t.uint32_t), True),
+        # The status is followed by wait times rather than data for WAIT_FOR_DATA
+        0x0005: ('image_block_response', (t.uint8_t, t.uint16_t, t.uint16_t, t.uint32_t, t.uint32_t, t.LVBytes), True),
+        0x0007: ('upgrade_end_response', (t.uint16_t, t.uint16_t, t.uint32_t, t.uint32_t, t.uint32_t), True),
+        # Only the status, unless it is SUCCESS
+        0x0009: ('query_specific_file_response', (t.uint8_t, t.uint16_t, t.uint16_t, t.uint32_t, t.uint32_t), True),
     }
 
+    def handle_cluster_request(self, aps_frame, tsn, command_id, args):
+        ota = self._endpoint._device._application.ota
+        if ota is None:
+            self.debug("No OTA server to handle command %s", command_id)
+            return
+        ota.handle_request(self, tsn, command_id, args)
+
 
 class PowerProfile(Cluster):
     cluster_id = 0x001a
@@ -650,15 +673,21 @@ class PollControl(Cluster):
         0x0006: ('fast_poll_timeout_max', t.uint16_t),
     }
     server_commands = {
-        0x0000: ('checkin_response', (), True),
+        0x0000: ('checkin_response', (t.Bool, t.uint16_t), True),
         0x0001: ('fast_poll_stop', (), False),
-        0x0002: ('set_long_poll_interval', (), False),
-        0x0003: ('set_short_poll_interval', (), False),
+        0x0002: ('set_long_poll_interval', (t.uint32_t, ), False),
+        0x0003: ('set_short_poll_interval', (t.uint16_t, ), False),
     }
     client_commands = {
         0x0000: ('checkin', (), False),
     }
 
+    def handle_cluster_request(self, aps_frame, tsn, command_id, args):
+        if command_id == 0x0000:
+            self._endpoint._device._application.poll_control.checkin(self, tsn)
+        else:
+            self.warn("No handler for cluster command %s", command_id)
+
 
 class GreenPowerProxy(Cluster):
     cluster_id = 0x0021
@@ -1,9 +1,7 @@
-import enum
-
 import bellows.types as t
 
 
-class Status(t.uint8_t, enum.Enum):
+class Status(t.enum8):
     SUCCESS = 0x00  # Operation was successful.
     FAILURE = 0x01  # Operation was not successful
     NOT_AUTHORIZED = 0x7e  # The sender of the command does not have
@@ -26,6 +24,11 @@ class Status(t.uint8_t, enum.Enum):
     WRITE_ONLY = 0x8f  # A request has been made to read an attribute
     INCONSISTENT_STARTUP_STATE = 0x90  # Setting the requested values would put
     DEFINED_OUT_OF_BAND = 0x91  # An attempt has been made to write an
+    ABORT = 0x95  # Failed case when a client or a server decides to abort the
+    INVALID_IMAGE = 0x96  # Invalid OTA upgrade image (ex. failed signature
+    WAIT_FOR_DATA = 0x97  # Server does not have data block available yet
+    NO_IMAGE_AVAILABLE = 0x98  # No OTA upgrade image available for a
+    REQUIRE_MORE_IMAGE = 0x99  # The client still requires more OTA upgrade
     HARDWARE_FAILURE = 0xc0  # An operation was unsuccessful due to a
     SOFTWARE_FAILURE = 0xc1  # An operation was unsuccessful due to a
     CALIBRATION_ERROR = 0xc2  # An error occurred during calibration.
@@ -109,7 +112,13 @@ DATA_TYPE_IDX[t.EmberEUI64] = 0xf0
 
 class TypeValue():
     def serialize(self):
-        return self.type.to_bytes(1, 'little') + self.value.serialize()
+        r = bytearray()
+        self.serialize_into(r)
+        return bytes(r)
+
+    def serialize_into(self, buf):
+        buf += self.type.to_bytes(1, 'little')
+        self.value.serialize_into(buf)
 
     @classmethod
     def deserialize(cls, data):
@@ -132,12 +141,15 @@ class ReadAttributeRecord():
         return r, data
 
     def serialize(self):
-        r = t.uint16_t(self.attrid).serialize()
-        r += t.uint8_t(self.status).serialize()
-        if self.status == 0:
-            r += self.value.serialize()
+        r = bytearray()
+        self.serialize_into(r)
+        return bytes(r)
 
-        return r
+    def serialize_into(self, buf):
+        t.uint16_t(self.attrid).serialize_into(buf)
+        t.uint8_t(self.status).serialize_into(buf)
+        if self.status == 0:
+            self.value.serialize_into(buf)
 
     def __repr__(self):
         r = '<ReadAttributeRecord attrid=%s status=%s' % (self.attrid, self.status)
@@ -163,21 +175,23 @@ class WriteAttributesStatusRecord(t.EzspStruct):
 
 class AttributeReportingConfig:
     def serialize(self):
-        r = int.to_bytes(self.direction, 1, 'little')
-        r += int.to_bytes(self.attrid, 2, 'little')
+        r = bytearray()
+        self.serialize_into(r)
+        return bytes(r)
+
+    def serialize_into(self, buf):
+        buf += int.to_bytes(self.direction, 1, 'little')
+        buf += int.to_bytes(self.attrid, 2, 'little')
         if self.direction:
-            r += int.to_bytes(self.timeout, 2, 'little')
+            buf += int.to_bytes(self.timeout, 2, 'little')
         else:
-            r += (
-                int.to_bytes(self.datatype, 1, 'little') +
-                int.to_bytes(self.min_interval, 2, 'little') +
-                int.to_bytes(self.max_interval, 2, 'little')
-            )
+            buf += int.to_bytes(self.datatype, 1, 'little')
+            buf += int.to_bytes(self.min_interval, 2, 'little')
+            buf += int.to_bytes(self.max_interval, 2, 'little')
             datatype = DATA_TYPES.get(self.datatype, None)
             if datatype and datatype[2] is Analog:
                 datatype = datatype[1]
-                r += datatype(self.reportable_change).serialize()
-        return r
+                datatype(self.reportable_change).serialize_into(buf)
 
     @classmethod
     def deserialize(cls, data):
@@ -236,7 +250,7 @@ COMMANDS = {
     0x0a: ('Report attributes', (t.List(Attribute), ), False),
     0x0b: ('Default response', (t.uint8_t, t.uint8_t), True),
     0x0c: ('Discover attributes', (t.uint16_t, t.uint8_t), False),
-    0x0d: ('Discover attributes response', (t.List(DiscoverAttributesResponseRecord), ), True),
+    0x0d: ('Discover attributes response', (t.Bool, t.List(DiscoverAttributesResponseRecord), ), True),
     # 0x0e: ('Read attributes structured', (, ), False),
     # 0x0f: ('Write attributes structured', (, ), False),
     # 0x10: ('Write attributes structured response', (, ), True),
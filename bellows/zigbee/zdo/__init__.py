@@ -33,9 +33,9 @@ class ZDO:
 
     def _serialize(self, command, *args):
         aps = self._device.get_aps(profile=0, cluster=command, endpoint=0)
-        data = aps.sequence.to_bytes(1, 'little')
+        data = bytearray(aps.sequence.to_bytes(1, 'little'))
         schema = types.CLUSTERS[command][2]
-        data += t.serialize(args, schema)
+        t.serialize_into(data, args, schema)
         return aps, data
 
     def request(self, command, *args):
@@ -58,7 +58,8 @@ class ZDO:
         elif command_id == 0x0006:  # Match_Desc_req
             self.handle_match_desc(*args)
         elif command_id == 0x0013:  # Device_annce
-            app.add_device(args[1], args[2])
+            dev = app.add_device(args[1], args[0])
+            dev.rx_on_when_idle = bool(args[2] & 0x08)
         else:
             LOGGER.warning("Unsupported ZDO request 0x%04x", command_id)
 
@@ -22,9 +22,12 @@ class SimpleDescriptor(t.EzspStruct):
 
 
 class SizePrefixedSimpleDescriptor(SimpleDescriptor):
-    def serialize(self):
-        data = super().serialize()
-        return len(data).to_bytes(1, 'little') + data
+    def serialize_into(self, buf):
+        # Reserve the size byte, and fill it in once the size is known
+        start = len(buf)
+        buf.append(0)
+        super().serialize_into(buf)
+        buf[start] = len(buf) - start - 1
 
     @classmethod
     def deserialize(cls, data):
@@ -69,17 +72,18 @@ class MultiAddress:
         return r, data
 
     def serialize(self):
+        r = bytearray()
+        self.serialize_into(r)
+        return bytes(r)
+
+    def serialize_into(self, buf):
         if self.addrmode == 0x01:
-            return (
-                self.addrmode.to_bytes(1, 'little') +
-                self.nwk.to_bytes(2, 'little')
-            )
+            buf += self.addrmode.to_bytes(1, 'little')
+            buf += self.nwk.to_bytes(2, 'little')
         elif self.addrmode == 0x03:
-            return (
-                self.addrmode.to_bytes(1, 'little') +
-                self.ieee.serialize() +
-                self.endpoint.to_bytes(1, 'little')
-            )
+            buf += self.addrmode.to_bytes(1, 'little')
+            self.ieee.serialize_into(buf)
+            buf += self.endpoint.to_bytes(1, 'little')
         else:
             raise ValueError("Invalid value for addrmode")
 
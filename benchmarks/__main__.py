@@ -0,0 +1,88 @@
+"""Run the benchmark suites, optionally checking for regressions
+
+Results are reported in microseconds per operation. They can be saved as
+JSON, and compared against a previously saved file:
+
+    python -m benchmarks --save baseline.json
+    python -m benchmarks --compare baseline.json --threshold 10
+
+With --compare, the exit status is 1 if any benchmark got slower than the
+baseline by more than the threshold percentage.
+"""
+
+import argparse
+import importlib
+import json
+import platform
+import sys
+
+SUITES = ['codecs', 'enums', 'imports']
+
+
+def run(suites):
+    results = {}
+    for suite in suites:
+        module = importlib.import_module('benchmarks.' + suite)
+        for name, seconds in module.run().items():
+            results['%s: %s' % (suite, name)] = seconds
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Return the benchmarks which regressed by more than threshold percent"""
+    regressions = []
+    for name, seconds in sorted(results.items()):
+        if name not in baseline:
+            continue
+        change = (seconds - baseline[name]) / baseline[name] * 100
+        if change > threshold:
+            regressions.append((name, baseline[name], seconds, change))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        'suites', nargs='*', metavar='SUITE',
+        help='suites to run, from %s (default: all)' % (', '.join(SUITES), ),
+    )
+    parser.add_argument('--save', metavar='FILE', help='write results as JSON')
+    parser.add_argument(
+        '--compare', metavar='FILE', help='JSON results to compare against',
+    )
+    parser.add_argument(
+        '--threshold', type=float, default=10.0, metavar='PERCENT',
+        help='slowdown allowed before failing a comparison (default: 10)',
+    )
+    args = parser.parse_args(argv)
+    for suite in args.suites:
+        if suite not in SUITES:
+            parser.error('unknown suite %s' % (suite, ))
+
+    results = run(args.suites or SUITES)
+    for name, seconds in sorted(results.items()):
+        print('%-64s %10.2f us' % (name, seconds * 1e6))
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({
+                'python': platform.python_version(),
+                'results': results,
+            }, f, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.threshold)
+        for name, before, after, change in regressions:
+            print('REGRESSION %s: %.2f us -> %.2f us (+%.1f%%)' % (
+                name, before * 1e6, after * 1e6, change,
+            ))
+        if regressions:
+            return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
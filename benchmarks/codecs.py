@@ -0,0 +1,133 @@
+"""Benchmarks for the type codecs and the frame decoding paths
+
+The payloads below were captured from a temperature/humidity sensor joined to
+an EmberZNet NCP. Run from the top of the source tree with
+``python -m benchmarks.codecs``, or through ``python -m benchmarks``.
+"""
+
+import timeit
+
+import bellows.types as t
+from bellows import ezsp, uart
+from bellows.zigbee import zcl, zdo
+from bellows.zigbee.zcl import foundation
+
+# ZCL Report Attributes: TemperatureMeasurement measured_value = 22.00C
+ZCL_REPORT = bytes.fromhex('185a0a0000299808')
+# ZCL Read Attributes Response from Basic: manufacturer_name, model_id and
+# power_source
+ZCL_READ_RESPONSE = bytes.fromhex(
+    '1801010400004204'
+    '4c554d4905000042126c756d692e73656e736f725f68742e61676c0700003003'
+)
+# ZDO Simple_Desc_rsp for endpoint 1
+ZDO_SIMPLE_DESC_RSP = bytes.fromhex(
+    '1200e41e1801040102030007000001000300200002040005050b011900'
+)
+# EZSP incomingMessageHandler carrying ZCL_REPORT
+EZSP_INCOMING_MESSAGE = bytes.fromhex(
+    '21904500040102040101400100005affd8e41effff08185a0a0000299808'
+)
+# ASH DATA frame carrying EZSP_INCOMING_MESSAGE, as read from the UART
+ASH_DATA_FRAME = bytes.fromhex(
+    '3563b1ed542e14b05d954b65ab55927d336396c3b512316f93a7cc6389d5e637e8cd7e'
+)
+
+
+def _aps(cluster_id):
+    aps = t.EmberApsFrame()
+    aps.clusterId = t.uint16_t(cluster_id)
+    return aps
+
+
+class _NullApplication:
+    def frame_received(self, data):
+        pass
+
+
+class _NullTransport:
+    def write(self, data):
+        pass
+
+
+def _gateway():
+    gw = uart.Gateway(_NullApplication())
+    gw._transport = _NullTransport()
+    return gw
+
+
+def _ezsp():
+    e = ezsp.EZSP()
+    e.add_callback(lambda frame_name, args: None)
+    return e
+
+
+def _struct():
+    aps, _ = t.EmberApsFrame.deserialize(EZSP_INCOMING_MESSAGE[4:15])
+    return aps
+
+
+def _benchmarks():
+    uint16 = t.uint16_t(0x1ee4)
+    uint16_list = t.List(t.uint16_t)(t.uint16_t(i) for i in range(16))
+    lvlist = t.LVList(t.uint16_t)
+    lvbytes = t.LVBytes(ZCL_READ_RESPONSE)
+    lvlist_data = bytes([16]) + uint16_list.serialize()
+    aps = _struct()
+    aps_data = aps.serialize()
+    typevalue, _ = foundation.TypeValue.deserialize(ZCL_REPORT[5:])
+    record_data = ZCL_READ_RESPONSE[-5:]
+    record, _ = foundation.ReadAttributeRecord.deserialize(record_data)
+    schema = ezsp.COMMANDS['incomingMessageHandler'][2]
+    incoming, _ = t.deserialize(EZSP_INCOMING_MESSAGE[3:], schema)
+    report_aps = _aps(0x0402)
+    basic_aps = _aps(0x0000)
+    zdo_aps = _aps(0x8004)
+    e = _ezsp()
+    gw = _gateway()
+
+    return [
+        ('uint16_t.serialize', lambda: uint16.serialize()),
+        ('uint16_t.deserialize', lambda: t.uint16_t.deserialize(b'\xe4\x1e')),
+        ('List(uint16_t).serialize', lambda: uint16_list.serialize()),
+        ('LVList(uint16_t).deserialize',
+            lambda: lvlist.deserialize(lvlist_data)),
+        ('LVBytes.serialize', lambda: lvbytes.serialize()),
+        ('LVBytes.deserialize',
+            lambda: t.LVBytes.deserialize(EZSP_INCOMING_MESSAGE[22:])),
+        ('EmberApsFrame.serialize', lambda: aps.serialize()),
+        ('EmberApsFrame.deserialize',
+            lambda: t.EmberApsFrame.deserialize(aps_data)),
+        ('serialize incomingMessageHandler',
+            lambda: t.serialize(incoming, schema)),
+        ('TypeValue.serialize', lambda: typevalue.serialize()),
+        ('TypeValue.deserialize',
+            lambda: foundation.TypeValue.deserialize(ZCL_REPORT[5:])),
+        ('ReadAttributeRecord.serialize', lambda: record.serialize()),
+        ('ReadAttributeRecord.deserialize',
+            lambda: foundation.ReadAttributeRecord.deserialize(record_data)),
+        ('zcl.deserialize report',
+            lambda: zcl.deserialize(report_aps, ZCL_REPORT)),
+        ('zcl.deserialize read response',
+            lambda: zcl.deserialize(basic_aps, ZCL_READ_RESPONSE)),
+        ('zdo.deserialize Simple_Desc_rsp',
+            lambda: zdo.deserialize(zdo_aps, ZDO_SIMPLE_DESC_RSP)),
+        ('EZSP.frame_received incomingMessageHandler',
+            lambda: e.frame_received(EZSP_INCOMING_MESSAGE)),
+        ('Gateway._data_frame',
+            lambda: gw._data_frame(EZSP_INCOMING_MESSAGE)),
+        ('Gateway.data_received', lambda: gw.data_received(ASH_DATA_FRAME)),
+    ]
+
+
+def run(number=10000, repeat=5):
+    results = {}
+    for name, fn in _benchmarks():
+        best = min(timeit.repeat(fn, number=number, repeat=repeat))
+        results[name] = best / number
+    return results
+
+
+if __name__ == '__main__':
+    for name, seconds in sorted(run().items()):
+        print('%-50s %8.2f us' % (name, seconds * 1e6))
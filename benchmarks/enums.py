@@ -0,0 +1,52 @@
+"""Benchmarks for decoding the enum fields found in most EZSP responses
+
+Run from the top of the source tree with ``python -m benchmarks.enums``, or
+through ``python -m benchmarks``.
+"""
+
+import timeit
+
+import bellows.types as t
+from bellows.types import basic
+
+
+def _metaclass_deserialize(cls, data):
+    """The decoding path used before table lookups, for comparison"""
+    return basic.int_t.deserialize.__func__(cls, data)
+
+
+def _decode(decoder, cls, data):
+    return lambda: decoder(cls, data)
+
+
+HOT_FIELDS = [
+    (t.EmberStatus, b'\x00'),
+    (t.EzspStatus, b'\x00'),
+    (t.EmberIncomingMessageType, b'\x00'),
+    (t.EmberOutgoingMessageType, b'\x00'),
+    (t.Bool, b'\x01'),
+]
+
+BENCHMARKS = []
+for cls, data in HOT_FIELDS:
+    BENCHMARKS.append((
+        '%s.deserialize' % (cls.__name__, ),
+        _decode(lambda cls, data: cls.deserialize(data), cls, data),
+    ))
+    BENCHMARKS.append((
+        '%s.deserialize (metaclass lookup)' % (cls.__name__, ),
+        _decode(_metaclass_deserialize, cls, data),
+    ))
+
+
+def run(number=100000, repeat=5):
+    results = {}
+    for name, fn in BENCHMARKS:
+        best = min(timeit.repeat(fn, number=number, repeat=repeat))
+        results[name] = best / number
+    return results
+
+
+if __name__ == '__main__':
+    for name, seconds in sorted(run().items()):
+        print('%-56s %8.1f ns' % (name, seconds * 1e9))
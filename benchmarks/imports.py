@@ -0,0 +1,67 @@
+"""Import time benchmarks, each measured in a fresh interpreter
+
+Run from the top of the source tree with ``python -m benchmarks.imports``, or
+through ``python -m benchmarks``.
+"""
+
+import os
+import subprocess
+import sys
+import time
+
+MODULES = [
+    'bellows.types',
+    'bellows.commands',
+    'bellows.ezsp',
+    'bellows.zigbee.zcl',
+    'bellows.zigbee.application',
+    'bellows.cli.main',
+]
+
+_IMPORT = (
+    "import time; s = time.perf_counter(); import %s; "
+    "print(time.perf_counter() - s)"
+)
+
+_CLI_HELP = "import bellows.cli.main; bellows.cli.main.main(['--help'])"
+
+
+def _env():
+    env = dict(os.environ)
+    # click refuses to run under an ASCII locale
+    env.setdefault('LC_ALL', 'C.UTF-8')
+    env.setdefault('LANG', 'C.UTF-8')
+    return env
+
+
+def import_time(module):
+    out = subprocess.check_output(
+        [sys.executable, '-c', _IMPORT % (module, )],
+        env=_env(),
+    )
+    return float(out)
+
+
+def cli_help_time():
+    start = time.perf_counter()
+    subprocess.check_call(
+        [sys.executable, '-c', _CLI_HELP],
+        stdout=subprocess.DEVNULL,
+        env=_env(),
+    )
+    return time.perf_counter() - start
+
+
+def run(repeat=5):
+    results = {}
+    for module in MODULES:
+        results['import %s' % (module, )] = min(
+            import_time(module) for i in range(repeat)
+        )
+    results['bellows --help'] = min(cli_help_time() for i in range(repeat))
+    return results
+
+
+if __name__ == '__main__':
+    for name, seconds in sorted(run().items()):
+        print('%-40s %8.1f ms' % (name, seconds * 1000))
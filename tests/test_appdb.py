@@ -0,0 +1,259 @@
+import asyncio
+import os
+import queue
+import sqlite3
+from unittest import mock
+
+import pytest
+
+import bellows.types as t
+from bellows.zigbee import appdb, device, endpoint, zha
+from bellows.zigbee.application import ControllerApplication
+
+
+def _app():
+    return ControllerApplication(mock.MagicMock())
+
+
+def _ieee(init=0):
+    return t.EmberEUI64(map(t.uint8_t, range(init, init + 8)))
+
+
+@pytest.fixture
+def db(tmpdir):
+    return os.path.join(str(tmpdir), 'test.db')
+
+
+def _run(fut):
+    loop = asyncio.get_event_loop()
+    return loop.run_until_complete(fut)
+
+
+def _add(app, init=0):
+    dev = app.add_device(_ieee(init), 99 + init)
+    dev.status = device.Status.ZDO_INIT
+    ep = dev.add_endpoint(1)
+    ep.profile_id = 260
+    ep.device_type = zha.DeviceType.PUMP
+    ep.status = endpoint.Status.ZDO_INIT
+    ep.add_cluster(0)
+    ep.add_cluster(6)
+    return dev
+
+
+def test_save_load(db):
+    app = _app()
+    dev = _add(app)
+    dev.manufacturer_code = 0x1234
+    dev.rx_on_when_idle = False
+    app.save(db)
+
+    app2 = _app()
+    app2.load(db)
+    dev = app2.get_device(nwk=99)
+    assert dev.status == device.Status.ZDO_INIT
+    assert dev.endpoints[1].profile_id == 260
+    assert dev.endpoints[1].device_type == zha.DeviceType.PUMP.value
+    assert sorted(dev.endpoints[1].clusters) == [0, 6]
+    assert dev.manufacturer_code == 0x1234
+    assert dev.rx_on_when_idle is False
+    # Sleepy devices keep their limit across restarts
+    assert app2.scheduler.limit(dev) == app2.scheduler.sleepy_in_flight
+
+
+def test_load_templates(db):
+    app = _app()
+    dev = _add(app)
+    dev.endpoints[1].add_output_cluster(0x0019)
+    dev.manufacturer_code = 0x1234
+    dev.manufacturer, dev.model = 'Acme', 'Pump'
+    # Not interviewed far enough for a template
+    other = _add(app, 1)
+    other.manufacturer_code = 0x1234
+    other.manufacturer, other.model = 'Acme', 'Valve'
+    other.endpoints[1].status = endpoint.Status.NEW
+    app.save(db)
+
+    app2 = _app()
+    app2.load(db)
+    dev2 = app2.devices[dev._ieee]
+    assert (dev2.manufacturer, dev2.model) == ('Acme', 'Pump')
+    assert list(dev2.endpoints[1].out_clusters) == [0x0019]
+    assert app2.device_templates == {(0x1234, 'Acme', 'Pump'): dev.layout()}
+
+
+def test_save_replaces(db):
+    app = _app()
+    dev = _add(app)
+    _add(app, 1)
+    app.save(db)
+
+    del app.devices[_ieee(1)]
+    dev.endpoints[1].clusters.pop(6)
+    app.save(db)
+
+    app2 = _app()
+    app2.load(db)
+    assert list(app2.devices) == [dev._ieee]
+    assert sorted(app2.devices[dev._ieee].endpoints[1].clusters) == [0]
+
+
+def test_load_old_database(db):
+    conn = sqlite3.connect(db)
+    conn.execute("CREATE TABLE devices (ieee ieee, nwk, status)")
+    conn.execute("CREATE TABLE endpoints (ieee ieee, endpoint_id, profile_id, device_type, status)")
+    conn.execute("CREATE TABLE clusters (ieee ieee, endpoint_id, cluster)")
+    conn.execute("INSERT INTO devices VALUES (?, ?, ?)", (repr(_ieee()), 99, 1))
+    conn.commit()
+    conn.close()
+
+    app = _app()
+    app.load(db)
+    assert _ieee() in app.devices
+    assert app.devices[_ieee()].rx_on_when_idle is None
+
+    _add(app, 1).rx_on_when_idle = True
+    app.save(db)
+    app2 = _app()
+    app2.load(db)
+    assert app2.devices[_ieee(1)].rx_on_when_idle is True
+
+
+def test_listener_batches(db):
+    app = _app()
+    listener = appdb.PersistingListener(db, app, flush_interval=0.01)
+    app.add_listener(listener)
+    listener.flush = mock.MagicMock(wraps=listener.flush)
+
+    _add(app)
+    _add(app, 1)
+    assert listener.flush.call_count == 0
+    _run(asyncio.sleep(0.02))
+    assert listener.flush.call_count == 1
+    _run(listener.commit())
+
+    app2 = _app()
+    app2.load(db)
+    assert len(app2.devices) == 2
+    listener.close()
+
+
+def test_listener_nwk_change_and_leave(db):
+    app = _app()
+    listener = appdb.PersistingListener(db, app)
+    app.add_listener(listener)
+    dev = _add(app)
+    app.add_device(dev._ieee, 0x1234)
+    _run(listener.commit())
+
+    app2 = _app()
+    app2.load(db)
+    assert app2.get_device(nwk=0x1234)._ieee == dev._ieee
+
+    app.ezsp_callback_handler(
+        'trustCenterJoinHandler',
+        [0x1234, dev._ieee, t.EmberDeviceUpdate.DEVICE_LEFT, None, None]
+    )
+    listener.close()
+
+    app3 = _app()
+    app3.load(db)
+    assert app3.devices == {}
+
+
+def test_listener_error(db):
+    app = _app()
+    listener = mock.MagicMock()
+    listener.device_updated.side_effect = Exception
+    app.add_listener(listener)
+    app.add_device(_ieee(), 99)
+    assert listener.device_updated.call_count == 1
+
+
+def test_listener_queue_full(db):
+    app = _app()
+    listener = appdb.PersistingListener(db, app, flush_interval=0.01)
+    app.add_listener(listener)
+    writer_queue = listener._writer.queue
+    listener._writer.queue = mock.MagicMock()
+    listener._writer.queue.put.side_effect = queue.Full
+
+    dev = _add(app)
+    listener.flush()
+    assert listener._changes == {dev._ieee: dev}
+    assert listener._flush_handle is not None
+
+    listener._writer.queue = writer_queue
+    _run(listener.commit())
+    assert listener._changes == {}
+    listener.close()
+
+    app2 = _app()
+    app2.load(db)
+    assert dev._ieee in app2.devices
+
+
+def test_writer_group_commit(db):
+    writer = appdb.DatabaseWriter(db)
+    appdb.PersistingListener(db, _app()).close()
+    app = _app()
+    for i in range(5):
+        writer.queue.put(('write', ) + appdb._device_rows(_add(app, i)))
+    writer.queue.put(('stop', ))
+
+    commits = []
+    connect = appdb._connect
+
+    def mock_connect(database_file):
+        db = mock.MagicMock(wraps=connect(database_file))
+        db.__enter__.side_effect = lambda: commits.append(1)
+        db.__exit__.return_value = None
+        return db
+
+    with mock.patch.object(appdb, '_connect', mock_connect):
+        writer.run()
+    assert commits == [1]
+
+
+def _failing_write(app):
+    # An endpoint row one column short fails the insert
+    rows = appdb._device_rows(_add(app))
+    return ('write', rows[0], [rows[1][0][:4]], rows[2], rows[3])
+
+
+def test_writer_stops_after_failure(db):
+    appdb.PersistingListener(db, _app()).close()
+    writer = appdb.DatabaseWriter(db)
+    called = []
+    writer.queue.put(_failing_write(_app()))
+    writer.queue.put(('done', called.append))
+    writer.queue.put(('stop', ))
+    writer.start()
+    writer.join(2)
+    assert not writer.is_alive()
+    assert len(called) == 1
+    assert isinstance(called[0], Exception)
+    assert writer.error is None
+
+
+def test_commit_reports_failure(db):
+    app = _app()
+    listener = appdb.PersistingListener(db, app)
+    listener._writer.queue.put(_failing_write(app))
+    with pytest.raises(Exception):
+        _run(listener.commit())
+
+    # Later commits succeed again
+    _add(app, 1)
+    listener.device_updated(app.devices[_ieee(1)])
+    _run(listener.commit())
+    listener.close()
+
+
+def test_close_reports_failure(db):
+    app = _app()
+    listener = appdb.PersistingListener(db, app)
+    listener._writer.queue.put(_failing_write(app))
+    with pytest.raises(Exception):
+        listener.close()
+    assert not listener._writer.is_alive()
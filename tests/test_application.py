@@ -12,13 +12,17 @@ from bellows.zigbee import zha
 @pytest.fixture
 def app():
     ezsp = mock.MagicMock()
+    ezsp.sendUnicast.return_value = asyncio.Future()
     return ControllerApplication(ezsp)
 
 
 @pytest.fixture
 def aps():
     f = t.EmberApsFrame()
+    f.profileId = 260
     f.sequence = 100
+    f.destinationEndpoint = 1
+    f.clusterId = 6
     return f
 
 
@@ -39,6 +43,7 @@ def _test_startup(app, nwk_type):
     app._ezsp.setPolicy = mockezsp
     app._ezsp.getNodeId = mockezsp
     app._ezsp.getEui64 = mockezsp
+    app._ezsp.maximumPayloadLength = mockezsp
 
     loop = asyncio.get_event_loop()
     loop.run_until_complete(app.startup())
@@ -57,6 +62,7 @@ def _frame_handler(app, aps, ieee, endpoint, cluster=0, sender=3):
     app.add_device(ieee, 3)
     app._ieee = [t.uint8_t(0)] * 8
     app._nwk = 0
+    aps.sourceEndpoint = endpoint
     aps.destinationEndpoint = endpoint
     aps.clusterId = cluster
     app.ezsp_callback_handler(
@@ -74,7 +80,8 @@ def test_frame_handler_zdo(app, aps, ieee):
 
 
 def test_frame_handler_zdo_reply(app, aps, ieee):
-    fut = app._pending[1] = mock.MagicMock()
+    fut = app._pending[(3, 0, 0, 1)] = mock.MagicMock()
+    fut.done.return_value = False
     _frame_handler(app, aps, ieee, 0, 0x8000)
     assert fut.set_result.call_count == 1
 
@@ -83,12 +90,21 @@ def test_frame_handler_zdo_reply_unknown(app, aps, ieee):
     _frame_handler(app, aps, ieee, 0, 0x8000)
 
 
+def test_frame_handler_zdo_reply_other_device(app, aps, ieee):
+    fut = app._pending[(4, 0, 0, 1)] = mock.MagicMock()
+    _frame_handler(app, aps, ieee, 0, 0x8000)
+    assert fut.set_result.call_count == 0
+    assert (4, 0, 0, 1) in app._pending
+
+
 def test_frame_handler_zcl(app, aps, ieee):
     return _frame_handler(app, aps, ieee, 1)
 
 
 def test_send_failure(app, aps, ieee):
-    fut = app._pending[254] = mock.MagicMock()
+    fut = mock.MagicMock()
+    fut.done.return_value = False
+    app._message_tags[254] = (fut, True)
     app.ezsp_callback_handler(
         'messageSentHandler',
         [None, None, None, 254, 1, b'']
@@ -103,6 +119,65 @@ def test_send_failure_unexpected(app, aps, ieee):
     )
 
 
+def test_send_delivered(app):
+    fut = mock.MagicMock()
+    fut.done.return_value = False
+    app._message_tags[254] = (fut, False)
+    app.ezsp_callback_handler(
+        'messageSentHandler',
+        [None, None, None, 254, 0, b'']
+    )
+    assert fut.set_result.call_count == 1
+    assert app._message_tags == {}
+
+
+def test_send_delivered_awaiting_reply(app):
+    fut = mock.MagicMock()
+    fut.done.return_value = False
+    app._message_tags[254] = (fut, True)
+    app.ezsp_callback_handler(
+        'messageSentHandler',
+        [None, None, None, 254, 0, b'']
+    )
+    assert fut.set_result.call_count == 0
+    assert app._message_tags == {}
+
+
+def test_reply_sent(app, aps):
+    app.reply(0x1234, aps, b'')
+    tag = app._ezsp.sendUnicast.call_args[0][3]
+    assert tag in app._message_tags
+    app.ezsp_callback_handler(
+        'messageSentHandler',
+        [None, 0x1234, aps, tag, 1, b'']
+    )
+    assert app._message_tags == {}
+
+
+def test_reply_not_queued(app, aps):
+    fut = asyncio.Future()
+    app._ezsp.sendUnicast.return_value = fut
+    app.reply(0x1234, aps, b'')
+    fut.set_result([1])
+    asyncio.get_event_loop().run_until_complete(asyncio.sleep(0))
+    assert app._message_tags == {}
+
+
+def test_message_tags_skip_in_use(app):
+    app._message_tags[1] = (None, False)
+    assert app._get_message_tag() == 2
+    for tag in range(256):
+        app._message_tags[tag] = (None, False)
+    with pytest.raises(Exception):
+        app._get_message_tag()
+
+
+def test_sequence_skips_in_use(app):
+    app._tsns[(0x1234, 1)] = 1
+    assert app.get_sequence(0x1234) == 2
+    assert app.get_sequence(0x4321) == 3
+
+
 def test_join_handler(app, ieee):
     # Calls device.initialize, leaks a task
     app.ezsp_callback_handler(
@@ -113,12 +188,14 @@ def test_join_handler(app, ieee):
 
 
 def test_leave_handler(app, ieee):
-    app.devices[ieee] = mock.sentinel.device
+    app.add_device(ieee, 8)
+    fut = app.poll_control.queue(ieee, mock.MagicMock())
     app.ezsp_callback_handler(
         'trustCenterJoinHandler',
         [1, ieee, t.EmberDeviceUpdate.DEVICE_LEFT, None, None]
     )
     assert ieee not in app.devices
+    assert fut.done()
 
 
 def test_database(app, tmpdir, ieee):
@@ -158,26 +235,253 @@ def test_get_device_both(app, ieee):
     assert app.get_device(ieee=ieee, nwk=8) is dev
 
 
+def test_get_device_nwk_unknown(app, ieee):
+    app.add_device(ieee, 8)
+    with pytest.raises(KeyError):
+        app.get_device(nwk=9)
+
+
+def test_add_device_nwk_change(app, ieee):
+    dev = app.add_device(ieee, 8)
+    assert app.add_device(ieee, 9) is dev
+    assert dev._nwk == 9
+    assert app.get_device(nwk=9) is dev
+    with pytest.raises(KeyError):
+        app.get_device(nwk=8)
+
+
+def test_add_device_nwk_reused(app, ieee):
+    dev = app.add_device(ieee, 8)
+    ieee2 = t.EmberEUI64(map(t.uint8_t, range(1, 9)))
+    dev2 = app.add_device(ieee2, 9)
+    # dev2 took dev's old address before dev's announcement was seen
+    app.add_device(ieee2, 8)
+    app.add_device(ieee, 10)
+    assert app.get_device(nwk=8) is dev2
+    assert app.get_device(nwk=10) is dev
+    with pytest.raises(KeyError):
+        app.get_device(nwk=9)
+
+
+def test_leave_handler_nwk(app, ieee):
+    app.add_device(ieee, 8)
+    app.ezsp_callback_handler(
+        'trustCenterJoinHandler',
+        [8, ieee, t.EmberDeviceUpdate.DEVICE_LEFT, None, None]
+    )
+    with pytest.raises(KeyError):
+        app.get_device(nwk=8)
+
+
+def test_leave_handler_other_nwk(app, ieee):
+    app.add_device(ieee, 8)
+    # The leave is reported with an address the device no longer uses
+    app.ezsp_callback_handler(
+        'trustCenterJoinHandler',
+        [9, ieee, t.EmberDeviceUpdate.DEVICE_LEFT, None, None]
+    )
+    with pytest.raises(KeyError):
+        app.get_device(nwk=8)
+
+
+def test_id_conflict_same_nwk(app, ieee):
+    dev = app.add_device(ieee, 8)
+    app.ezsp_callback_handler('idConflictHandler', [8])
+    with pytest.raises(KeyError):
+        app.get_device(nwk=8)
+    # The device announces itself again with the same address
+    app.add_device(ieee, 8)
+    assert app.get_device(nwk=8) is dev
+
+
+def test_id_conflict(app, ieee):
+    dev = app.add_device(ieee, 8)
+    app.ezsp_callback_handler('idConflictHandler', [8])
+    with pytest.raises(KeyError):
+        app.get_device(nwk=8)
+    assert app.get_device(ieee=ieee) is dev
+    app.add_device(ieee, 9)
+    assert app.get_device(nwk=9) is dev
+
+
 def test_permit(app):
     app.permit(60)
     assert app._ezsp.permitJoining.call_count == 1
 
 
+def _frame():
+    # ZCL frame control, sequence number and command ID
+    return bytearray(b'\x00\x00\x00')
+
+
 def _request(app, aps, returnval):
     @asyncio.coroutine
-    def mocksend(method, nwk, aps_frame, seq, data):
-        app._pending[seq].set_result(mock.sentinel.result)
+    def mocksend(method, nwk, aps_frame, tag, data):
+        seq = aps_frame.sequence
+        assert data[1] == seq
+        app._pending[(nwk, 1, 6, seq)].set_result(mock.sentinel.result)
         return [returnval]
 
     app._ezsp.sendUnicast = mocksend
     loop = asyncio.get_event_loop()
-    return loop.run_until_complete(app.request(0x1234, aps, b''))
+    return loop.run_until_complete(app.request(0x1234, aps, _frame()))
 
 
 def test_request(app, aps):
     assert _request(app, aps, 0) == mock.sentinel.result
+    assert app._pending == {}
+    assert not app._tsns
+    assert app.scheduler.in_flight == 0
+    assert app.scheduler.stats(0x1234).requests == 1
+
+
+def test_request_sleepy_device(app, aps, ieee):
+    dev = app.add_device(ieee, 0x1234)
+    dev.rx_on_when_idle = False
+    sent = []
+
+    @asyncio.coroutine
+    def mocksend(method, nwk, aps_frame, tag, data):
+        sent.append(aps_frame.sequence)
+        return [0]
+
+    app._ezsp.sendUnicast = mocksend
+    loop = asyncio.get_event_loop()
+    first = asyncio.ensure_future(app.request(0x1234, aps, _frame()))
+    aps2 = t.EmberApsFrame()
+    aps2.profileId = 260
+    aps2.destinationEndpoint = 1
+    aps2.clusterId = 6
+    second = asyncio.ensure_future(app.request(0x1234, aps2, _frame()))
+    loop.run_until_complete(asyncio.sleep(0.01))
+    assert len(sent) == 1
+    assert dev.queue_stats.depth == 1
+
+    app._pending[(0x1234, 1, 6, sent[0])].set_result(mock.sentinel.result)
+    loop.run_until_complete(first)
+    loop.run_until_complete(asyncio.sleep(0.01))
+    assert len(sent) == 2
+    assert dev.queue_stats.depth == 0
+    second.cancel()
+    loop.run_until_complete(asyncio.sleep(0))
+    assert app.scheduler.in_flight == 0
+    assert app._pending == {}
 
 
 def test_request_fail(app, aps):
     with pytest.raises(Exception):
         _request(app, aps, 1)
+    assert app._pending == {}
+    assert app._message_tags == {}
+    assert not app._tsns
+
+
+def test_request_timeout(app, aps):
+    @asyncio.coroutine
+    def mocksend(method, nwk, aps_frame, tag, data):
+        return [0]
+
+    app._ezsp.sendUnicast = mocksend
+    loop = asyncio.get_event_loop()
+    with pytest.raises(asyncio.TimeoutError):
+        loop.run_until_complete(app.request(0x1234, aps, _frame(), timeout=0.01))
+    assert app._pending == {}
+    assert app._message_tags == {}
+    assert not app._tsns
+
+
+def test_request_tsn_in_use(app, aps):
+    app._pending[(0x1234, 1, 6, 1)] = mock.sentinel.fut
+    loop = asyncio.get_event_loop()
+    with pytest.raises(Exception):
+        loop.run_until_complete(app.request(0x1234, aps, _frame()))
+    assert app._pending[(0x1234, 1, 6, 1)] is mock.sentinel.fut
+
+
+def test_request_numbered_when_sent(app, aps, ieee):
+    dev = app.add_device(ieee, 0x1234)
+    dev.max_in_flight = 1
+    sent = []
+
+    @asyncio.coroutine
+    def mocksend(method, nwk, aps_frame, tag, data):
+        sent.append((aps_frame.sequence, data))
+        return [0]
+
+    app._ezsp.sendUnicast = mocksend
+    loop = asyncio.get_event_loop()
+    first = asyncio.ensure_future(app.request(0x1234, aps, _frame()))
+    loop.run_until_complete(asyncio.sleep(0))
+    # Queued behind the first, and numbered when it gets to go
+    zdo_aps = t.EmberApsFrame()
+    zdo_aps.profileId = 0
+    zdo_aps.destinationEndpoint = 0
+    zdo_aps.clusterId = 5
+    second = asyncio.ensure_future(app.request(0x1234, zdo_aps, bytearray(b'\x00\x34\x12')))
+    loop.run_until_complete(asyncio.sleep(0))
+    # Another frame is numbered while the second waits
+    app.get_sequence()
+    assert len(sent) == 1
+    app._pending[(0x1234, 1, 6, sent[0][0])].set_result(None)
+    loop.run_until_complete(first)
+    loop.run_until_complete(asyncio.sleep(0))
+    assert sent[1][0] == sent[0][0] + 2
+    assert sent[1][1] == bytes([sent[1][0]]) + b'\x34\x12'
+    second.cancel()
+    loop.run_until_complete(asyncio.sleep(0))
+
+
+def test_request_same_tsn_other_devices(app, aps):
+    @asyncio.coroutine
+    def mocksend(method, nwk, aps_frame, tag, data):
+        loop.call_soon(
+            app.ezsp_callback_handler,
+            'incomingMessageHandler',
+            [None, reply, 1, 2, nwk, 4, 5, b'\x08\x64\x0b\x00\x00'],
+        )
+        return [0]
+
+    # Both devices are given sequence number 100
+    app.get_sequence = lambda nwk=None: 100
+
+    reply = t.EmberApsFrame()
+    reply.profileId = 260
+    reply.clusterId = 6
+    reply.sourceEndpoint = 1
+    reply.destinationEndpoint = 1
+    app._ezsp.sendUnicast = mocksend
+    loop = asyncio.get_event_loop()
+    results = loop.run_until_complete(asyncio.gather(
+        app.request(0x1234, aps, _frame()),
+        app.request(0x4321, aps, _frame()),
+    ))
+    assert len(results) == 2
+    assert app._pending == {}
+
+
+def _request_no_reply(app, aps, returnval):
+    @asyncio.coroutine
+    def mocksend(method, nwk, aps_frame, tag, data):
+        assert app._pending == {}
+        if returnval == 0:
+            app.ezsp_callback_handler(
+                'messageSentHandler',
+                [None, nwk, aps_frame, tag, 0, data]
+            )
+        return [returnval]
+
+    app._ezsp.sendUnicast = mocksend
+    loop = asyncio.get_event_loop()
+    return loop.run_until_complete(
+        app.request(0x1234, aps, _frame(), expect_reply=False))
+
+
+def test_request_no_reply(app, aps):
+    assert _request_no_reply(app, aps, 0) == 0
+    assert app._message_tags == {}
+
+
+def test_request_no_reply_fail(app, aps):
+    with pytest.raises(Exception):
+        _request_no_reply(app, aps, 1)
+    assert app._message_tags == {}
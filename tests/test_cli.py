@@ -1,3 +1,38 @@
-import bellows.cli
+import asyncio
+import os
+from unittest import mock
 
 # Just being able to import is a small test...
+import bellows.cli
+import bellows.types as t
+from bellows.cli import util
+from bellows.zigbee import appdb
+from bellows.zigbee.application import ControllerApplication
+
+
+def test_app_persists_changes(tmpdir):
+    database_file = os.path.join(str(tmpdir), 'test.db')
+    ieee = t.EmberEUI64(map(t.uint8_t, range(8)))
+
+    @asyncio.coroutine
+    def mock_setup(dev):
+        return ControllerApplication(mock.MagicMock())
+
+    @util.app
+    @asyncio.coroutine
+    def command(ctx):
+        ctx.obj['app'].add_device(ieee, 99)
+
+    ctx = mock.MagicMock()
+    ctx.obj = {'database_file': database_file, 'device': '/dev/null'}
+    with mock.patch.object(util, 'setup_application', mock_setup), \
+            mock.patch.object(appdb.PersistingListener, 'sync') as sync, \
+            mock.patch('asyncio.sleep', asyncio.coroutine(lambda t: None)):
+        command(ctx)
+    # Only the change is written, not every device
+    assert sync.call_count == 0
+
+    app = ControllerApplication(mock.MagicMock())
+    app.load(database_file)
+    assert app.get_device(nwk=99)._ieee == ieee
+    assert ctx.obj['app']._listeners[-1]._writer.is_alive() is False
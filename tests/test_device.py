@@ -19,6 +19,8 @@ def test_initialize(monkeypatch, dev):
 
     @asyncio.coroutine
     def mockrequest(req, nwk):
+        if req == 0x0002:
+            return [1]
         return [0, None, [1, 2]]
 
     @asyncio.coroutine
@@ -83,8 +85,116 @@ def test_handle_request(dev):
     assert ep.handle_request.call_count == 1
 
 
+def test_handle_request_source_endpoint(dev):
+    f = dev.get_aps(1, 2, 3)
+    f.destinationEndpoint = 1
+    ep = dev.add_endpoint(3)
+    ep.handle_request = mock.MagicMock()
+    dev.handle_request(f, 1, 0, [])
+    assert ep.handle_request.call_count == 1
+
+
+def test_model_info(dev):
+    loop = asyncio.get_event_loop()
+    ep = dev.add_endpoint(1)
+    assert loop.run_until_complete(dev.model_info()) is None
+
+    ep.add_cluster(0)
+    ep.clusters[0].read_attributes = mock.MagicMock()
+    reads = ep.clusters[0].read_attributes
+
+    @asyncio.coroutine
+    def mockread(attributes):
+        records = []
+        for attrid, value in ((4, b'Acme'), (5, b'Sensor')):
+            r = mock.MagicMock(status=0, attrid=attrid)
+            r.value.value = value
+            records.append(r)
+        return [records]
+    reads.side_effect = mockread
+
+    assert loop.run_until_complete(dev.model_info()) == (b'Acme', b'Sensor')
+    assert loop.run_until_complete(dev.model_info()) == (b'Acme', b'Sensor')
+    assert reads.call_count == 1
+
+
 def test_log(dev):
     dev.debug("Test debug")
     dev.info("Test info")
     dev.warn("Test warn")
     dev.error("Test error")
+
+
+def _template_zdo(dev):
+    calls = []
+
+    @asyncio.coroutine
+    def mockrequest(command, nwk, *args):
+        calls.append(command)
+        if command == 0x0002:
+            nd = mock.MagicMock()
+            nd.manufacturer_code = 0x1234
+            nd.mac_capability_flags = 0x80
+            return [0, nwk, nd]
+        if command == 0x0005:
+            return [0, nwk, [1]]
+        sd = mock.MagicMock()
+        sd.profile = 260
+        sd.device_type = 0x0302
+        sd.input_clusters = [0x0000, 0x0402]
+        sd.output_clusters = [0x0019]
+        return [0, nwk, sd]
+    dev.zdo.request = mockrequest
+    return calls
+
+
+def _model(dev, info):
+    @asyncio.coroutine
+    def mock_model_info():
+        dev.manufacturer, dev.model = info
+        return info
+    dev.model_info = mock_model_info
+
+
+def test_initialize_saves_template(dev):
+    dev._application.device_templates = {}
+    _template_zdo(dev)
+    _model(dev, ('Acme', 'Sensor'))
+    asyncio.get_event_loop().run_until_complete(dev.initialize())
+
+    assert dev.initialized
+    assert dev.rx_on_when_idle is False
+    templates = dev._application.device_templates
+    assert templates == {(0x1234, 'Acme', 'Sensor'): dev.layout()}
+    assert dev.layout() == ((1, 260, 0x0302, (0x0000, 0x0402), (0x0019, )), )
+
+
+def test_initialize_from_template(dev):
+    layout = ((1, 260, 0x0302, (0x0000, 0x0402), (0x0019, )), )
+    dev._application.device_templates = {
+        (0x1234, 'Acme', 'Sensor'): layout,
+    }
+    calls = _template_zdo(dev)
+    _model(dev, ('Acme', 'Sensor'))
+    asyncio.get_event_loop().run_until_complete(dev.initialize())
+
+    assert calls == [0x0002]
+    assert dev.initialized
+    assert dev.layout() == layout
+    assert 0x0402 in dev.endpoints[1].clusters
+    assert 0x0019 in dev.endpoints[1].out_clusters
+
+
+def test_initialize_template_mismatch(dev):
+    layout = ((2, 260, 0x0302, (0x0000, ), ()), )
+    dev._application.device_templates = {
+        (0x1234, 'Acme', 'Other'): layout,
+    }
+    calls = _template_zdo(dev)
+    _model(dev, ('Acme', 'Sensor'))
+    asyncio.get_event_loop().run_until_complete(dev.initialize())
+
+    assert calls == [0x0002, 0x0005, 0x0004]
+    assert dev.initialized
+    assert sorted(dev.endpoints) == [0, 1]
+    assert len(dev._application.device_templates) == 2
@@ -80,6 +80,7 @@ def test_handle_request_unknown(ep):
     f = t.EmberApsFrame()
     f.clusterId = 99
     ep.handle_request(f, 0, 0, [])
+    assert 99 in ep.out_clusters
 
 
 def test_log(ep):
@@ -162,3 +162,9 @@ def test_callback_exc(ezsp_f):
     ezsp_f.add_callback(testcb)
     ezsp_f.handle_callback(1)
     assert testcb.call_count == 1
+
+
+def test_ezsp_frame(ezsp_f):
+    ezsp_f._seq = 0x22
+    data = ezsp_f._ezsp_frame('echo', b'abc')
+    assert data == b'\x22\x00\x81\x03abc'
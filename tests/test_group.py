@@ -0,0 +1,170 @@
+import asyncio
+from unittest import mock
+
+import pytest
+
+import bellows.types as t
+from bellows.zigbee.application import ControllerApplication
+from bellows.zigbee import endpoint as zigbee_endpoint
+
+
+@pytest.fixture
+def app():
+    app = ControllerApplication(mock.MagicMock())
+    entries = app.entries = {}
+
+    @asyncio.coroutine
+    def mock_set_entry(index, entry):
+        entries[index] = (entry.multicastId, entry.endpoint)
+        return [0]
+    app._ezsp.setMulticastTableEntry = mock_set_entry
+    return app
+
+
+@pytest.fixture
+def ep(app):
+    ieee = t.EmberEUI64(map(t.uint8_t, range(8)))
+    dev = app.add_device(ieee, 0x1234)
+    ep = dev.add_endpoint(1)
+    ep.status = zigbee_endpoint.Status.ZDO_INIT
+    ep.profile_id = 260
+    groups = ep.add_cluster(4)
+    groups.commands = []
+
+    @asyncio.coroutine
+    def mock_command(command, *args):
+        groups.commands.append((command, args))
+        if command == 0x0002:
+            # Room for 5 more groups
+            return [5, [0x0010, 0x0020]]
+        return [0, args[0]]
+    groups.command = mock_command
+    return ep
+
+
+def _run(coro):
+    return asyncio.get_event_loop().run_until_complete(coro)
+
+
+def test_add_group(app):
+    group = _run(app.groups.add_group(0x0010, 'Lounge'))
+    assert app.groups[0x0010] is group
+    assert _run(app.groups.add_group(0x0010)) is group
+    assert app.entries == {0: (0x0010, 1)}
+
+    _run(app.groups.add_group(0x0020))
+    _run(app.groups.remove_group(0x0010))
+    assert app.entries == {0: (0, 0), 1: (0x0020, 1)}
+
+    _run(app.groups.sync())
+    assert len(app.entries) == app.groups.multicast_table_size
+
+
+def test_multicast_table_full(app):
+    for group_id in range(app.groups.multicast_table_size + 1):
+        _run(app.groups.add_group(group_id + 1))
+    assert len(app.groups) == app.groups.multicast_table_size + 1
+    assert len(app.entries) == app.groups.multicast_table_size
+
+
+def test_membership(app, ep):
+    group = _run(app.groups.add_group(0x0010, 'Lounge'))
+    groups_cluster = ep.clusters[4]
+
+    assert _run(group.add_member(ep))
+    assert groups_cluster.commands == [(0x0000, (0x0010, b'Lounge'))]
+    assert group.members == {(ep._device._ieee, 1)}
+
+    # Already known to be a member
+    assert _run(group.add_member(ep))
+    assert len(groups_cluster.commands) == 1
+
+    assert _run(group.remove_member(ep))
+    assert group.members == set()
+    assert app.groups.cached_membership(ep) == set()
+
+    assert _run(app.groups.membership(ep)) == set()
+    assert len(groups_cluster.commands) == 2
+    assert _run(app.groups.membership(ep, refresh=True)) == {0x0010, 0x0020}
+    assert group.members == {(ep._device._ieee, 1)}
+
+
+def test_membership_full(app, ep):
+    @asyncio.coroutine
+    def mock_command(command, *args):
+        return [0, [0x0030]]
+    ep.clusters[4].command = mock_command
+    assert _run(app.groups.membership(ep)) == {0x0030}
+
+
+def test_membership_default_response(app, ep):
+    @asyncio.coroutine
+    def mock_command(command, *args):
+        return [0x02, 0x81]
+    ep.clusters[4].command = mock_command
+    with pytest.raises(Exception):
+        _run(app.groups.membership(ep))
+    assert app.groups.cached_membership(ep) == set()
+
+
+def test_add_member_fail(app, ep):
+    group = _run(app.groups.add_group(0x0010))
+
+    @asyncio.coroutine
+    def mock_command(command, *args):
+        return [0x89, args[0]]
+    ep.clusters[4].command = mock_command
+
+    assert not _run(group.add_member(ep))
+    assert not _run(group.remove_member(ep))
+    assert group.members == set()
+
+
+def test_add_member_default_response(app, ep):
+    group = _run(app.groups.add_group(0x0010))
+
+    @asyncio.coroutine
+    def mock_command(command, *args):
+        # UNSUP_CLUSTER
+        return [command, 0xc3]
+    ep.clusters[4].command = mock_command
+
+    assert not _run(group.add_member(ep))
+    assert group.members == set()
+    assert app.groups.cached_membership(ep) == set()
+
+
+def test_group_command(app):
+    group = _run(app.groups.add_group(0x0010))
+    sent = []
+
+    @asyncio.coroutine
+    def mock_send(aps_frame, hops, radius, tag, data):
+        sent.append((aps_frame, data))
+        app.ezsp_callback_handler(
+            'messageSentHandler',
+            [None, 0x0010, aps_frame, tag, 0, data]
+        )
+        return [0]
+    app._ezsp.sendMulticast = mock_send
+
+    v = _run(group[0x0006].command(0x0001))
+    assert v == 0
+    assert group[0x0006] is group[0x0006]
+    aps_frame, data = sent[0]
+    assert aps_frame.groupId == 0x0010
+    assert aps_frame.clusterId == 0x0006
+    assert data[2] == 0x01
+
+
+def test_multicast_fail(app):
+    group = _run(app.groups.add_group(0x0010))
+
+    @asyncio.coroutine
+    def mock_send(aps_frame, hops, radius, tag, data):
+        return [1]
+    app._ezsp.sendMulticast = mock_send
+
+    with pytest.raises(Exception):
+        _run(group[0x0006].command(0x0001))
+    assert app._message_tags == {}
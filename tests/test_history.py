@@ -0,0 +1,67 @@
+import asyncio
+from unittest import mock
+
+import pytest
+
+from bellows.zigbee import history, reports
+
+
+@pytest.fixture
+def series():
+    s = history.Series(4)
+    for i in range(6):
+        s.append(10.0 + i, i * 2)
+    return s
+
+
+def test_series_wraps(series):
+    assert len(series) == 4
+    timestamps, values = series.samples()
+    assert list(timestamps) == [12.0, 13.0, 14.0, 15.0]
+    assert list(values) == [4, 6, 8, 10]
+
+
+def test_series_range(series):
+    timestamps, values = series.samples(13, 15)
+    assert list(timestamps) == [13.0, 14.0]
+    assert list(values) == [6, 8]
+
+
+def test_downsample(series):
+    assert series.downsample(2) == [(12.0, 5.0), (14.0, 9.0)]
+    assert series.downsample(2, 'max') == [(12.0, 6.0), (14.0, 10.0)]
+    assert series.downsample(10, 'count') == [(10.0, 4)]
+    assert series.downsample(10, 'first', start=14) == [(10.0, 8.0)]
+    assert series.downsample(3, lambda v: list(v)) == [
+        (12.0, [4.0, 6.0, 8.0]),
+        (15.0, [10.0]),
+    ]
+
+
+def test_store_eviction():
+    store = history.TimeSeriesStore(capacity=2, max_series=2)
+    assert store.add('a', 1, 1)
+    assert store.add('b', 1, 1)
+    assert store.add('a', 2, 2)
+    assert store.add('c', 1, 1)
+    assert len(store) == 2
+    assert 'b' not in store
+    assert 'a' in store
+    assert not store.add('a', 3, b'text')
+    assert len(store._series['a']) == 2
+
+
+def test_store_attach():
+    app = mock.MagicMock()
+    app.reports = reports.Reports()
+    store = history.TimeSeriesStore()
+    store.attach(app, cluster_id=0x0402)
+
+    app.reports.attribute_updated('ieee', 1, 0x0402, 0, 2150)
+    app.reports.attribute_updated('ieee', 1, 0x0006, 0, True)
+    loop = asyncio.get_event_loop()
+    loop.run_until_complete(asyncio.sleep(0))
+
+    assert len(store) == 1
+    timestamps, values = store.series('ieee', 1, 0x0402, 0).samples()
+    assert list(values) == [2150.0]
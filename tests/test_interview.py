@@ -0,0 +1,115 @@
+import asyncio
+from unittest import mock
+
+import pytest
+
+import bellows.types as t
+from bellows.zigbee import device, endpoint, interview
+
+
+@pytest.fixture
+def interviews():
+    return interview.Interviews(max_concurrent=2, retries=2, backoff=0.001)
+
+
+def _device(i=0):
+    ieee = t.EmberEUI64(map(t.uint8_t, range(i, i + 8)))
+    return device.Device(mock.MagicMock(), ieee, i)
+
+
+def _run(fut):
+    loop = asyncio.get_event_loop()
+    return loop.run_until_complete(fut)
+
+
+def _zdo(dev, fail_simple=0):
+    calls = []
+
+    @asyncio.coroutine
+    def mockrequest(command, nwk, *args):
+        calls.append((command, ) + args)
+        if command == 0x0002:
+            nd = mock.MagicMock()
+            nd.manufacturer_code = 0x1234
+            nd.mac_capability_flags = 0x8e
+            return [0, nwk, nd]
+        if command == 0x0005:
+            return [0, nwk, [1, 2]]
+        if fail_simple > len([c for c in calls if c[0] == 0x0004]) - 1:
+            raise asyncio.TimeoutError()
+        sd = mock.MagicMock()
+        sd.profile = 260
+        sd.device_type = 0x0100
+        sd.input_clusters = [0x0006]
+        sd.output_clusters = []
+        return [0, nwk, sd]
+    dev.zdo.request = mockrequest
+    return calls
+
+
+def test_interview(interviews):
+    dev = _device()
+    calls = _zdo(dev)
+    result = _run(interviews.interview(dev))
+    assert result.success
+    assert result.attempts == 1
+    assert dev.initialized
+    assert sorted(calls) == [(2, ), (4, 1), (4, 2), (5, )]
+    assert interviews.results[dev._ieee] is result
+    assert interviews.running == 0
+
+
+def test_interview_resumes(interviews):
+    dev = _device()
+    calls = _zdo(dev, fail_simple=1)
+    result = _run(interviews.interview(dev))
+    assert result.success
+    assert result.attempts == 2
+    # Active_EP_req is not repeated, nor the endpoint which succeeded
+    assert len([c for c in calls if c[0] == 0x0005]) == 1
+    assert len([c for c in calls if c[0] == 0x0004]) == 3
+    assert dev.endpoints[1].status == endpoint.Status.ZDO_INIT
+
+
+def test_interview_gives_up(interviews):
+    dev = _device()
+
+    @asyncio.coroutine
+    def mockrequest(command, nwk, *args):
+        return [1]
+    dev.zdo.request = mockrequest
+
+    result = _run(interviews.interview(dev))
+    assert not result.success
+    assert result.attempts == 3
+    assert dev.status == device.Status.NEW
+
+
+def test_interview_once(interviews):
+    dev = _device()
+    _zdo(dev)
+    task = interviews.interview(dev)
+    assert interviews.interview(dev) is task
+    _run(task)
+
+
+def test_interview_concurrency(interviews):
+    running = []
+    peak = []
+
+    def _slow(dev):
+        @asyncio.coroutine
+        def mockinit():
+            running.append(dev)
+            peak.append(len(running))
+            yield from asyncio.sleep(0.01)
+            running.remove(dev)
+            dev.status = device.Status.ZDO_INIT
+        dev.initialize = mockinit
+        return dev
+
+    devices = [_slow(_device(i)) for i in range(5)]
+    tasks = [interviews.interview(dev) for dev in devices]
+    results = _run(asyncio.gather(*tasks))
+    assert all(r.success for r in results)
+    assert max(peak) == 2
@@ -0,0 +1,198 @@
+import asyncio
+from unittest import mock
+
+import pytest
+
+import bellows.types as t
+import bellows.zigbee.zcl as zcl
+from bellows.zigbee import ota
+
+
+def _image(manufacturer_code=0x1234, image_type=1, version=2, size=200,
+           hardware=None):
+    header = ota.OtaHeader()
+    header.magic = t.uint32_t(ota.MAGIC)
+    header.header_version = t.uint16_t(0x0100)
+    header.header_length = t.uint16_t(56)
+    header.field_control = t.uint16_t(0x0004 if hardware else 0)
+    header.manufacturer_code = t.uint16_t(manufacturer_code)
+    header.image_type = t.uint16_t(image_type)
+    header.file_version = t.uint32_t(version)
+    header.stack_version = t.uint16_t(2)
+    header.header_string = t.fixed_list(32, t.uint8_t)([t.uint8_t(0)] * 32)
+    header.image_size = t.uint32_t(size)
+    data = header.serialize()
+    if hardware:
+        data += t.uint16_t(hardware[0]).serialize()
+        data += t.uint16_t(hardware[1]).serialize()
+    return data + bytes(i % 256 for i in range(size - len(data)))
+
+
+@pytest.fixture
+def store(tmpdir):
+    tmpdir.join('old.ota').write_binary(_image(version=1))
+    tmpdir.join('new.ota').write_binary(_image(version=2))
+    tmpdir.join('hw.ota').write_binary(
+        _image(image_type=2, hardware=(3, 5)))
+    tmpdir.join('junk.txt').write_binary(b'junk' * 20)
+    tmpdir.join('empty').write_binary(b'')
+    tmpdir.join('short.ota').write_binary(_image(size=200)[:100])
+    tmpdir.mkdir('subdir')
+    store = ota.OtaStore(str(tmpdir))
+    store.scan()
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def app():
+    app = mock.MagicMock()
+    app.max_payload = 82
+    return app
+
+
+@pytest.fixture
+def server(app, store):
+    return ota.OtaServer(app, store, max_upgrades=1)
+
+
+def _cluster(app, ieee=1):
+    epmock = mock.MagicMock()
+    epmock._device._application = app
+    epmock._device._ieee = ieee
+    cluster = zcl.Cluster.from_id(epmock, 0x0019)
+    return cluster
+
+
+def _reply(cluster):
+    return cluster._endpoint._device.reply.call_args[0][1]
+
+
+def test_store(store):
+    assert sorted(store.images) == [(0x1234, 1), (0x1234, 2)]
+    image = store.get(0x1234, 1)
+    assert image.version == 2
+    assert image.size == 200
+    assert store.get(0x1234, 1, 1) is None
+    assert store.get(0x1234, 2).min_hardware_version == 3
+    assert bytes(image.block(190, 50).serialize()) == b'\x0a' + bytes(
+        i % 256 for i in range(134, 144))
+
+
+def test_query_next_image(app, server):
+    app.ota = server
+    cluster = _cluster(app)
+    args = [0, 0x1234, 1, 1, []]
+    cluster.handle_cluster_request(None, 5, zcl.ClusterCommand(1), args)
+    data = _reply(cluster)
+    assert data[:4] == b'\x19\x05\x02\x00'
+    assert data[4:] == b'\x34\x12\x01\x00\x02\x00\x00\x00\xc8\x00\x00\x00'
+
+    # Up to date
+    server.handle_request(cluster, 6, 1, [0, 0x1234, 1, 2, []])
+    assert _reply(cluster) == b'\x19\x06\x02\x98'
+
+    # Too many devices upgrading at once
+    other = _cluster(app, ieee=2)
+    server.handle_request(other, 7, 1, [0, 0x1234, 1, 1, []])
+    assert _reply(other) == b'\x19\x07\x02\x98'
+
+    # Wrong hardware
+    server.handle_request(cluster, 8, 1, [1, 0x1234, 2, 1, [6]])
+    assert _reply(cluster) == b'\x19\x08\x02\x98'
+    server.handle_request(cluster, 8, 1, [1, 0x1234, 2, 1, [4]])
+    assert _reply(cluster)[3] == 0
+
+    # A finished upgrade frees its place
+    server.handle_request(cluster, 9, 6, [0, 0x1234, 1, 2])
+    assert _reply(cluster)[:3] == b'\x19\x09\x07'
+    server.handle_request(other, 10, 1, [0, 0x1234, 1, 1, []])
+    assert _reply(other)[3] == 0
+
+
+def test_no_server(app):
+    app.ota = None
+    cluster = _cluster(app)
+    cluster.handle_cluster_request(None, 5, zcl.ClusterCommand(1), [])
+    assert cluster._endpoint._device.reply.call_count == 0
+
+
+def test_session_timeout(server, app):
+    server.session_timeout = -1
+    server.handle_request(_cluster(app), 1, 1, [0, 0x1234, 1, 1, []])
+    other = _cluster(app, ieee=2)
+    server.handle_request(other, 2, 1, [0, 0x1234, 1, 1, []])
+    assert _reply(other)[3] == 0
+
+
+def test_query_specific_file(server, app):
+    cluster = _cluster(app)
+    server.handle_request(cluster, 1, 8, [None, 0x1234, 1, 2, 2])
+    assert _reply(cluster)[:4] == b'\x19\x01\x09\x00'
+    server.handle_request(cluster, 1, 8, [None, 0x1234, 1, 1, 2])
+    assert _reply(cluster) == b'\x19\x01\x09\x98'
+
+
+def test_image_block(server, app):
+    cluster = _cluster(app)
+    server.handle_request(cluster, 1, 3, [0, 0x1234, 1, 2, 100, 255, []])
+    data = _reply(cluster)
+    assert data[:4] == b'\x19\x01\x05\x00'
+    assert data[12:16] == b'\x64\x00\x00\x00'
+    # Limited by the NCP's payload
+    assert data[16] == 82 - ota.BLOCK_OVERHEAD
+    assert len(data) == 82
+
+    server.handle_request(cluster, 2, 3, [0, 0x1234, 1, 2, 180, 40, []])
+    data = _reply(cluster)
+    assert data[16] == 20
+    assert data[17:] == bytes(i % 256 for i in range(124, 144))
+
+    server.handle_request(cluster, 3, 3, [0, 0x1234, 1, 1, 0, 40, []])
+    assert _reply(cluster) == b'\x19\x03\x05\x95'
+
+
+def test_image_page(server, app):
+    cluster = _cluster(app)
+    replies = []
+
+    @asyncio.coroutine
+    def reply(aps, data):
+        replies.append(data)
+    cluster._endpoint._device.reply = reply
+
+    server.handle_request(cluster, 1, 4, [0, 0x1234, 1, 2, 100, 40, 90, 0, []])
+    server.handle_request(cluster, 2, 4, [0, 0x1234, 1, 3, 100, 40, 90, 0, []])
+    loop = asyncio.get_event_loop()
+    loop.run_until_complete(asyncio.sleep(0.01))
+    assert [r[16] for r in replies if r[3] == 0] == [40, 40, 10]
+    assert b'\x19\x02\x05\x95' in replies
+
+
+def test_image_block_no_slot(server, app):
+    server.handle_request(_cluster(app), 1, 1, [0, 0x1234, 1, 1, []])
+    other = _cluster(app, ieee=2)
+    server.handle_request(other, 2, 3, [0, 0x1234, 1, 2, 0, 40, []])
+    assert _reply(other) == b'\x19\x02\x05\x97\x00\x00\x00\x00\x3c\x00\x00\x00\x00\x00'
+    server.handle_request(other, 3, 4, [0, 0x1234, 1, 2, 0, 40, 90, 0, []])
+    asyncio.get_event_loop().run_until_complete(asyncio.sleep(0.01))
+    assert _reply(other)[:4] == b'\x19\x03\x05\x97'
+
+
+def test_unknown_command(server, app):
+    server.handle_request(_cluster(app), 1, 0x10, [])
+
+
+def test_upgrade_end_failed(server, app):
+    cluster = _cluster(app)
+    server.handle_request(cluster, 1, 6, [0x95, 0x1234, 1, 2])
+    assert cluster._endpoint._device.reply.call_count == 0
+
+
+def test_deserialize_query():
+    aps = t.EmberApsFrame()
+    aps.clusterId = 0x0019
+    data = b'\x01\x05\x01\x01\x34\x12\x01\x00\x01\x00\x00\x00\x04\x00'
+    tsn, command_id, is_reply, args = zcl.deserialize(aps, data)
+    assert is_reply is False
+    assert args == [1, 0x1234, 1, 1, [4]]
@@ -0,0 +1,126 @@
+import asyncio
+from unittest import mock
+
+import pytest
+
+import bellows.zigbee.zcl as zcl
+from bellows.zigbee import poll_control
+
+
+@pytest.fixture
+def manager():
+    return poll_control.PollControl(fast_poll_timeout=20)
+
+
+@pytest.fixture
+def cluster(manager):
+    epmock = mock.MagicMock()
+    epmock._device._ieee = 1
+    epmock._device._application.poll_control = manager
+    cluster = zcl.Cluster.from_id(epmock, 0x0020)
+    cluster.commands = []
+
+    @asyncio.coroutine
+    def mockcommand(command, *args, expect_reply=True):
+        cluster.commands.append((command, expect_reply))
+    cluster.command = mockcommand
+    return cluster
+
+
+def _replies(cluster):
+    return [c[0][1] for c in cluster._endpoint._device.reply.call_args_list]
+
+
+def _run(fut):
+    loop = asyncio.get_event_loop()
+    return loop.run_until_complete(fut)
+
+
+def test_checkin_nothing_pending(cluster):
+    cluster.handle_cluster_request(None, 5, zcl.ClusterCommand(0), [])
+    assert _replies(cluster) == [b'\x11\x05\x00\x00\x00\x00']
+    assert cluster.commands == []
+
+
+def test_checkin_runs_queue(manager, cluster):
+    sent = []
+
+    @asyncio.coroutine
+    def send(n):
+        sent.append(n)
+        if n == 2:
+            raise Exception("Failed")
+        if n == 1:
+            manager.queue(1, lambda: send(3))
+        return n
+
+    futs = [manager.queue(1, lambda n=n: send(n)) for n in (1, 2)]
+    assert manager.pending(1) == 2
+    assert manager.pending(2) == 0
+
+    _run(manager.checkin(cluster, 6))
+    assert _replies(cluster) == [b'\x11\x06\x00\x01\x14\x00']
+    assert sent == [1, 2, 3]
+    assert futs[0].result() == 1
+    assert isinstance(futs[1].exception(), Exception)
+    assert cluster.commands == [(0x0001, False)]
+    assert manager.pending(1) == 0
+
+
+def test_fast_poll_stop_fails(manager, cluster):
+    @asyncio.coroutine
+    def mockcommand(command, *args, expect_reply=True):
+        cluster.commands.append((command, expect_reply))
+        raise Exception("Failed")
+    cluster.command = mockcommand
+
+    sent = []
+    fut = manager.queue(1, lambda: sent.append(1))
+    fut.cancel()
+    with mock.patch.object(cluster, 'warn') as warn:
+        _run(manager.checkin(cluster, 7))
+    assert sent == []
+    assert cluster.commands == [(0x0001, False)]
+    assert warn.call_count == 1
+    assert manager._running == set()
+
+
+def test_checkin_while_running(manager, cluster):
+    release = asyncio.Future()
+    sent = []
+
+    @asyncio.coroutine
+    def send(n):
+        sent.append(n)
+        if n == 1:
+            yield from release
+        return n
+
+    manager.queue(1, lambda: send(1))
+    task = manager.checkin(cluster, 6)
+    _run(asyncio.sleep(0))
+    assert sent == [1]
+
+    # Checked in again before the first request finished
+    fut = manager.queue(1, lambda: send(2))
+    manager.checkin(cluster, 7)
+    assert _replies(cluster)[-1] == b'\x11\x07\x00\x01\x14\x00'
+    _run(asyncio.sleep(0))
+    assert cluster.commands == []
+
+    release.set_result(None)
+    _run(task)
+    assert fut.result() == 2
+    assert cluster.commands == [(0x0001, False)]
+
+
+def test_forget(manager):
+    fut = manager.queue(1, lambda: asyncio.sleep(0))
+    manager.forget(1)
+    assert manager.pending(1) == 0
+    assert isinstance(fut.exception(), Exception)
+
+
+def test_unknown_command(cluster):
+    cluster.handle_cluster_request(None, 5, zcl.ClusterCommand(1), [])
+    assert _replies(cluster) == []
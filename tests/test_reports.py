@@ -0,0 +1,81 @@
+import asyncio
+from unittest import mock
+
+import pytest
+
+from bellows.zigbee import reports
+
+
+@pytest.fixture
+def r():
+    return reports.Reports()
+
+
+def _run_once():
+    loop = asyncio.get_event_loop()
+    loop.run_until_complete(asyncio.sleep(0))
+
+
+def test_no_subscriptions(r):
+    r.attribute_updated('ieee', 1, 6, 0, True)
+
+
+def test_subscribe_filters(r):
+    everything = mock.MagicMock()
+    device = mock.MagicMock()
+    attribute = mock.MagicMock()
+    r.subscribe(everything)
+    r.subscribe(device, ieee='a')
+    r.subscribe(attribute, ieee='a', cluster_id=6, attrid=0)
+
+    r.attribute_updated('a', 1, 6, 0, True)
+    r.attribute_updated('a', 1, 8, 0, 100)
+    r.attribute_updated('b', 1, 6, 0, False)
+    assert everything.call_count == 0
+    _run_once()
+
+    assert everything.call_count == 1
+    assert len(everything.call_args[0][0]) == 3
+    assert device.call_count == 1
+    assert [u.cluster_id for u in device.call_args[0][0]] == [6, 8]
+    assert attribute.call_args[0][0] == [
+        reports.AttributeUpdate('a', 1, 6, 0, True),
+    ]
+
+
+def test_unsubscribe(r):
+    cb = mock.MagicMock()
+    sub = r.subscribe(cb, cluster_id=6)
+    r.unsubscribe(sub)
+    r.unsubscribe(sub)
+    assert r._subscriptions == {}
+    r.attribute_updated('a', 1, 6, 0, True)
+    _run_once()
+    assert cb.call_count == 0
+
+
+def test_suppress_unchanged(r):
+    cb = mock.MagicMock()
+    r.subscribe(cb, suppress_unchanged=True)
+    for value in (1, 1, 2, 2, 1):
+        r.attribute_updated('a', 1, 6, 0, value)
+    r.attribute_updated('a', 2, 6, 0, 1)
+    _run_once()
+    assert [u.value for u in cb.call_args[0][0]] == [1, 2, 1, 1]
+
+
+def test_threshold(r):
+    cb = mock.MagicMock()
+    r.subscribe(cb, threshold=10)
+    for value in (100, 105, 109, 111, 50, b'x', b'x', b'y'):
+        r.attribute_updated('a', 1, 0x0402, 0, value)
+    _run_once()
+    assert [u.value for u in cb.call_args[0][0]] == [100, 111, 50, b'x', b'y']
+
+
+def test_callback_error(r):
+    cb = mock.MagicMock(side_effect=Exception)
+    r.subscribe(cb)
+    r.attribute_updated('a', 1, 6, 0, True)
+    _run_once()
+    assert cb.call_count == 1
@@ -0,0 +1,155 @@
+import asyncio
+import subprocess
+import sys
+from unittest import mock
+
+import pytest
+
+import bellows.types as t
+from bellows.zigbee.application import ControllerApplication
+from bellows.zigbee import endpoint as zigbee_endpoint
+
+
+def _run(coro):
+    return asyncio.get_event_loop().run_until_complete(coro)
+
+
+@pytest.fixture
+def app():
+    app = ControllerApplication(mock.MagicMock())
+
+    @asyncio.coroutine
+    def mock_set_entry(index, entry):
+        return [0]
+    app._ezsp.setMulticastTableEntry = mock_set_entry
+    app.multicasts = []
+
+    @asyncio.coroutine
+    def mock_multicast(aps_frame, data):
+        app.multicasts.append(data)
+        return 0
+    app.multicast = mock_multicast
+    return app
+
+
+def _endpoint(app, n, status=0):
+    ieee = t.EmberEUI64(map(t.uint8_t, range(n, n + 8)))
+    dev = app.add_device(ieee, n)
+    ep = dev.add_endpoint(1)
+    ep.status = zigbee_endpoint.Status.ZDO_INIT
+    ep.profile_id = 260
+    scenes = ep.add_cluster(5)
+    scenes.adds = []
+
+    @asyncio.coroutine
+    def mock_command(command, *args):
+        assert command == 0
+        scenes.adds.append(args)
+        if isinstance(status, Exception):
+            raise status
+        return [status, args[0], args[1]]
+    scenes.command = mock_command
+    return ep
+
+
+@pytest.fixture
+def group(app):
+    group = _run(app.groups.add_group(0x0010))
+    for n in (1, 2):
+        ep = _endpoint(app, n)
+        app.groups._member_added(group, ep)
+    return group
+
+
+def _clusters(app):
+    return [
+        ep.clusters[5]
+        for dev in app.devices.values()
+        for ep_id, ep in dev.endpoints.items() if ep_id
+    ]
+
+
+def test_scene_args(app):
+    scene = app.scenes.define(0x0010, 1, {
+        0x0008: [t.uint8_t(128)],
+        0x0006: [t.Bool(1)],
+    }, name='Evening', transition_time=10)
+    args = scene.add_args()
+    assert args[:4] == (0x0010, 1, 10, b'Evening')
+    assert [(f.cluster_id, f.extension_field_set) for f in args[4]] == [
+        (0x0006, b'\x01'),
+        (0x0008, b'\x80'),
+    ]
+    assert scene.fingerprint.endswith(b'\x06\x00\x01\x01\x08\x00\x01\x80')
+
+
+def test_import_is_lazy():
+    # Scenes must not defeat the on-demand loading of cluster modules
+    code = (
+        "import sys, bellows.zigbee.application; "
+        "assert 'bellows.zigbee.zcl.clusters.general' not in sys.modules"
+    )
+    subprocess.check_call([sys.executable, '-c', code])
+
+
+def test_provision_once(app, group):
+    app.scenes.define(0x0010, 1, {0x0006: [t.Bool(1)]})
+    statuses = _run(app.scenes.provision(0x0010, 1))
+    assert len(statuses) == 2
+    assert [len(c.adds) for c in _clusters(app)] == [1, 1]
+
+    assert _run(app.scenes.provision(0x0010, 1)) == {}
+    assert [len(c.adds) for c in _clusters(app)] == [1, 1]
+
+    # Only the new member gets the scene
+    ep = _endpoint(app, 3)
+    app.groups._member_added(group, ep)
+    _run(app.scenes.provision(0x0010, 1))
+    assert [len(c.adds) for c in _clusters(app)] == [1, 1, 1]
+
+    # Changing the scene makes every member diverge
+    app.scenes.define(0x0010, 1, {0x0006: [t.Bool(0)]})
+    assert len(app.scenes.diverged(app.scenes[(0x0010, 1)])) == 3
+    app.scenes.forget(ep._device._ieee)
+    _run(app.scenes.provision(0x0010, 1))
+    assert [len(c.adds) for c in _clusters(app)] == [2, 2, 2]
+
+
+def test_provision_failure(app, group):
+    _endpoint(app, 3, status=0x89)
+    _endpoint(app, 4, status=Exception())
+    for dev in list(app.devices.values())[2:]:
+        app.groups._member_added(group, dev.endpoints[1])
+    app.scenes.define(0x0010, 1, {0x0006: [t.Bool(1)]})
+
+    statuses = _run(app.scenes.provision(0x0010, 1))
+    assert sorted(s for s in statuses.values() if not isinstance(s, Exception)) == [0, 0, 0x89]
+    assert len(app.scenes.diverged(app.scenes[(0x0010, 1)])) == 2
+
+
+def test_provision_default_response(app, group):
+    ep = _endpoint(app, 3)
+    app.groups._member_added(group, ep)
+
+    @asyncio.coroutine
+    def mock_command(command, *args):
+        # UNSUP_CLUSTER
+        return [command, 0xc3]
+    ep.clusters[5].command = mock_command
+    app.scenes.define(0x0010, 1, {0x0006: [t.Bool(1)]})
+
+    statuses = _run(app.scenes.provision(0x0010, 1))
+    assert statuses[(ep._device._ieee, 1)] == 0xc3
+    assert app.scenes.diverged(app.scenes[(0x0010, 1)]) == [(ep._device._ieee, 1)]
+
+
+def test_recall(app, group):
+    app.scenes.define(0x0010, 1, {0x0006: [t.Bool(1)]})
+    _run(app.scenes.recall(0x0010, 1))
+    assert [len(c.adds) for c in _clusters(app)] == [1, 1]
+    assert len(app.multicasts) == 1
+    assert app.multicasts[0][0] == 0x01
+    assert app.multicasts[0][2:] == b'\x05\x10\x00\x01'
+
+    _run(app.scenes.recall(0x0010, 1, provision=False))
+    assert len(app.multicasts) == 2
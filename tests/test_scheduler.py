@@ -0,0 +1,134 @@
+import asyncio
+from unittest import mock
+
+import pytest
+
+from bellows.zigbee import scheduler
+
+
+@pytest.fixture
+def sched():
+    return scheduler.Scheduler(max_in_flight=3, device_in_flight=2)
+
+
+def _run(fut):
+    loop = asyncio.get_event_loop()
+    return loop.run_until_complete(fut)
+
+
+def _acquire(sched, key, limit, started):
+    @asyncio.coroutine
+    def acquire():
+        yield from sched.acquire(key, limit)
+        started.append(key)
+    return asyncio.ensure_future(acquire())
+
+
+def _settle():
+    _run(asyncio.sleep(0))
+
+
+def test_limit(sched):
+    dev = mock.MagicMock()
+    dev.max_in_flight = None
+    dev.rx_on_when_idle = None
+    assert sched.limit(None) == 2
+    assert sched.limit(dev) == 2
+    dev.rx_on_when_idle = False
+    assert sched.limit(dev) == 1
+    dev.max_in_flight = 5
+    assert sched.limit(dev) == 5
+
+
+def test_device_limit(sched):
+    started = []
+    for _ in range(3):
+        _acquire(sched, 'a', 2, started)
+    _settle()
+    assert started == ['a', 'a']
+    assert sched.stats('a').depth == 1
+    assert sched.stats('a').in_flight == 2
+
+    sched.release('a')
+    _settle()
+    assert started == ['a', 'a', 'a']
+    assert sched.stats('a').depth == 0
+    assert sched.stats('a').requests == 3
+
+
+def test_fair(sched):
+    started = []
+    for _ in range(4):
+        _acquire(sched, 'a', 4, started)
+    _settle()
+    for _ in range(2):
+        _acquire(sched, 'b', 4, started)
+    _acquire(sched, 'c', 4, started)
+    _settle()
+    assert started == ['a', 'a', 'a']
+
+    # Freed slots go to each waiting device in turn
+    for _ in range(3):
+        sched.release('a')
+        _settle()
+    assert started[3:] == ['a', 'b', 'c']
+    sched.release('a')
+    _settle()
+    assert started[6:] == ['b']
+
+
+def test_cancel_waiting(sched):
+    started = []
+    _acquire(sched, 'a', 1, started)
+    waiting = _acquire(sched, 'a', 1, started)
+    _settle()
+    waiting.cancel()
+    _settle()
+    assert sched.stats('a').depth == 0
+    sched.release('a')
+    _settle()
+    assert started == ['a']
+    assert sched.in_flight == 0
+
+
+def test_cancel_granted(sched):
+    started = []
+    _acquire(sched, 'a', 1, started)
+    waiting = _acquire(sched, 'a', 1, started)
+    _settle()
+    sched.release('a')
+    waiting.cancel()
+    _settle()
+    assert started == ['a']
+    assert sched.in_flight == 0
+
+
+def test_cancel_then_release(sched):
+    # A timeout and a release landing in the same loop tick
+    sched.max_in_flight = 1
+    started = []
+    _acquire(sched, 'a', 1, started)
+    waiting = _acquire(sched, 'a', 1, started)
+    _settle()
+    waiting.cancel()
+    other = _acquire(sched, 'b', 1, started)
+    sched.release('a')
+    _settle()
+    assert waiting.cancelled()
+    assert started == ['a', 'b']
+    assert sched.stats('a').depth == 0
+    assert sched.in_flight == 1
+    other.result()
+
+
+def test_stats_unknown(sched):
+    assert sched.stats('x') == (0, 0, 0, 0.0, 0.0)
+
+
+def test_forget(sched):
+    _run(sched.acquire('a', 1))
+    sched.forget('a')
+    assert sched.stats('a').requests == 1
+    sched.release('a')
+    sched.forget('a')
+    assert sched.stats('a').requests == 0
@@ -59,3 +59,62 @@ def test_struct():
     r = repr(ts)
     assert 'TestStruct' in r
     assert r.startswith('<') and r.endswith('>')
+
+
+def test_serialize_into():
+    schema = (t.uint8_t, t.uint16_t, t.LVBytes, t.LVList(t.uint8_t))
+    data = (1, 0x0302, b'45', [t.uint8_t(6), t.uint8_t(7)])
+    buf = bytearray(b'head')
+    assert t.serialize_into(buf, data, schema) is buf
+    assert buf == b'head' + t.serialize(data, schema)
+    assert buf == b'head\x01\x02\x03\x0245\x02\x06\x07'
+
+
+def test_serialize_into_matches_serialize():
+    values = [
+        t.int16s(-2),
+        t.uint24_t(0x030201),
+        t.Single(1.25),
+        t.Double(1.25),
+        t.LVBytes(b'1234'),
+        t.List(t.uint16_t)([t.uint16_t(1), t.uint16_t(2)]),
+        t.fixed_list(2, t.uint8_t)([t.uint8_t(1), t.uint8_t(2)]),
+        t.EmberEUI64(map(t.uint8_t, range(8))),
+        t.EmberStatus.SUCCESS,
+    ]
+    for v in values:
+        buf = bytearray()
+        v.serialize_into(buf)
+        assert buf == v.serialize(), v
+
+
+def test_struct_serialize_into():
+    class TestStruct(t.EzspStruct):
+        _fields = [('a', t.uint8_t), ('b', t.LVBytes)]
+
+    ts = TestStruct()
+    ts.a = t.uint8_t(0xaa)
+    ts.b = t.LVBytes(b'bb')
+    buf = bytearray(b'\x00')
+    ts.serialize_into(buf)
+    assert buf == b'\x00\xaa\x02bb'
+    assert ts.serialize() == b'\xaa\x02bb'
+
+
+def test_enum8_deserialize():
+    status, data = t.EmberStatus.deserialize(b'\x00extra')
+    assert status is t.EmberStatus.SUCCESS
+    assert data == b'extra'
+
+
+def test_enum8_deserialize_unknown():
+    status, data = t.EzspStatus.deserialize(b'\xfe')
+    assert status == 0xfe
+    assert isinstance(status, t.uint8_t)
+    assert not isinstance(status, t.EzspStatus)
+    assert data == b''
+    assert status.serialize() == b'\xfe'
+
+
+def test_enum8_deserialize_truncated():
+    assert t.EmberStatus.deserialize(b'') == (t.EmberStatus.SUCCESS, b'')
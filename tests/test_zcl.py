@@ -17,6 +17,8 @@ def test_deserialize_general(aps):
     tsn, command_id, is_reply, args = zcl.deserialize(aps, b'\x00\x01\x00')
     assert tsn == 1
     assert command_id == 0
+    assert isinstance(command_id, zcl.GeneralCommand)
+    assert command_id.manufacturer is None
     assert is_reply is False
 
 
@@ -32,7 +34,8 @@ def test_deserialize_cluster(aps):
     aps.clusterId = 0
     tsn, command_id, is_reply, args = zcl.deserialize(aps, b'\x01\x01\x00xxx')
     assert tsn == 1
-    assert command_id == 256
+    assert command_id == 0
+    assert isinstance(command_id, zcl.ClusterCommand)
     assert is_reply is False
 
 
@@ -40,7 +43,7 @@ def test_deserialize_cluster_client(aps):
     aps.clusterId = 3
     tsn, command_id, is_reply, args = zcl.deserialize(aps, b'\x09\x01\x00AB')
     assert tsn == 1
-    assert command_id == 256
+    assert command_id == 0
     assert is_reply is True
     assert args == [0x4241]
 
@@ -49,7 +52,8 @@ def test_deserialize_cluster_unknown(aps):
     aps.clusterId = 0xff00
     tsn, command_id, is_reply, args = zcl.deserialize(aps, b'\x05\x00\x00\x01\x00')
     assert tsn == 1
-    assert command_id == 256
+    assert command_id == 0
+    assert isinstance(command_id, zcl.ClusterCommand)
     assert is_reply is False
 
 
@@ -57,10 +61,55 @@ def test_deserialize_cluster_command_unknown(aps):
     aps.clusterId = 0
     tsn, command_id, is_reply, args = zcl.deserialize(aps, b'\x01\x01\xff')
     assert tsn == 1
-    assert command_id == 255 + 256
+    assert command_id == 255
+    assert isinstance(command_id, zcl.ClusterCommand)
     assert is_reply is False
 
 
+def test_deserialize_manufacturer(aps):
+    aps.clusterId = 3
+    data = b'\x0d\x34\x12\x01\x00AB'
+    tsn, command_id, is_reply, args = zcl.deserialize(aps, data)
+    assert tsn == 1
+    assert command_id == 0
+    assert command_id.manufacturer == 0x1234
+    assert is_reply is True
+    assert args == [0x4241]
+
+    # Served from the dispatch table the second time around
+    assert zcl.deserialize(aps, data) == (tsn, command_id, is_reply, args)
+    assert (3, 1, 1, 0x1234, 0) in zcl._dispatch
+
+
+def test_dispatch_bounded(aps, monkeypatch):
+    monkeypatch.setattr(zcl, 'DISPATCH_MAX', 4)
+    aps.clusterId = 0xfe01
+    for manufacturer in range(10):
+        data = bytes([0x05, manufacturer, 0x00, 0x01, 0x00])
+        tsn, command_id, is_reply, args = zcl.deserialize(aps, data)
+        assert command_id.manufacturer == manufacturer
+        assert len(zcl._dispatch) <= 4
+
+
+def test_dispatch_invalidated(aps):
+    aps.clusterId = 0xfe00
+    tsn, command_id, is_reply, args = zcl.deserialize(aps, b'\x01\x01\x00\x05')
+    assert args == b'\x05'
+
+    class TestCluster(zcl.Cluster):
+        cluster_id = 0xfe00
+        server_commands = {
+            0x00: ('test', (t.uint8_t, ), False),
+        }
+
+    try:
+        tsn, command_id, is_reply, args = zcl.deserialize(
+            aps, b'\x01\x01\x00\x05')
+        assert args == [5]
+    finally:
+        del zcl.Cluster._registry[0xfe00]
+
+
 def test_unknown_cluster():
     c = zcl.Cluster.from_id(None, 999)
     assert isinstance(c, zcl.Cluster)
@@ -73,6 +122,7 @@ def cluster(aps):
     aps.clusterId = 0
     aps.sequence = 123
     epmock.get_aps.return_value = aps
+    epmock._device._application.max_payload = 82
     return zcl.Cluster.from_id(epmock, 0)
 
 
@@ -88,6 +138,9 @@ def test_attribute_report(cluster):
     attr.value.value = 1
     cluster.handle_request(aps, 0, 0x0a, [[attr]])
     assert cluster._attr_cache[4] == 1
+    reports = cluster._endpoint._device._application.reports
+    assert reports.attribute_updated.call_count == 1
+    assert reports.attribute_updated.call_args[0][2:] == (0, 4, 1)
 
 
 def test_handle_request_unknown(cluster, aps):
@@ -95,7 +148,7 @@ def test_handle_request_unknown(cluster, aps):
 
 
 def test_handle_cluster_request(cluster, aps):
-    cluster.handle_request(aps, 0, 256, [])
+    cluster.handle_request(aps, 0, zcl.ClusterCommand(0), [])
 
 
 def test_read_attributes(cluster):
@@ -112,11 +165,381 @@ def test_read_attributes(cluster):
     loop.run_until_complete(cluster.read_attributes([0]))
 
 
+def _read_record(attrid):
+    rar = zcl.foundation.ReadAttributeRecord()
+    rar.attrid = attrid
+    rar.status = 0
+    rar.value = zcl.foundation.TypeValue()
+    rar.value.value = attrid * 10
+    return rar
+
+
+def test_read_attributes_coalesced(cluster):
+    requests = []
+
+    @asyncio.coroutine
+    def mockrequest(foundation, command, schema, args):
+        requests.append(args)
+        return [[_read_record(a) for a in args]]
+    cluster.request = mockrequest
+
+    loop = asyncio.get_event_loop()
+    r1, r2 = loop.run_until_complete(asyncio.gather(
+        cluster.read_attributes([0, 1]),
+        cluster.read_attributes([1, 4]),
+    ))
+    assert len(requests) == 1
+    assert sorted(requests[0]) == [0, 1, 4]
+    assert [r.attrid for r in r1[0]] == [0, 1]
+    assert [r.attrid for r in r2[0]] == [1, 4]
+    assert cluster._attr_cache == {0: 0, 1: 10, 4: 40}
+
+
+def test_read_attributes_split(cluster):
+    requests = []
+
+    @asyncio.coroutine
+    def mockrequest(foundation, command, schema, args):
+        requests.append(args)
+        if 5 in args:
+            raise Exception("Message send failure")
+        return [[_read_record(a) for a in args]]
+    cluster.request = mockrequest
+    # 0x0000-0x0003 are uint8_t, 5 and 6 are strings
+    cluster._endpoint._device._application.max_payload = 20
+
+    loop = asyncio.get_event_loop()
+    r1, r2 = loop.run_until_complete(asyncio.gather(
+        cluster.read_attributes([0, 1, 2, 3]),
+        cluster.read_attributes([5, 6]),
+        return_exceptions=True,
+    ))
+    assert sorted(requests) == [[0, 1, 2], [3], [5], [6]]
+    assert [r.attrid for r in r1[0]] == [0, 1, 2, 3]
+    assert isinstance(r2, Exception)
+
+
+def test_read_attributes_default_response(cluster):
+    @asyncio.coroutine
+    def mockrequest(foundation, command, schema, args):
+        return [0x00, 0x82]
+    cluster.request = mockrequest
+
+    loop = asyncio.get_event_loop()
+    with pytest.raises(Exception) as excinfo:
+        loop.run_until_complete(
+            asyncio.wait_for(cluster.read_attributes([0]), 1))
+    assert not isinstance(excinfo.value, asyncio.TimeoutError)
+
+
+def test_read_attributes_request_raises(cluster):
+    def mockrequest(foundation, command, schema, args):
+        raise AssertionError()
+    cluster.request = mockrequest
+
+    loop = asyncio.get_event_loop()
+    with pytest.raises(AssertionError):
+        loop.run_until_complete(
+            asyncio.wait_for(cluster.read_attributes([0]), 1))
+
+
+def test_read_attributes_cached(cluster):
+    requests = []
+
+    @asyncio.coroutine
+    def mockrequest(foundation, command, schema, args):
+        requests.append(args)
+        return [[_read_record(a) for a in args]]
+    cluster.request = mockrequest
+
+    attr = zcl.foundation.Attribute()
+    attr.attrid = 0
+    attr.value = zcl.foundation.TypeValue()
+    attr.value.value = 7
+    cluster.handle_request(aps, 0, 0x0a, [[attr]])
+    assert cluster.cache_age(0) < 1
+    assert cluster.cache_age(1) is None
+
+    loop = asyncio.get_event_loop()
+    # No freshness policy by default, so the device is always asked
+    v = loop.run_until_complete(cluster.read_attributes([0]))
+    assert requests == [[0]]
+    assert v[0][0].value.value == 0
+
+    cluster._update_attribute(0, 7)
+    v = loop.run_until_complete(cluster.read_attributes([0, 1], max_age=60))
+    assert requests == [[0], [1]]
+    assert [r.attrid for r in v[0]] == [0, 1]
+    assert v[0][0].value.value == 7
+    assert v[0][0].value.type == 0x20
+
+    cluster.set_max_age(60, attribute=1)
+    v = loop.run_until_complete(cluster.read_attributes([1]))
+    assert requests == [[0], [1]]
+    assert v[0][0].value.value == 10
+
+    cluster.set_max_age(60)
+    v = loop.run_until_complete(cluster.read_attributes([0, 1]))
+    assert requests == [[0], [1]]
+
+    cluster._attr_time[0] -= 120
+    v = loop.run_until_complete(cluster.read_attributes([0, 1]))
+    assert requests == [[0], [1], [0]]
+
+
 def test_write_attributes(cluster):
     cluster.write_attributes({0: 5})
     assert cluster._endpoint._device.request.call_count == 1
 
 
+def test_attribute_names(cluster):
+    assert zcl.clusters.general.Basic._attridx['model_id'] == 5
+    assert zcl.Cluster._attridx == {}
+
+    cluster.write_attributes({'zcl_version': 5})
+    data = cluster._endpoint._device.request.call_args[0][1]
+    assert data[3:5] == b'\x00\x00'
+
+    cluster.configure_reporting('hw_version', 10, 20, 1)
+    data = cluster._endpoint._device.request.call_args[0][1]
+    assert data[4:6] == b'\x03\x00'
+
+    cluster._update_attribute(5, b'model')
+    assert cluster.get_cached('model_id') == b'model'
+    assert cluster.get_cached('date_code', 1) == 1
+    assert cluster.cache_age('model_id') < 1
+    cluster.set_max_age(60, 'model_id')
+    assert cluster._attr_max_age == {5: 60}
+
+    loop = asyncio.get_event_loop()
+    v = loop.run_until_complete(cluster.read_attributes(['model_id']))
+    assert v[0][0].value.value == b'model'
+
+    with pytest.raises(ValueError):
+        cluster.get_cached('no_such_attribute')
+
+
+def _status_record(record_type, attrid, status):
+    r = record_type()
+    r.status = t.uint8_t(status)
+    r.attrid = t.uint16_t(attrid)
+    return r
+
+
+def test_write_attributes_split(cluster):
+    requests = []
+
+    @asyncio.coroutine
+    def mockrequest(foundation, command, schema, args):
+        requests.append((command, [a.attrid for a in args]))
+        record_type = zcl.foundation.WriteAttributesStatusRecord
+        if 3 in [a.attrid for a in args]:
+            return [[_status_record(record_type, 3, 0x88)]]
+        return [[_status_record(record_type, 0, 0)]]
+    cluster.request = mockrequest
+    # Three 4 byte records per frame
+    cluster._endpoint._device._application.max_payload = 15
+
+    loop = asyncio.get_event_loop()
+    v = loop.run_until_complete(cluster.write_attributes({
+        'zcl_version': 1,
+        'app_version': 2,
+        'stack_version': 3,
+        'hw_version': 4,
+    }))
+    assert sorted(requests) == [(2, [0, 1, 2]), (2, [3])]
+    assert v == {0: 0, 1: 0, 2: 0, 3: 0x88}
+
+    with pytest.raises(ValueError):
+        cluster.write_attributes({0: 1, 1: 2, 2: 3, 3: 4}, undivided=True)
+
+
+def test_write_attributes_cache(cluster):
+    @asyncio.coroutine
+    def mockrequest(foundation, command, schema, args):
+        record_type = zcl.foundation.WriteAttributesStatusRecord
+        return [[_status_record(record_type, 1, 0x88)]]
+    cluster.request = mockrequest
+    cluster._update_attribute(0, 1)
+    cluster._update_attribute(1, 1)
+    cluster.set_max_age(60)
+
+    loop = asyncio.get_event_loop()
+    v = loop.run_until_complete(cluster.write_attributes({0: 5, 1: 6}))
+    assert v == {0: 0, 1: 0x88}
+    assert cluster.get_cached(0) == 5
+    assert cluster.cache_age(0) < 1
+    # The failed write leaves the old value, but no longer fresh
+    assert cluster.get_cached(1) == 1
+    assert cluster.cache_age(1) is None
+
+
+def test_write_attributes_undivided(cluster):
+    cluster.write_attributes({0: 1}, undivided=True)
+    data = cluster._endpoint._device.request.call_args[0][1]
+    assert data[2] == 0x03
+
+    with pytest.raises(ValueError):
+        cluster.write_attributes({0: 1}, undivided=True, no_response=True)
+
+
+def test_write_attributes_no_response(cluster):
+    @asyncio.coroutine
+    def mockreply(aps, data):
+        assert data[2] == 0x05
+        return [0]
+    cluster._endpoint._device.reply = mockreply
+
+    loop = asyncio.get_event_loop()
+    v = loop.run_until_complete(
+        cluster.write_attributes({0: 1, 1: 2}, no_response=True))
+    assert v == {0: None, 1: None}
+    assert cluster._endpoint._device.request.call_count == 0
+
+
+def test_write_attributes_no_response_fail(cluster):
+    @asyncio.coroutine
+    def mockreply(aps, data):
+        return [1]
+    cluster._endpoint._device.reply = mockreply
+
+    loop = asyncio.get_event_loop()
+    with pytest.raises(Exception):
+        loop.run_until_complete(
+            cluster.write_attributes({0: 1}, no_response=True))
+
+
+def test_configure_reporting_multiple(cluster):
+    requests = []
+
+    @asyncio.coroutine
+    def mockrequest(foundation, command, schema, args):
+        requests.append([cfg.attrid for cfg in args])
+        record_type = zcl.foundation.ConfigureReportingResponseRecord
+        return [[_status_record(record_type, 3, 0x86)]]
+    cluster.request = mockrequest
+
+    loop = asyncio.get_event_loop()
+    v = loop.run_until_complete(cluster.configure_reporting_multiple({
+        0: (10, 20, 1),
+        'app_version': (10, 20, 1),
+        3: (30, 60, 1),
+    }))
+    assert requests == [[0, 1, 3]]
+    assert v == {0: 0, 1: 0, 3: 0x86}
+
+
+def test_write_attributes_default_response(cluster):
+    @asyncio.coroutine
+    def mockrequest(foundation, command, schema, args):
+        return [0x03, 0x81]
+    cluster.request = mockrequest
+
+    loop = asyncio.get_event_loop()
+    v = loop.run_until_complete(
+        cluster.write_attributes({0: 1, 1: 2}, undivided=True))
+    assert v == {0: 0x81, 1: 0x81}
+
+
+def test_configure_reporting_multiple_default_response(cluster):
+    @asyncio.coroutine
+    def mockrequest(foundation, command, schema, args):
+        return [0x06, 0x81]
+    cluster.request = mockrequest
+
+    loop = asyncio.get_event_loop()
+    v = loop.run_until_complete(cluster.configure_reporting_multiple({
+        0: (10, 20, 1),
+        3: (30, 60, 1),
+    }))
+    assert v == {0: 0x81, 3: 0x81}
+
+
+def _discover_response(complete, attrids):
+    records = []
+    for attrid in attrids:
+        r = zcl.foundation.DiscoverAttributesResponseRecord()
+        r.attrid = attrid
+        r.datatype = 0x20
+        records.append(r)
+    return [complete, records]
+
+
+def test_discover_attributes(cluster):
+    requests = []
+
+    @asyncio.coroutine
+    def mockrequest(foundation, command, schema, start, count):
+        requests.append((command, start, count))
+        if start == 0:
+            return _discover_response(False, [0, 1, 4])
+        return _discover_response(True, [5])
+    cluster.request = mockrequest
+
+    loop = asyncio.get_event_loop()
+    v = loop.run_until_complete(cluster.discover_attributes(use_cache=False))
+    assert v == {0: 0x20, 1: 0x20, 4: 0x20, 5: 0x20}
+    assert requests == [(0x0c, 0, 26), (0x0c, 5, 26)]
+
+
+def test_discover_attributes_default_response(cluster):
+    @asyncio.coroutine
+    def mockrequest(foundation, command, schema, start, count):
+        return [0x0c, 0x81]
+    cluster.request = mockrequest
+
+    loop = asyncio.get_event_loop()
+    with pytest.raises(Exception):
+        loop.run_until_complete(cluster.discover_attributes(use_cache=False))
+
+
+def test_discover_attributes_not_advancing(cluster):
+    requests = []
+
+    @asyncio.coroutine
+    def mockrequest(foundation, command, schema, start, count):
+        requests.append(start)
+        return _discover_response(False, [0, 1])
+    cluster.request = mockrequest
+
+    loop = asyncio.get_event_loop()
+    v = loop.run_until_complete(cluster.discover_attributes(use_cache=False))
+    assert v == {0: 0x20, 1: 0x20}
+    assert requests == [0, 2]
+
+
+def test_discover_attributes_cached(cluster):
+    device = cluster._endpoint._device
+    device._application.discovery_cache = {}
+    requests = []
+
+    @asyncio.coroutine
+    def mockrequest(foundation, command, schema, start, count):
+        requests.append(start)
+        return _discover_response(False, [])
+    cluster.request = mockrequest
+
+    @asyncio.coroutine
+    def model_info():
+        return (b'Acme', b'Sensor')
+    device.model_info = model_info
+
+    loop = asyncio.get_event_loop()
+    assert loop.run_until_complete(cluster.discover_attributes()) == {}
+    assert loop.run_until_complete(cluster.discover_attributes()) == {}
+    assert requests == [0]
+    assert (b'Acme', b'Sensor', 0) in device._application.discovery_cache
+
+
+def test_discover_attributes_response(aps):
+    aps.clusterId = 0
+    data = b'\x18\x01\x0d\x01\x00\x00\x20\x05\x00\x42'
+    tsn, command_id, is_reply, args = zcl.deserialize(aps, data)
+    assert is_reply is True
+    assert args[0] == t.Bool.true
+    assert [(r.attrid, r.datatype) for r in args[1]] == [(0, 0x20), (5, 0x42)]
+
+
 def test_bind(cluster):
     cluster.bind()
 
@@ -134,6 +557,66 @@ def test_command(cluster):
     assert cluster._endpoint._device.request.call_count == 1
 
 
+def test_command_no_reply(cluster):
+    cluster.command(0x00, expect_reply=False)
+    request = cluster._endpoint._device.request
+    assert request.call_args[0][1][0] == 0x11
+    assert request.call_args[1] == {'expect_reply': False}
+
+    cluster.command(0x00)
+    assert request.call_args[0][1][0] == 0x01
+    assert request.call_args[1] == {'expect_reply': True}
+
+
+def test_command_coalesce(cluster):
+    sent = []
+
+    @asyncio.coroutine
+    def mockrequest(general, command, schema, *args, expect_reply=True):
+        sent.append(args)
+        yield from asyncio.sleep(0)
+        if args[0] == 99:
+            raise Exception("Message send failure")
+        return [args[0]]
+    cluster.request = mockrequest
+
+    loop = asyncio.get_event_loop()
+    # Started in order, unlike gathering the coroutines directly
+    results = loop.run_until_complete(asyncio.gather(*[
+        asyncio.ensure_future(cluster.command(0x00, level, coalesce=True))
+        for level in range(5)
+    ]))
+    assert sent == [(0, ), (4, )]
+    assert results == [[0], [4], [4], [4], [4]]
+    assert cluster._coalescing == {}
+
+    with pytest.raises(Exception):
+        loop.run_until_complete(asyncio.gather(
+            asyncio.ensure_future(cluster.command(0x00, 1, coalesce=True)),
+            asyncio.ensure_future(cluster.command(0x00, 99, coalesce=True)),
+        ))
+    assert cluster._coalescing == {}
+
+
+def test_write_attributes_coalesce(cluster):
+    sent = []
+
+    @asyncio.coroutine
+    def mockrequest(general, command, schema, records, expect_reply=True):
+        sent.append([(r.attrid, r.value.value) for r in records])
+        yield from asyncio.sleep(0)
+        return [[_status_record(zcl.foundation.WriteAttributesStatusRecord, 0, 0)]]
+    cluster.request = mockrequest
+
+    loop = asyncio.get_event_loop()
+    results = loop.run_until_complete(asyncio.gather(*[
+        asyncio.ensure_future(cluster.write_attributes(a, coalesce=True))
+        for a in ({0: 1}, {'zcl_version': 2}, {1: 5}, {0: 3})
+    ]))
+    assert sorted(sent) == [[(0, 1)], [(0, 3)], [(1, 5)]]
+    assert results == [{0: 0}, {0: 0}, {1: 0}, {0: 0}]
+
+
 def test_name(cluster):
     assert cluster.name == 'Basic'
 
@@ -1,6 +1,13 @@
+import pytest
+
 import bellows.zigbee.zcl as zcl
 
 
+@pytest.fixture(autouse=True)
+def all_clusters():
+    zcl.clusters.load_all()
+
+
 def test_registry():
     for cluster_id, cluster in zcl.Cluster._registry.items():
         assert 0 <= getattr(cluster, 'cluster_id', -1) <= 65535
@@ -39,3 +46,11 @@ def test_server_commands():
 
 def test_client_commands():
     _test_commands('client_commands')
+
+
+def test_lazy_registry():
+    assert zcl.Cluster._registry[0x0402].cluster_id == 0x0402
+    with pytest.raises(KeyError):
+        zcl.Cluster._registry[0x0bff]
+    with pytest.raises(KeyError):
+        zcl.Cluster._registry[0x7000]
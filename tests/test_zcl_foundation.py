@@ -62,3 +62,19 @@ def test_attribute_reporting_config_1():
     assert data == b''
     assert arc2.direction == arc.direction
     assert arc2.timeout == arc.timeout
+
+
+def test_serialize_into():
+    arc = foundation.AttributeReportingConfig()
+    arc.direction = 0
+    arc.attrid = 99
+    arc.datatype = 0x20
+    arc.min_interval = 10
+    arc.max_interval = 20
+    arc.reportable_change = 30
+    rar, _ = foundation.ReadAttributeRecord.deserialize(b'\x00\x00\x00\x20\x99')
+
+    buf = bytearray()
+    arc.serialize_into(buf)
+    rar.serialize_into(buf)
+    assert buf == arc.serialize() + rar.serialize()
@@ -93,5 +93,6 @@ def test_handle_announce(zdo_f):
     dev = zdo_f._device
     dev._application.devices.pop(dev._ieee)
     aps = t.EmberApsFrame()
-    zdo_f.handle_request(aps, 111, 0x0013, [0, dev._ieee, dev._nwk])
+    zdo_f.handle_request(aps, 111, 0x0013, [dev._nwk, dev._ieee, 0])
     assert dev._application.add_device.call_count == 1
+    assert dev._application.add_device.call_args[0] == (dev._ieee, dev._nwk)
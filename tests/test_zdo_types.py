@@ -62,3 +62,19 @@ def test_size_prefixed_simple_descriptor():
     sd2, data = types.SizePrefixedSimpleDescriptor.deserialize(ser)
     assert sd.input_clusters == sd2.input_clusters
     assert sd.output_clusters == sd2.output_clusters
+
+
+def test_size_prefixed_simple_descriptor_into():
+    sd = types.SizePrefixedSimpleDescriptor()
+    sd.endpoint = t.uint8_t(1)
+    sd.profile = t.uint16_t(2)
+    sd.device_type = t.uint16_t(3)
+    sd.device_version = t.uint8_t(4)
+    sd.input_clusters = t.LVList(t.uint16_t)([t.uint16_t(5)])
+    sd.output_clusters = t.LVList(t.uint16_t)([])
+
+    buf = bytearray(b'\xff')
+    sd.serialize_into(buf)
+    assert buf[0] == 0xff
+    assert buf[1] == len(buf) - 2
+    assert buf[1:] == sd.serialize()
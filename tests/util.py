@@ -1,3 +1,3 @@
 class MockApplication():
-    def get_sequence(self):
+    def get_sequence(self, nwk=None):
         return 123